@@ -1,5 +1,17 @@
+import click
+from datetime import date
 from flask import Blueprint, jsonify, request
+from extensions import db
+from models.resolution_sketch import ResolutionSketch
+from models.label import CanonicalLabel
+from models.ticket import Ticket
 from services.analytics_service import AnalyticsService
+from services.ai_service import AIService
+from services.usage_service import UsageService
+from services.sla_service import SLAService
+from services.trend_service import TrendService
+from services.label_service import LabelService
+from utils.http import conditional
 
 analytics_bp = Blueprint('analytics', __name__)
 
@@ -10,18 +22,22 @@ def analytics_root():
 
 # Forecast total ticket volume
 @analytics_bp.route('/forecast', methods=['GET'])
-def forecast_volume():
+@AIService.async_client_scope
+async def forecast_volume():
     """
     Forecast total ticket volume.
-    Query params: days=30 (history window), days_to_forecast=7 (prediction length)
+    Query params: days=30 (history window), days_to_forecast=7 (prediction length),
+    lower=0.1 / upper=0.9 (prediction interval quantiles)
     """
     days = request.args.get('days', 30, type=int)
     days_to_forecast = request.args.get('days_to_forecast', 7, type=int)
+    lower = request.args.get('lower', type=float)
+    upper = request.args.get('upper', type=float)
     
     try:
         history = AnalyticsService.get_ticket_volume_history(days)
-        forecast = AnalyticsService.forecast_future_volume(history, days_to_forecast)
-        explanation = AnalyticsService.generate_insight(history, forecast)
+        forecast = AnalyticsService.forecast_future_volume(history, days_to_forecast, lower=lower, upper=upper)
+        explanation = await AnalyticsService.agenerate_insight(history, forecast)
         
         return jsonify({
             "period": f"Last {days} days",
@@ -30,24 +46,50 @@ def forecast_volume():
             "forecast": forecast,
             "explanation": explanation
         }), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
 
+# Forecast accuracy per model
+@analytics_bp.route('/forecast/backtest', methods=['GET'])
+def forecast_backtest():
+    """
+    Rolling-origin backtest of every forecasting model on total volume and on each issue type,
+    with the model each forecast uses.
+    Query params: days=90 (history window), days_to_forecast=7 (horizon scored at every origin)
+    """
+    days = request.args.get('days', 90, type=int)
+    days_to_forecast = request.args.get('days_to_forecast', 7, type=int)
+
+    try:
+        report = AnalyticsService.backtest_forecasts(days, days_to_forecast)
+        return jsonify({
+            "period": f"Last {days} days",
+            "forecast_window": f"Next {days_to_forecast} days",
+            **report
+        }), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 # Forecast ticket volume by type
 @analytics_bp.route('/forecast-by-type', methods=['GET'])
 def forecast_volume_by_type():
     """
     Forecast ticket volume broken down by type (Bug, Feature Request, Support, Task).
-    Query params: days=30 (history window), days_to_forecast=7 (prediction length)
+    Query params: days=30 (history window), days_to_forecast=7 (prediction length),
+    lower=0.1 / upper=0.9 (prediction interval quantiles)
     """
     days = request.args.get('days', 30, type=int)
     days_to_forecast = request.args.get('days_to_forecast', 7, type=int)
+    lower = request.args.get('lower', type=float)
+    upper = request.args.get('upper', type=float)
     
     try:
         history = AnalyticsService.get_ticket_volume_by_type(days)
-        forecast = AnalyticsService.forecast_volume_by_type(history, days_to_forecast)
+        forecast = AnalyticsService.forecast_volume_by_type(history, days_to_forecast, lower=lower, upper=upper)
         
         return jsonify({
             "period": f"Last {days} days",
@@ -61,5 +103,133 @@ def forecast_volume_by_type():
                 "Task": "Internal tasks and improvements"
             }
         }), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
\ No newline at end of file
+        return jsonify({"error": str(e)}), 500
+
+# Ticket volume grouped by any dimensions
+@analytics_bp.route('/volume', methods=['GET'])
+def volume():
+    """
+    Ticket volume per time bucket, split by arbitrary dimensions.
+    Query params: group_by=priority,auto_category (optional), bucket=day|week|month, days=30 (history window),
+    top_n=10 (values kept per dimension, the rest roll up into "other"), forecast=0 (buckets to forecast)
+    """
+    group_by = [d.strip() for d in request.args.get('group_by', '').split(',') if d.strip()]
+    bucket = request.args.get('bucket', 'day')
+    days = request.args.get('days', 30, type=int)
+    top_n = request.args.get('top_n', 10, type=int)
+    periods = request.args.get('forecast', 0, type=int)
+
+    try:
+        result = AnalyticsService.get_volume(group_by=group_by, bucket=bucket, days=days, top_n=top_n)
+        if periods > 0:
+            result["forecast"] = AnalyticsService.forecast_volume_series(result, periods)
+        return jsonify(result), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# Resolution time percentiles and due-date breach rates
+@analytics_bp.route('/resolution', methods=['GET'])
+@conditional(ResolutionSketch.__tablename__)
+def resolution_stats():
+    """
+    Resolution-time percentiles (hours) and due-date breach rates of resolved tickets.
+    Query params: group_by=all|priority|issue_type|assignee, limit=50
+    """
+    dimension = request.args.get('group_by', 'all')
+    limit = request.args.get('limit', 50, type=int)
+
+    try:
+        return jsonify({
+            "group_by": dimension,
+            "groups": SLAService.get_resolution_stats(dimension, limit)
+        }), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@analytics_bp.cli.command('rebuild-sla')
+def rebuild_sla_command():
+    """
+    Recompute resolution-time sketches from all tickets (backfill after upgrading or bulk edits).
+    Usage: flask --app run analytics rebuild-sla
+    """
+    resolved = SLAService.rebuild()
+    click.echo(f"Rebuilt resolution sketches from {resolved} resolved tickets")
+
+# Volume spikes and sentiment drops against EWMA baselines
+@analytics_bp.route('/anomalies', methods=['GET'])
+def anomalies():
+    """
+    Flag categories whose volume (spikes) or mean sentiment (drops) deviates from their EWMA baseline.
+    Query params: threshold=3.0 (|z| to flag), date=YYYY-MM-DD (default today)
+    """
+    threshold = request.args.get('threshold', TrendService.Z_THRESHOLD, type=float)
+    day = request.args.get('date')
+
+    try:
+        day = date.fromisoformat(day) if day else None
+    except ValueError:
+        return jsonify({"error": "date must be YYYY-MM-DD"}), 400
+
+    try:
+        return jsonify(TrendService.get_anomalies(threshold, day)), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+# Category/tag taxonomy cardinality
+@analytics_bp.route('/labels', methods=['GET'])
+@conditional(CanonicalLabel.__tablename__, Ticket.__tablename__)
+def label_stats():
+    """
+    Canonical category and tag counts, raw labels merged into them and the largest canonical labels.
+    """
+    try:
+        return jsonify(LabelService.get_label_stats()), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@analytics_bp.cli.command('rebuild-trends')
+def rebuild_trends_command():
+    """
+    Recompute daily volume/sentiment statistics from all tickets and reset EWMA baselines.
+    Usage: flask --app run analytics rebuild-trends
+    """
+    rows = TrendService.rebuild()
+    click.echo(f"Rebuilt {rows} daily statistics rows")
+
+
+@analytics_bp.cli.command('advance-trends')
+def advance_trends_command():
+    """
+    Fold the days completed since the last run into the EWMA baselines (schedule daily).
+    Usage: flask --app run analytics advance-trends
+    """
+    states = TrendService.advance()
+    db.session.commit()
+    click.echo(f"Advanced {states} trend states")
+
+# LLM token usage, latency and cost
+@analytics_bp.route('/ai-usage', methods=['GET'])
+def ai_usage():
+    """
+    Aggregated LLM/embedding usage broken down by operation, model and endpoint.
+    Query params: hours=24 (window), bucket=hour|day (time series granularity)
+    """
+    hours = request.args.get('hours', 24, type=int)
+    bucket = request.args.get('bucket', 'hour')
+    if bucket not in ('hour', 'day'):
+        return jsonify({"error": "bucket must be 'hour' or 'day'"}), 400
+
+    try:
+        return jsonify(UsageService.get_usage_report(hours, bucket)), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
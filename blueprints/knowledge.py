@@ -1,8 +1,13 @@
+import click
 from flask import Blueprint, jsonify, request
 from models.knowledge import KnowledgeArticle
+from models.data_version import DataVersion
+from utils.http import conditional, sse_response
+from utils.serialization import stream_json_rows
 from services.ai_service import AIService
+from services.cluster_service import ClusterService
+from services.knowledge_service import KnowledgeService
 from extensions import db
-import json
 
 knowledge_bp = Blueprint('knowledge', __name__)
 
@@ -19,10 +24,6 @@ def add_article():
         return jsonify({"error": "Title and content are required"}), 400
 
     try:
-        # Generate embedding
-        embedding_vector = AIService.generate_embedding(data['title'] + "\n" + data['content'])
-        embedding_str = json.dumps(embedding_vector) if embedding_vector else None
-
         # Handle tags: accept as list or CSV string
         tags_input = data.get('tags', [])
         if isinstance(tags_input, list):
@@ -35,10 +36,12 @@ def add_article():
             content=data['content'],
             url=data.get('url'),
             type=data.get('type', 'solution'),
-            tags=tags_str,
-            embedding=embedding_str
+            tags=tags_str
         )
         db.session.add(article)
+        # Split into passages and embed them in one batched request
+        KnowledgeService.index_article(article)
+        DataVersion.bump(KnowledgeArticle.__tablename__)
         db.session.commit()
         return jsonify(article.to_dict()), 201
     except Exception as e:
@@ -47,13 +50,14 @@ def add_article():
 
 
 @knowledge_bp.route('/', methods=['GET'])
+@conditional(KnowledgeArticle.__tablename__)
 def get_all_articles():
     """
     Get all knowledge base articles.
+    Rows are streamed straight from column tuples; the embedding column is never loaded.
     """
     try:
-        articles = KnowledgeArticle.query.all()
-        return jsonify([a.to_dict() for a in articles]), 200
+        return stream_json_rows(KnowledgeArticle.serialized_columns(), csv_columns=('tags',))
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -76,7 +80,8 @@ def get_article(article_id):
 
 
 @knowledge_bp.route('/search', methods=['GET'])
-def search_knowledge():
+@AIService.async_client_scope
+async def search_knowledge():
     """
     Search knowledge base articles based on a query string.
     Query param: q=search text
@@ -87,24 +92,37 @@ def search_knowledge():
         return jsonify({"error": "Query parameter 'q' is required"}), 400
 
     try:
-        results = AIService.find_relevant_knowledge(query)
+        results = await AIService.afind_relevant_knowledge(query)
         return jsonify(results), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
 @knowledge_bp.route('/draft', methods=['POST'])
-def draft_article():
+@AIService.async_client_scope
+async def draft_article():
     """
     Draft a knowledge base article based on resolved tickets.
+    Expected JSON body: { "ticket_ids": [1, 2] } or { "cluster_id": 3 } to draft from a cluster's most central tickets.
+    Query param: stream=true to receive the draft as Server-Sent Events.
     """
-    data = request.get_json()
+    data = request.get_json() or {}
     ticket_ids = data.get('ticket_ids')
+    if not ticket_ids and data.get('cluster_id') is not None:
+        ticket_ids = ClusterService.get_cluster_ticket_ids(data['cluster_id'])
+        if not ticket_ids:
+            return jsonify({"error": "Cluster not found or empty"}), 404
     if not ticket_ids or not isinstance(ticket_ids, list):
-        return jsonify({"error": "ticket_ids list is required"}), 400
+        return jsonify({"error": "ticket_ids list or cluster_id is required"}), 400
 
     try:
-        draft = AIService.draft_article_from_tickets(ticket_ids)
+        if request.args.get('stream', '').lower() == 'true':
+            messages = await AIService._adraft_article_messages(ticket_ids)
+            if not messages:
+                return jsonify({"error": "No matching tickets"}), 404
+            return sse_response(AIService.stream_json_completion('draft_article_from_tickets', messages))
+
+        draft = await AIService.adraft_article_from_tickets(ticket_ids)
         if not draft:
             return jsonify({"error": "Could not generate draft"}), 500
         return jsonify(draft), 200
@@ -123,7 +141,24 @@ def delete_article(article_id):
             return jsonify({"error": "Article not found"}), 404
             
         db.session.delete(article)
+        DataVersion.bump(KnowledgeArticle.__tablename__)
         db.session.commit()
         return jsonify({"message": "Article deleted successfully"}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+
+
+@knowledge_bp.cli.command('index-passages')
+def index_passages_command():
+    """
+    Split and embed articles that have no passages yet (created before passage indexing).
+    Usage: flask --app run knowledge index-passages
+    """
+    articles = KnowledgeService.unindexed_articles()
+    click.echo(f"{len(articles)} articles to index")
+    indexed = 0
+    for article in articles:
+        if KnowledgeService.index_article(article):
+            indexed += 1
+            db.session.commit()
+    click.echo(f"Indexed {indexed} articles")
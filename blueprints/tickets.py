@@ -1,7 +1,18 @@
+import click
 from flask import Blueprint, jsonify, request
 from services.ticket_service import TicketService
 from services.ai_service import AIService
+from services.context_service import ContextService
+from services.cluster_service import ClusterService
+from services.similarity_service import SimilarityService
+from services.embedding_index import EmbeddingIndex
+from services.label_service import LabelService
 from models.ticket import Ticket
+from models.cluster import TicketCluster
+from models.ticket_neighbor import TicketNeighbor
+from models.data_version import DataVersion
+from utils.http import conditional, sse_response
+from utils.serialization import stream_json_rows
 from extensions import db
 
 tickets_bp = Blueprint('tickets', __name__)
@@ -9,13 +20,14 @@ tickets_bp = Blueprint('tickets', __name__)
 
 
 @tickets_bp.route('/', methods=['GET'])
+@conditional(Ticket.__tablename__)
 def get_tickets():
     """
     Get all tickets.
+    Rows are streamed straight from column tuples; the embedding column is never loaded.
     """
     try:
-        tickets = Ticket.query.all()
-        return jsonify([ticket.to_dict() for ticket in tickets]), 200
+        return stream_json_rows(Ticket.serialized_columns(), csv_columns=('auto_tags',))
     except Exception as e:
         return jsonify({"error": str(e)}), 500
     
@@ -46,28 +58,9 @@ def analyze_ticket(ticket_id):
         return jsonify({"error": "Ticket not found"}), 404
     
     try:
-        # Categorize
-        analysis = AIService.classify_ticket(ticket.summary)
-        if analysis:
-            ticket.auto_category = analysis.get('category')
-            tags = analysis.get('tags')
-            if isinstance(tags, list):
-                ticket.auto_tags = ",".join(tags)
-            else:
-                ticket.auto_tags = str(tags)
-            ticket.sentiment_score = analysis.get('sentiment')
-        
-        #  Embedding
-        emb = AIService.generate_embedding(ticket.summary)
-        if emb:
-            import json
-            ticket.embedding = json.dumps(emb)
-        
-        # Generate AI solution (NEW)
-        suggestion = AIService.suggest_solution(ticket_id)
-        if suggestion and suggestion.get('suggested_solution'):
-            ticket.auto_solution = suggestion['suggested_solution']
+        TicketService.analyze_ticket(ticket)
         
+        DataVersion.bump(Ticket.__tablename__)
         db.session.commit()
         return jsonify(ticket.to_dict()), 200
     except Exception as e:
@@ -76,9 +69,11 @@ def analyze_ticket(ticket_id):
     
 
 @tickets_bp.route('/<int:ticket_id>/suggest-solution', methods=['GET'])
-def suggest_solution(ticket_id):
+@AIService.async_client_scope
+async def suggest_solution(ticket_id):
     """
     Suggest a solution for a ticket based on AI analysis and relevant knowledge base articles.
+    Query param: stream=true to receive the suggestion as Server-Sent Events.
     """
     try:
         # Get Ticket
@@ -86,21 +81,51 @@ def suggest_solution(ticket_id):
         if not ticket:
              return jsonify({"error": "Ticket not found"}), 404
 
-        # Get AI Suggestion based on similar tickets
-        suggestion = AIService.suggest_solution(ticket_id)
-        
-        # Search Knowledge Base
-        relevant_docs = AIService.find_relevant_knowledge(ticket.summary)
+        # One retrieval pass feeds both the prompt context and the relevant knowledge list.
+        context = ContextService.build_solution_context(ticket)
+
+        if request.args.get('stream', '').lower() == 'true':
+            return sse_response(_stream_suggestion(ticket_id, context))
+
+        suggestion = await AIService.asuggest_solution(ticket_id, context)
         
         return jsonify({
             "ai_suggestion": suggestion,
-            "relevant_knowledge": relevant_docs
+            "relevant_knowledge": context['relevant_knowledge'],
+            "context": _context_summary(context)
         }), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
 
+def _context_summary(context):
+    return {key: context[key] for key in ('tokens', 'token_budget', 'ticket_ids', 'article_ids')}
+
+
+def _stream_suggestion(ticket_id, context):
+    """
+    Events for ?stream=true: "token" deltas of the suggestion as they arrive, then a terminal
+    "result" event shaped like the non-streaming response, or a terminal "error" event.
+    """
+    messages = AIService._suggest_solution_messages(ticket_id, context)
+    suggestion = None
+    for event, data in AIService.stream_json_completion('suggest_solution', messages):
+        if event == 'result':
+            suggestion = data
+        else:
+            yield event, data
+            if event == 'error':
+                return
+
+    yield 'result', {
+        "ai_suggestion": suggestion,
+        "relevant_knowledge": context['relevant_knowledge'],
+        "context": _context_summary(context)
+    }
+
+
+
 @tickets_bp.route('/<int:ticket_id>/similar', methods=['GET'])
 def get_similar_tickets(ticket_id):
     """
@@ -114,6 +139,23 @@ def get_similar_tickets(ticket_id):
         return jsonify({"error": str(e)}), 500
 
 
+@tickets_bp.route('/duplicates', methods=['GET'])
+@conditional(TicketNeighbor.__tablename__)
+def get_duplicate_tickets():
+    """
+    Get likely duplicate ticket pairs from the precomputed neighbor table.
+    Query params: min_score (default 0.95), limit (default 100)
+    """
+    try:
+        pairs = SimilarityService.get_duplicate_pairs(
+            min_score=request.args.get('min_score', 0.95, type=float),
+            limit=request.args.get('limit', 100, type=int)
+        )
+        return jsonify(pairs), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 
 
 @tickets_bp.route('/import', methods=['POST'])
@@ -141,6 +183,7 @@ def import_tickets():
 
 
 @tickets_bp.route('/tags', methods=['GET'])
+@conditional(Ticket.__tablename__)
 def get_all_ticket_tags():
     """
     Get all unique tags from analyzed tickets with their occurrence count.
@@ -165,4 +208,129 @@ def get_tickets_by_tag(tag):
         result = AIService.get_tickets_by_tag(tag)
         return jsonify(result), 200
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
\ No newline at end of file
+        return jsonify({"error": str(e)}), 500
+
+
+@tickets_bp.route('/clusters', methods=['GET'])
+@conditional(TicketCluster.__tablename__, Ticket.__tablename__)
+def get_clusters():
+    """
+    Get recurring issue clusters by size, with representative tickets and growth.
+    Query params: limit (default 50), representatives (default 3), days of size history (default 30)
+    """
+    try:
+        clusters = ClusterService.get_clusters(
+            limit=request.args.get('limit', 50, type=int),
+            representatives=request.args.get('representatives', 3, type=int),
+            days=request.args.get('days', 30, type=int)
+        )
+        return jsonify(clusters), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@tickets_bp.cli.command('analyze-dirty')
+@click.option('--limit', type=int, default=None, help='Maximum number of tickets to analyze.')
+@click.option('--batch-size', type=int, default=50, help='Tickets per commit.')
+def analyze_dirty_command(limit, batch_size):
+    """
+    Analyze only tickets whose content changed since their last analysis.
+    Usage: flask --app run tickets analyze-dirty [--limit N]
+    """
+    pending = Ticket.query.filter(Ticket.needs_analysis == True).count()
+    click.echo(f"{pending} tickets need analysis")
+    analyzed = TicketService.analyze_dirty(limit=limit, batch_size=batch_size)
+    click.echo(f"Analyzed {analyzed} tickets")
+
+
+@tickets_bp.cli.command('upgrade-schema')
+def upgrade_schema_command():
+    """
+    Add the columns introduced since the tickets table was created, without re-queuing analyzed tickets.
+    Usage: flask --app run tickets upgrade-schema
+    """
+    added = TicketService.upgrade_schema()
+    click.echo(f"Added columns: {', '.join(added)}" if added else "Ticket columns already present")
+
+
+@tickets_bp.cli.command('create-indexes')
+def create_indexes_command():
+    """
+    Upgrade the tickets table (see upgrade-schema), then create the hot-path ticket indexes missing
+    from an existing database.
+    Usage: flask --app run tickets create-indexes
+    """
+    added = TicketService.upgrade_schema()
+    if added:
+        click.echo(f"Added columns: {', '.join(added)}")
+    created, dropped = TicketService.create_indexes()
+    if dropped:
+        click.echo(f"Dropped superseded indexes: {', '.join(dropped)}")
+    click.echo(f"Created indexes: {', '.join(created)}" if created else "All indexes already present")
+
+
+@tickets_bp.cli.command('benchmark-classification')
+@click.option('--sample', type=int, default=50, help='Number of tickets to classify with each path.')
+@click.option('--token-budget', type=int, default=None, help='Estimated prompt tokens per batch request.')
+def benchmark_classification_command(sample, token_budget):
+    """
+    Compare single-ticket and batch classification on a sample of tickets (nothing is saved).
+    Usage: flask --app run tickets benchmark-classification [--sample 50]
+    """
+    summaries = [s for (s,) in db.session.query(Ticket.summary).filter(Ticket.summary != None)
+                 .order_by(Ticket.id.desc()).limit(sample)]
+    result = AIService.benchmark_classification(summaries, token_budget)
+    for path in ('single', 'batch'):
+        r = result[path]
+        click.echo(f"{path:>6}: {r['classified']}/{r['tickets']} classified, {r['requests']} requests, "
+                   f"{r['tokens_per_ticket']} tokens/ticket, {r['tickets_per_second']} tickets/s")
+
+
+@tickets_bp.cli.command('cluster')
+@click.option('--k', type=int, default=ClusterService.DEFAULT_K, help='Number of clusters.')
+@click.option('--batch-size', type=int, default=ClusterService.BATCH_SIZE, help='Embeddings per mini-batch.')
+@click.option('--epochs', type=int, default=3, help='Passes over the embeddings.')
+def cluster_command(k, batch_size, epochs):
+    """
+    Re-fit issue clusters over all ticket embeddings (mini-batch k-means, warm-started).
+    Usage: flask --app run tickets cluster [--k 50]
+    """
+    result = ClusterService.run_clustering(k=k, batch_size=batch_size, epochs=epochs)
+    click.echo(f"Assigned {result['tickets']} tickets to {result['clusters']} clusters")
+
+
+@tickets_bp.cli.command('neighbors')
+@click.option('--k', type=int, default=SimilarityService.DEFAULT_K, help='Neighbors stored per ticket.')
+@click.option('--block-size', type=int, default=SimilarityService.BLOCK_SIZE, help='Rows per similarity tile.')
+@click.option('--workers', type=int, default=1, help='Processes computing row blocks in parallel.')
+def neighbors_command(k, block_size, workers):
+    """
+    Recompute every ticket's top-k similar tickets into ticket_neighbors.
+    Usage: flask --app run tickets neighbors [--k 10] [--workers 4]
+    """
+    result = SimilarityService.compute_neighbors(k=k, block_size=block_size, workers=workers)
+    click.echo(f"Stored {result['neighbors']} neighbors for {result['tickets']} tickets")
+
+
+@tickets_bp.cli.command('snapshot-embeddings')
+@click.option('--directory', default=None, help='Snapshot directory (defaults to EMBEDDING_SNAPSHOT_DIR).')
+def snapshot_embeddings_command(directory):
+    """
+    Write memory-mapped ticket and passage embedding snapshots that every worker on the host shares.
+    Usage: flask --app run tickets snapshot-embeddings
+    """
+    manifest = EmbeddingIndex.write_snapshot(directory)
+    counts = ', '.join(f"{info['count']} {kind}" for kind, info in manifest['kinds'].items())
+    click.echo(f"Wrote snapshot {manifest['version']} ({counts})")
+
+
+@tickets_bp.cli.command('canonicalize-labels')
+@click.option('--threshold', type=float, default=None, help='Similarity needed to merge a label into a canonical one.')
+def canonicalize_labels_command(threshold):
+    """
+    Merge the categories and tags already stored on tickets into canonical labels.
+    Usage: flask --app run tickets canonicalize-labels [--threshold 0.85]
+    """
+    stats = LabelService.merge_historical(threshold)
+    for kind, s in stats.items():
+        click.echo(f"{kind}: {s['labels']} labels -> {s['canonical']} canonical, {s['tickets_updated']} tickets updated")
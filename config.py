@@ -1,16 +1,54 @@
 import os
 
+
+def _engine_options(database_url, statement_timeout_ms=None):
+    """
+    Connection pool settings for a database URL, tuned through DB_* environment variables.
+    SQLite gets only the generic options since its pools do not take size/overflow.
+    """
+    options = {
+        'pool_pre_ping': os.environ.get('DB_POOL_PRE_PING', 'true').lower() != 'false',
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+    }
+    if database_url and not database_url.startswith('sqlite'):
+        options['pool_size'] = int(os.environ.get('DB_POOL_SIZE', 10))
+        options['max_overflow'] = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+        options['pool_timeout'] = int(os.environ.get('DB_POOL_TIMEOUT', 30))
+        if statement_timeout_ms and database_url.startswith('postgres'):
+            options['connect_args'] = {'options': f'-c statement_timeout={int(statement_timeout_ms)}'}
+    return options
+
+
+def _replica_binds(replica_url):
+    """
+    Bind read-only analytics/search queries to a replica when a URL is configured.
+    Analytics scans get their own (usually longer) statement timeout.
+    """
+    if not replica_url:
+        return {}
+    options = _engine_options(replica_url, os.environ.get('DB_REPLICA_STATEMENT_TIMEOUT_MS'))
+    return {'replica': {'url': replica_url, **options}}
+
+
 class Config:
-    SECRET_KEY = os.environ.get('SECRET_KEY') 
+    SECRET_KEY = os.environ.get('SECRET_KEY')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() != 'false'
+    # Shared memory-mapped embedding snapshots for vector search (disabled when unset)
+    EMBEDDING_SNAPSHOT_DIR = os.environ.get('EMBEDDING_SNAPSHOT_DIR')
+    EMBEDDING_SNAPSHOT_REFRESH_SECONDS = int(os.environ.get('EMBEDDING_SNAPSHOT_REFRESH_SECONDS', 30))
 
 class DevelopmentConfig(Config):
     DEBUG = True
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL_Dev')
+    SQLALCHEMY_ENGINE_OPTIONS = _engine_options(SQLALCHEMY_DATABASE_URI, os.environ.get('DB_STATEMENT_TIMEOUT_MS'))
+    SQLALCHEMY_BINDS = _replica_binds(os.environ.get('DATABASE_REPLICA_URL_Dev'))
 
 class ProductionConfig(Config):
     DEBUG = False
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL_Prod')
+    SQLALCHEMY_ENGINE_OPTIONS = _engine_options(SQLALCHEMY_DATABASE_URI, os.environ.get('DB_STATEMENT_TIMEOUT_MS'))
+    SQLALCHEMY_BINDS = _replica_binds(os.environ.get('DATABASE_REPLICA_URL_Prod'))
 
 config = {
     'development': DevelopmentConfig,
@@ -3,3 +3,16 @@ from flask_migrate import Migrate
 
 db = SQLAlchemy()
 migrate = Migrate()
+
+
+def read_engine():
+    """
+    Engine for read-only analytics and search queries: the 'replica' bind when configured,
+    otherwise the primary. Writes must keep using db.session's default bind.
+    """
+    return db.engines.get('replica') or db.engine
+
+
+def read_execute(statement):
+    """Execute a read-only statement against read_engine()."""
+    return db.session.execute(statement, bind_arguments={'bind': read_engine()})
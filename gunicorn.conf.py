@@ -0,0 +1,54 @@
+import gc
+import importlib
+import os
+
+# gunicorn run:app  (picks up this file automatically)
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+
+# LLM-backed routes spend seconds waiting on the network. Threaded workers keep many such
+# requests in flight per process; the async views additionally overlap independent LLM calls.
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.environ.get('GUNICORN_THREADS', 16))
+
+# Load the app once in the master and fork workers from it.
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'true').lower() != 'false'
+
+# Service modules import pandas/openai lazily so plain imports (CLI, dev server) stay fast.
+# Under --preload we import them once in the master instead, so every worker shares the pages.
+PRELOAD_MODULES = (
+    'pandas',
+    'openai',
+    'services.ticket_service',
+    'services.ai_service',
+    'services.analytics_service',
+)
+
+
+def when_ready(server):
+    if not server.cfg.preload_app:
+        return
+    for module in PRELOAD_MODULES:
+        try:
+            importlib.import_module(module)
+        except Exception as e:
+            server.log.warning(f"Could not preload {module}: {e}")
+    # Move everything allocated so far out of the GC's tracked generations so that
+    # collections in workers do not write to (and un-share) the inherited pages.
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    """
+    Drop state a worker must not share with its parent: pooled DB connections
+    and the OpenAI client's HTTP connection pool.
+    """
+    from extensions import db
+    from services.ai_service import AIService
+
+    app = server.app.wsgi()
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+    AIService._client = None
@@ -1,2 +1,10 @@
 from .ticket import Ticket
 from .knowledge import KnowledgeArticle
+from .data_version import DataVersion
+from .cluster import TicketCluster, TicketClusterSnapshot
+from .ticket_neighbor import TicketNeighbor
+from .resolution_sketch import ResolutionSketch
+from .trend import DailyTicketStat, TrendState
+from .knowledge_passage import KnowledgePassage
+from .label import CanonicalLabel, LabelAlias
+from .ai_usage import AIUsageBucket
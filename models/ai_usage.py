@@ -0,0 +1,19 @@
+from extensions import db
+
+class AIUsageBucket(db.Model):
+    """
+    LLM/embedding calls aggregated per minute and (operation, model, endpoint), shared by every
+    worker. bucket_start is a Unix timestamp; endpoint '' holds calls made outside a request.
+    Maintained by UsageService.flush.
+    """
+    __tablename__ = 'ai_usage_buckets'
+
+    bucket_start = db.Column(db.Integer, primary_key=True)
+    operation = db.Column(db.String(100), primary_key=True)
+    model = db.Column(db.String(100), primary_key=True)
+    endpoint = db.Column(db.String(200), primary_key=True)
+    calls = db.Column(db.Integer, default=0, nullable=False)
+    errors = db.Column(db.Integer, default=0, nullable=False)
+    prompt_tokens = db.Column(db.BigInteger, default=0, nullable=False)
+    completion_tokens = db.Column(db.BigInteger, default=0, nullable=False)
+    latency_seconds = db.Column(db.Float, default=0.0, nullable=False)
@@ -0,0 +1,35 @@
+from extensions import db
+from datetime import datetime
+
+class TicketCluster(db.Model):
+    __tablename__ = 'ticket_clusters'
+
+    id = db.Column(db.Integer, primary_key=True)
+    label = db.Column(db.String(200))  # most common auto_category among members
+    centroid = db.Column(db.Text, nullable=False)  # JSON list, unit length
+    size = db.Column(db.Integer, default=0, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    snapshots = db.relationship('TicketClusterSnapshot', backref='cluster', cascade='all, delete-orphan',
+                                lazy='dynamic')
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'label': self.label,
+            'size': self.size,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+        }
+
+
+class TicketClusterSnapshot(db.Model):
+    """Cluster size recorded at each clustering run, for growth over time."""
+    __tablename__ = 'ticket_cluster_snapshots'
+    __table_args__ = (db.UniqueConstraint('cluster_id', 'snapshot_date'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    cluster_id = db.Column(db.Integer, db.ForeignKey('ticket_clusters.id'), nullable=False, index=True)
+    snapshot_date = db.Column(db.Date, nullable=False)
+    size = db.Column(db.Integer, nullable=False)
@@ -0,0 +1,41 @@
+from extensions import db, read_execute
+from datetime import datetime
+
+class DataVersion(db.Model):
+    """
+    Monotonic per-table version counter, bumped in the same transaction as every write
+    that changes what list endpoints return. Used to build ETags without loading rows.
+    """
+    __tablename__ = 'data_versions'
+
+    table_name = db.Column(db.String(100), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    @staticmethod
+    def bump(table_name):
+        """
+        Increment the version of `table_name` in the current session; the caller commits.
+        Uses an atomic UPDATE so concurrent writers never collapse onto the same version.
+        """
+        result = db.session.execute(
+            db.update(DataVersion)
+            .where(DataVersion.table_name == table_name)
+            .values(version=DataVersion.version + 1, updated_at=datetime.utcnow())
+        )
+        if result.rowcount == 0:
+            db.session.add(DataVersion(table_name=table_name, version=1, updated_at=datetime.utcnow()))
+
+    @staticmethod
+    def get_versions(table_names, replica=False):
+        """
+        Return {table_name: version} for the given tables (0 for tables never bumped).
+        With replica=True the versions are read through read_execute, from the same engine as
+        replica-served rows, so a lagging replica never pairs its stale rows with a newer version.
+        """
+        statement = db.select(DataVersion.table_name, DataVersion.version) \
+            .where(DataVersion.table_name.in_(table_names))
+        rows = (read_execute(statement) if replica else db.session.execute(statement)).all()
+        versions = {name: 0 for name in table_names}
+        versions.update({name: version for name, version in rows})
+        return versions
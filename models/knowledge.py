@@ -13,6 +13,14 @@ class KnowledgeArticle(db.Model):
     embedding = db.Column(db.Text) 
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    passages = db.relationship('KnowledgePassage', backref='article', cascade='all, delete-orphan',
+                               lazy='dynamic', order_by='KnowledgePassage.position')
+
+    @classmethod
+    def serialized_columns(cls):
+        """Columns exposed by to_dict(), for row-level serialization that skips the ORM."""
+        return [cls.id, cls.title, cls.content, cls.url, cls.type, cls.tags, cls.created_at]
+
     def to_dict(self):
         
         tag_list = []
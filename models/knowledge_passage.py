@@ -0,0 +1,22 @@
+from extensions import db
+
+class KnowledgePassage(db.Model):
+    """
+    Overlapping passage of a knowledge article with its own embedding, for passage-level retrieval.
+    Written by KnowledgeService.index_article().
+    """
+    __tablename__ = 'knowledge_passages'
+
+    id = db.Column(db.Integer, primary_key=True)
+    article_id = db.Column(db.Integer, db.ForeignKey('knowledge_articles.id', ondelete='CASCADE'),
+                           nullable=False, index=True)
+    position = db.Column(db.Integer, nullable=False)  # 0-based order within the article
+    content = db.Column(db.Text, nullable=False)
+    embedding = db.Column(db.Text)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'position': self.position,
+            'content': self.content,
+        }
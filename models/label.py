@@ -0,0 +1,32 @@
+from extensions import db
+from datetime import datetime
+
+class CanonicalLabel(db.Model):
+    """
+    Canonical category or tag. Free-form labels from classification are mapped onto these by
+    LabelService (embedding similarity above a threshold), so near-synonyms share one label.
+    """
+    __tablename__ = 'canonical_labels'
+    __table_args__ = (
+        db.UniqueConstraint('kind', 'name', name='uq_canonical_labels_kind_name'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)  # 'category' or 'tag'
+    name = db.Column(db.String(100), nullable=False)
+    embedding = db.Column(db.Text)  # JSON list of floats
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class LabelAlias(db.Model):
+    """
+    Normalized raw label -> canonical label, so each distinct label is embedded and matched only once.
+    """
+    __tablename__ = 'label_aliases'
+
+    kind = db.Column(db.String(20), primary_key=True)
+    alias = db.Column(db.String(200), primary_key=True)
+    canonical_id = db.Column(db.Integer, db.ForeignKey('canonical_labels.id', ondelete='CASCADE'),
+                             nullable=False, index=True)
+    score = db.Column(db.Float)  # similarity to the canonical label when merged
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -0,0 +1,20 @@
+from extensions import db
+from datetime import datetime
+
+class ResolutionSketch(db.Model):
+    """
+    Resolution-time quantile sketch and due-date breach counters for one group of resolved tickets,
+    e.g. dimension='priority', value='High' (dimension='all', value='' for every ticket).
+    Maintained incrementally by SLAService on import.
+    """
+    __tablename__ = 'resolution_sketches'
+    __table_args__ = (db.UniqueConstraint('dimension', 'value'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    dimension = db.Column(db.String(50), nullable=False)
+    value = db.Column(db.String(200), nullable=False)
+    sketch = db.Column(db.Text, nullable=False)  # JSON, see utils.sketch.QuantileSketch
+    resolved = db.Column(db.Integer, default=0, nullable=False)
+    with_due_date = db.Column(db.Integer, default=0, nullable=False)
+    breached = db.Column(db.Integer, default=0, nullable=False)  # resolved after due_date
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
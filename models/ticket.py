@@ -3,6 +3,21 @@ from datetime import datetime
 
 class Ticket(db.Model):
     __tablename__ = 'tickets'
+    __table_args__ = (
+        # Volume/forecast queries: range on created_at, grouped by issue_type (index-only scan)
+        db.Index('ix_tickets_created_at_issue_type', 'created_at', 'issue_type'),
+        # Embedding scans (similarity, clustering, context) walk analyzed rows in id order
+        db.Index('ix_tickets_embedded_id', 'id',
+                 postgresql_where=db.text('embedding IS NOT NULL'),
+                 sqlite_where=db.text('embedding IS NOT NULL')),
+        # analyze-dirty walks the (usually small) dirty set in id order
+        db.Index('ix_tickets_needs_analysis_id', 'id',
+                 postgresql_where=db.text('needs_analysis'),
+                 sqlite_where=db.text('needs_analysis = 1')),
+        db.Index('ix_tickets_auto_category', 'auto_category'),
+        # Cluster members by centrality (representatives, draft-from-cluster)
+        db.Index('ix_tickets_cluster_id_score', 'cluster_id', 'cluster_score'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     issue_key = db.Column(db.String(50), unique=True, nullable=False)
@@ -22,10 +37,29 @@ class Ticket(db.Model):
 
     # AI Analysis Fields
     auto_category = db.Column(db.String(100))
+    category_id = db.Column(db.Integer, db.ForeignKey('canonical_labels.id', ondelete='SET NULL'),
+                            index=True)  # canonical label of auto_category (see LabelService)
     auto_tags = db.Column(db.Text)  
     sentiment_score = db.Column(db.Float)
     auto_solution = db.Column(db.Text)  
     embedding = db.Column(db.Text)
+    embedded_at = db.Column(db.DateTime)  # when embedding was last written (embedding snapshot deltas)
+
+    # Change detection: hash of the analyzed content + analysis version, and a dirty flag set on import
+    content_hash = db.Column(db.String(64))
+    needs_analysis = db.Column(db.Boolean, default=True, server_default=db.true(), nullable=False)
+
+    # Issue-theme clustering (see ClusterService)
+    cluster_id = db.Column(db.Integer, db.ForeignKey('ticket_clusters.id', ondelete='SET NULL'))
+    cluster_score = db.Column(db.Float)  # cosine similarity to the cluster centroid
+
+    @classmethod
+    def serialized_columns(cls):
+        """Columns exposed by to_dict(), for row-level serialization that skips the ORM."""
+        return [cls.id, cls.issue_key, cls.issue_id, cls.issue_type, cls.summary, cls.assignee,
+                cls.assignee_id, cls.reporter, cls.reporter_id, cls.status, cls.priority,
+                cls.created_at, cls.updated_at, cls.due_date, cls.auto_category, cls.auto_tags,
+                cls.sentiment_score, cls.auto_solution]
 
     def to_dict(self):
         # Parse auto_tags CSV into list
@@ -0,0 +1,19 @@
+from extensions import db
+from datetime import datetime
+
+class TicketNeighbor(db.Model):
+    """
+    Precomputed top-k most similar tickets per ticket, written by SimilarityService.compute_neighbors().
+    The (ticket_id, rank) primary key makes /tickets/<id>/similar a single index range scan.
+    """
+    __tablename__ = 'ticket_neighbors'
+    __table_args__ = (
+        db.Index('ix_ticket_neighbors_score', 'score'),  # duplicate report: score >= threshold
+    )
+
+    ticket_id = db.Column(db.Integer, db.ForeignKey('tickets.id', ondelete='CASCADE'), primary_key=True)
+    rank = db.Column(db.Integer, primary_key=True)  # 0 = most similar
+    neighbor_id = db.Column(db.Integer, db.ForeignKey('tickets.id', ondelete='CASCADE'), nullable=False,
+                            index=True)
+    score = db.Column(db.Float, nullable=False)  # cosine similarity
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -0,0 +1,29 @@
+from extensions import db
+
+class DailyTicketStat(db.Model):
+    """
+    Tickets created per day and category, with their sentiment sum, maintained by TrendService
+    on import and analysis. category '(all)' holds the daily totals.
+    """
+    __tablename__ = 'daily_ticket_stats'
+
+    day = db.Column(db.Date, primary_key=True)
+    category = db.Column(db.String(100), primary_key=True)
+    count = db.Column(db.Integer, default=0, nullable=False)
+    sentiment_sum = db.Column(db.Float, default=0.0, nullable=False)
+    sentiment_count = db.Column(db.Integer, default=0, nullable=False)
+
+
+class TrendState(db.Model):
+    """
+    EWMA mean/variance of one daily metric ('volume' or 'sentiment') for a category,
+    folded over every completed day up to through_date.
+    """
+    __tablename__ = 'trend_states'
+
+    metric = db.Column(db.String(20), primary_key=True)
+    category = db.Column(db.String(100), primary_key=True)
+    mean = db.Column(db.Float)
+    variance = db.Column(db.Float)
+    observations = db.Column(db.Integer, default=0, nullable=False)
+    through_date = db.Column(db.Date)  # None: rebuild from daily_ticket_stats on next read
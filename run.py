@@ -5,9 +5,12 @@ from flask_cors import CORS
 
 load_dotenv()
 
-from flask import Flask, app
+from flask import Flask
 from config import config
 from extensions import db, migrate
+from utils import metrics
+from utils.http import init_compression
+from services.usage_service import UsageService
 
 def create_app(config_name='default'):
     app = Flask(__name__)
@@ -22,11 +25,15 @@ def create_app(config_name='default'):
     
 
     # Initialize extensions
+    UsageService.init_app(app)  # before db: its teardown must run after the session is removed
     db.init_app(app)
     migrate.init_app(app, db)
+    metrics.init_app(app)
+    init_compression(app)
 
     # Register Models
-    from models import Ticket, KnowledgeArticle
+    from models import Ticket, KnowledgeArticle, DataVersion, TicketCluster, TicketClusterSnapshot, TicketNeighbor, \
+        ResolutionSketch, DailyTicketStat, TrendState, KnowledgePassage, CanonicalLabel, LabelAlias, AIUsageBucket
 
     # Register Blueprints
     from blueprints.tickets import tickets_bp
@@ -37,6 +44,9 @@ def create_app(config_name='default'):
     app.register_blueprint(analytics_bp, url_prefix='/analytics')
     app.register_blueprint(knowledge_bp, url_prefix='/knowledge')
 
+    from services.embedding_index import EmbeddingIndex
+    EmbeddingIndex.init_app(app)
+
 
 
     # Swagger UI (loads static/openapi.json)
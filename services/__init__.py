@@ -1,3 +1,23 @@
-from .ticket_service import TicketService
-from .ai_service import AIService
-from .analytics_service import AnalyticsService
+# Services are resolved lazily so importing one of them (or the package) does not
+# pull in pandas/openai for every other service at startup.
+_SERVICES = {
+    'TicketService': 'services.ticket_service',
+    'AIService': 'services.ai_service',
+    'AnalyticsService': 'services.analytics_service',
+    'UsageService': 'services.usage_service',
+    'ContextService': 'services.context_service',
+    'ClusterService': 'services.cluster_service',
+    'SimilarityService': 'services.similarity_service',
+    'SLAService': 'services.sla_service',
+    'TrendService': 'services.trend_service',
+    'KnowledgeService': 'services.knowledge_service',
+    'EmbeddingIndex': 'services.embedding_index',
+    'LabelService': 'services.label_service',
+}
+
+
+def __getattr__(name):
+    if name in _SERVICES:
+        import importlib
+        return getattr(importlib.import_module(_SERVICES[name]), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
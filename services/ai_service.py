@@ -1,21 +1,55 @@
 import os
 import json
+import time
+import asyncio
+import hashlib
+import weakref
+from functools import wraps
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
-from openai import OpenAI
-from openai import OpenAI
 from models.ticket import Ticket
 from models.knowledge import KnowledgeArticle
-from extensions import db
+from sqlalchemy import select
+from extensions import db, read_execute
+from utils.metrics import span, timed
+from utils.cache import LRUCache
+from services.usage_service import UsageService
+from services.context_service import ContextService
+from services.similarity_service import SimilarityService
+from services.knowledge_service import KnowledgeService
+from services.embedding_index import EmbeddingIndex
 
 class AIService:
     _client = None
+    _async_clients = weakref.WeakKeyDictionary()
+
+    CHAT_MODEL = "gpt-4o-mini"
+    EMBEDDING_MODEL = "text-embedding-3-small"
+    EMBEDDING_BATCH_SIZE = 100
+    # Batch classification: ticket summaries are packed into requests of at most CLASSIFY_BATCH_TOKENS
+    # (estimated) and CLASSIFY_BATCH_MAX_ITEMS tickets; invalid items are retried up to CLASSIFY_MAX_ATTEMPTS.
+    CLASSIFY_BATCH_TOKENS = int(os.getenv('CLASSIFY_BATCH_TOKENS', 3000))
+    CLASSIFY_BATCH_MAX_ITEMS = int(os.getenv('CLASSIFY_BATCH_MAX_ITEMS', 50))
+    CLASSIFY_MAX_ATTEMPTS = 3
+    # Bump the suffix when the classification/solution prompts change so tickets get re-analyzed.
+    ANALYSIS_VERSION = f"{CHAT_MODEL}|{EMBEDDING_MODEL}|analysis-v1"
+
+    # Map-reduce drafting: above DRAFT_SINGLE_PASS_TOKENS of ticket text, tickets are summarized
+    # in chunks of DRAFT_CHUNK_TOKENS with at most DRAFT_MAX_CONCURRENCY requests in flight.
+    DRAFT_SINGLE_PASS_TOKENS = int(os.getenv('DRAFT_SINGLE_PASS_TOKENS', 6000))
+    DRAFT_CHUNK_TOKENS = int(os.getenv('DRAFT_CHUNK_TOKENS', 3000))
+    DRAFT_MAX_CONCURRENCY = int(os.getenv('DRAFT_MAX_CONCURRENCY', 4))
+    _chunk_summaries = LRUCache(maxsize=2048)
 
     @classmethod
     def get_client(cls):
         """
         Initialize and return the OpenAI client. 
+        The SDK is imported on first use to keep application startup fast.
         """
         if cls._client is None:
+            from openai import OpenAI
+
             api_key = os.getenv('OPENAI_API_KEY')
             if not api_key:
                 # Fallback for dev/test if key not present, or raise error
@@ -24,8 +58,166 @@ class AIService:
             cls._client = OpenAI(api_key=api_key)
         return cls._client
 
+    @classmethod
+    def get_async_client(cls):
+        """
+        Return an AsyncOpenAI client for the running event loop.
+        Flask runs every async view on its own loop and httpx pools cannot cross loops, so one
+        client is shared by all calls on a loop; views close it through async_client_scope.
+        """
+        loop = asyncio.get_running_loop()
+        client = cls._async_clients.get(loop)
+        if client is None:
+            from openai import AsyncOpenAI
+
+            api_key = os.getenv('OPENAI_API_KEY')
+            if not api_key:
+                print("Warning: OPENAI_API_KEY not set.")
+                return None
+            client = cls._async_clients[loop] = AsyncOpenAI(api_key=api_key)
+        return client
+
+    @classmethod
+    async def close_async_client(cls):
+        """Close the running loop's AsyncOpenAI client and its connection pool, if one was created."""
+        client = cls._async_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.close()
+
+    @staticmethod
+    def async_client_scope(view):
+        """
+        Decorator for async views: calls made while the view runs share one AsyncOpenAI client,
+        which is closed before the view's event loop is discarded.
+        """
+        @wraps(view)
+        async def wrapper(*args, **kwargs):
+            try:
+                return await view(*args, **kwargs)
+            finally:
+                await AIService.close_async_client()
+        return wrapper
+
+    @staticmethod
+    def _chat_completion(operation, **kwargs):
+        """
+        Run a chat completion and record its latency and token usage in the ledger under `operation`.
+        """
+        client = AIService.get_client()
+        kwargs.setdefault('model', AIService.CHAT_MODEL)
+        start = time.perf_counter()
+        try:
+            with span('llm'):
+                response = client.chat.completions.create(**kwargs)
+        except Exception:
+            UsageService.record(operation, kwargs['model'], latency=time.perf_counter() - start, error=True)
+            raise
+        UsageService.record(operation, kwargs['model'], response.usage, time.perf_counter() - start)
+        return response
+
+    @staticmethod
+    def _create_embedding(operation, text):
+        """
+        Request embeddings for `text` (a string or list of strings) and record usage under `operation`.
+        """
+        client = AIService.get_client()
+        model = AIService.EMBEDDING_MODEL
+        start = time.perf_counter()
+        try:
+            with span('llm'):
+                response = client.embeddings.create(input=text, model=model)
+        except Exception:
+            UsageService.record(operation, model, latency=time.perf_counter() - start, error=True)
+            raise
+        UsageService.record(operation, model, response.usage, time.perf_counter() - start)
+        return response
+
+    @staticmethod
+    def _stream_chat_completion(operation, **kwargs):
+        """
+        Stream a chat completion, yielding content deltas as they arrive.
+        Usage is requested in the final chunk and recorded in the ledger once the stream ends, also
+        when the consumer stops early (client disconnect), which closes the upstream stream.
+        """
+        client = AIService.get_client()
+        kwargs.setdefault('model', AIService.CHAT_MODEL)
+        start = time.perf_counter()
+        usage = stream = None
+        error = False
+        try:
+            with span('llm'):
+                stream = client.chat.completions.create(
+                    stream=True, stream_options={"include_usage": True}, **kwargs
+                )
+                for chunk in stream:
+                    if chunk.usage:
+                        usage = chunk.usage
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+        except Exception:
+            error = True
+            raise
+        finally:
+            if stream is not None:
+                stream.close()
+            UsageService.record(operation, kwargs['model'], usage, time.perf_counter() - start, error=error)
+
+    @staticmethod
+    def stream_json_completion(operation, messages):
+        """
+        Stream a JSON-mode completion as (event, data) pairs.
+        Emits "token" events with content deltas, then a terminal "result" event with the parsed
+        object, or an "error" event if the call or the final parse fails.
+        """
+        if not AIService.get_client():
+            yield 'error', {"error": "AI service unavailable (API key missing)"}
+            return
+
+        parts = []
+        try:
+            for delta in AIService._stream_chat_completion(
+                operation, messages=messages, response_format={"type": "json_object"}
+            ):
+                parts.append(delta)
+                yield 'token', {"content": delta}
+            yield 'result', json.loads("".join(parts))
+        except Exception as e:
+            print(f"Error streaming {operation}: {e}")
+            yield 'error', {"error": str(e)}
+
+    @staticmethod
+    async def _achat_completion(operation, **kwargs):
+        """Async counterpart of _chat_completion using the AsyncOpenAI client."""
+        client = AIService.get_async_client()
+        kwargs.setdefault('model', AIService.CHAT_MODEL)
+        start = time.perf_counter()
+        try:
+            with span('llm'):
+                response = await client.chat.completions.create(**kwargs)
+        except Exception:
+            UsageService.record(operation, kwargs['model'], latency=time.perf_counter() - start, error=True)
+            raise
+        UsageService.record(operation, kwargs['model'], response.usage, time.perf_counter() - start)
+        return response
+
+    @staticmethod
+    async def _acreate_embedding(operation, text):
+        """Async counterpart of _create_embedding using the AsyncOpenAI client."""
+        client = AIService.get_async_client()
+        model = AIService.EMBEDDING_MODEL
+        start = time.perf_counter()
+        try:
+            with span('llm'):
+                response = await client.embeddings.create(input=text, model=model)
+        except Exception:
+            UsageService.record(operation, model, latency=time.perf_counter() - start, error=True)
+            raise
+        UsageService.record(operation, model, response.usage, time.perf_counter() - start)
+        return response
+
     @staticmethod
-    def generate_embedding(text):
+    @timed
+    def generate_embedding(text, operation='generate_embedding'):
         """
         Generate an embedding for the given text using OpenAI's embedding model.
         Returns a list of floats representing the embedding vector.
@@ -35,16 +227,34 @@ class AIService:
             return None
         
         try:
-            response = client.embeddings.create(
-                input=text,
-                model="text-embedding-3-small"
-            )
+            response = AIService._create_embedding(operation, text)
             return response.data[0].embedding
         except Exception as e:
             print(f"Error generating embedding: {e}")
             return None
 
     @staticmethod
+    def generate_embeddings(texts, operation='generate_embeddings'):
+        """
+        Embed many texts with one request per EMBEDDING_BATCH_SIZE inputs.
+        Returns a list of vectors aligned with `texts`, or None if any request fails.
+        """
+        client = AIService.get_client()
+        if not client or not texts:
+            return None
+
+        vectors = []
+        try:
+            for start in range(0, len(texts), AIService.EMBEDDING_BATCH_SIZE):
+                response = AIService._create_embedding(operation, texts[start:start + AIService.EMBEDDING_BATCH_SIZE])
+                vectors.extend(d.embedding for d in sorted(response.data, key=lambda d: d.index))
+            return vectors
+        except Exception as e:
+            print(f"Error generating embeddings: {e}")
+            return None
+
+    @staticmethod
+    @timed
     def classify_ticket(ticket_summary):
         """
         Classify a support ticket based on its summary.
@@ -66,8 +276,8 @@ class AIService:
         """
 
         try:
-            response = client.chat.completions.create(
-                model="gpt-4o-mini",
+            response = AIService._chat_completion(
+                'classify_ticket',
                 messages=[
                     {"role": "system", "content": "You are a helpful AI assistant for a support ticketing system."},
                     {"role": "user", "content": prompt}
@@ -80,74 +290,271 @@ class AIService:
             print(f"Error classifying ticket: {e}")
             return None
 
+    # Structured output for classify_tickets: one result per input item, keyed by its batch index
+    _CLASSIFY_BATCH_SCHEMA = {
+        "name": "ticket_classifications",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "results": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "id": {"type": "integer"},
+                            "category": {"type": "string"},
+                            "tags": {"type": "array", "items": {"type": "string"}},
+                            "sentiment": {"type": "number"}
+                        },
+                        "required": ["id", "category", "tags", "sentiment"],
+                        "additionalProperties": False
+                    }
+                }
+            },
+            "required": ["results"],
+            "additionalProperties": False
+        }
+    }
+
     @staticmethod
+    def _classify_batch_messages(summaries):
+        """
+        One prompt for many tickets. The instructions are sent once per batch and every summary is
+        numbered by its position, so responses can be matched back without echoing ticket ids.
+        """
+        items = "\n".join(json.dumps({"id": i, "summary": summary}) for i, summary in enumerate(summaries))
+        prompt = f"""
+        Analyze each of the following support ticket summaries (one JSON object per line) and extract:
+        1. A comprehensive category (e.g., "Login Issue", "Database Error", "UI Glitch").
+        2. A list of 1-3 keywords/tags.
+        3. A sentiment score from -1.0 (very negative) to 1.0 (very positive).
+
+        Tickets:
+        {items}
+
+        Return one result per ticket with its "id" and keys "category", "tags", "sentiment".
+        """
+        return [
+            {"role": "system", "content": "You are a helpful AI assistant for a support ticketing system."},
+            {"role": "user", "content": prompt}
+        ]
+
+    @staticmethod
+    def _valid_classification(result):
+        """A classification with a category, 1-3 string tags and a sentiment in [-1, 1], or None."""
+        if not isinstance(result, dict):
+            return None
+        category, tags, sentiment = result.get('category'), result.get('tags'), result.get('sentiment')
+        if not isinstance(category, str) or not category.strip():
+            return None
+        if not isinstance(tags, list) or not tags or not all(isinstance(t, str) and t.strip() for t in tags):
+            return None
+        if isinstance(sentiment, bool) or not isinstance(sentiment, (int, float)) or not -1 <= sentiment <= 1:
+            return None
+        return {"category": category.strip(), "tags": [t.strip() for t in tags[:3]], "sentiment": float(sentiment)}
+
+    @staticmethod
+    def _pack_classification_batches(items, token_budget):
+        """Greedily pack (key, summary) items into batches by estimated tokens and CLASSIFY_BATCH_MAX_ITEMS."""
+        batches, current, used = [], [], 0
+        for key, summary in items:
+            tokens = ContextService.estimate_tokens(summary) + 8  # JSON framing per line
+            if current and (used + tokens > token_budget or len(current) >= AIService.CLASSIFY_BATCH_MAX_ITEMS):
+                batches.append(current)
+                current, used = [], 0
+            current.append((key, summary))
+            used += tokens
+        if current:
+            batches.append(current)
+        return batches
+
+    @staticmethod
+    def _classify_batch(batch):
+        """Classify one packed batch. Returns {key: validated classification} for the items that came back valid."""
+        try:
+            response = AIService._chat_completion(
+                'classify_tickets',
+                messages=AIService._classify_batch_messages([summary for _, summary in batch]),
+                response_format={"type": "json_schema", "json_schema": AIService._CLASSIFY_BATCH_SCHEMA}
+            )
+            results = json.loads(response.choices[0].message.content).get('results', [])
+        except Exception as e:
+            print(f"Error classifying batch of {len(batch)} tickets: {e}")
+            return {}
+
+        classified = {}
+        for result in results:
+            index = result.get('id') if isinstance(result, dict) else None
+            # Unknown or repeated ids are dropped, so their items are retried
+            if isinstance(index, int) and 0 <= index < len(batch) and batch[index][0] not in classified:
+                analysis = AIService._valid_classification(result)
+                if analysis:
+                    classified[batch[index][0]] = analysis
+        return classified
+
+    @staticmethod
+    @timed
+    def classify_tickets(items, token_budget=None):
+        """
+        Classify many tickets with multi-ticket requests.
+        items: iterable of (key, summary). Returns {key: {"category", "tags", "sentiment"}}; keys whose
+        classification failed are missing. Items missing or invalid in a batch response are re-queued into
+        new batches with half the token budget; whatever still fails after CLASSIFY_MAX_ATTEMPTS rounds
+        goes through classify_ticket one by one.
+        """
+        pending = [(key, summary) for key, summary in items if summary]
+        if not pending or not AIService.get_client():
+            return {}
+
+        budget = token_budget or AIService.CLASSIFY_BATCH_TOKENS
+        classified = {}
+        for _ in range(AIService.CLASSIFY_MAX_ATTEMPTS):
+            for batch in AIService._pack_classification_batches(pending, budget):
+                classified.update(AIService._classify_batch(batch))
+            pending = [(key, summary) for key, summary in pending if key not in classified]
+            if not pending:
+                return classified
+            budget = max(1, budget // 2)
+
+        for key, summary in pending:
+            analysis = AIService._valid_classification(AIService.classify_ticket(summary))
+            if analysis:
+                classified[key] = analysis
+        return classified
+
+    @staticmethod
+    def benchmark_classification(summaries, token_budget=None):
+        """
+        Classify the same summaries with classify_ticket (one request each) and with classify_tickets,
+        reporting requests, tokens per ticket and tickets per second for both paths from the usage ledger.
+        """
+        def ledger():
+            return {g['name']: g for g in UsageService.get_usage_report(hours=2)['by_operation']}
+
+        def run(operations, classify):
+            before = ledger()
+            start = time.perf_counter()
+            classified = classify()
+            elapsed = time.perf_counter() - start
+            after = ledger()
+
+            def used(field):
+                return sum(after.get(op, {}).get(field, 0) - before.get(op, {}).get(field, 0) for op in operations)
+            tokens = used('total_tokens')
+            return {
+                "tickets": len(summaries),
+                "classified": classified,
+                "requests": used('calls'),
+                "prompt_tokens": used('prompt_tokens'),
+                "completion_tokens": used('completion_tokens'),
+                "tokens_per_ticket": round(tokens / len(summaries), 1) if summaries else 0,
+                "tickets_per_second": round(len(summaries) / elapsed, 2) if elapsed else None,
+            }
+
+        return {
+            "single": run(['classify_ticket'], lambda: sum(
+                1 for s in summaries if AIService._valid_classification(AIService.classify_ticket(s)))),
+            "batch": run(['classify_tickets', 'classify_ticket'], lambda: len(
+                AIService.classify_tickets(enumerate(summaries), token_budget))),
+        }
+
+    @staticmethod
+    @timed
     def find_similar_tickets(ticket_id, top_k=3):
         """
         Find similar tickets based on embedding similarity.
         Returns a list of similar tickets with their similarity score.
+        Served from the precomputed ticket_neighbors table when the ticket is covered by it
+        (see SimilarityService.compute_neighbors); otherwise falls back to a full scan.
         """
+        stored = SimilarityService.get_neighbors(ticket_id, top_k)
+        if stored is not None:
+            return stored
+
         target_ticket = Ticket.query.get(ticket_id)
         if not target_ticket or not target_ticket.embedding:
             return []
 
         target_emb = np.array(json.loads(target_ticket.embedding))
+
+        snapshot_hits = EmbeddingIndex.search('tickets', target_emb, top_k + 1)
+        if snapshot_hits is not None:
+            hits = [(score, i) for score, i in snapshot_hits if i != ticket_id][:top_k]
+            tickets = {t.id: t for t in read_execute(
+                select(Ticket).where(Ticket.id.in_([i for _, i in hits]))
+            ).scalars()}
+            return [{"score": score, "ticket": tickets[i].to_dict()} for score, i in hits if i in tickets]
+
+        # Fetch all other tickets with embeddings (replica when configured)
+        all_tickets = read_execute(
+            select(Ticket).where(Ticket.id != ticket_id, Ticket.embedding != None)
+        ).scalars().all()
         
-        # Fetch all other tickets with embeddings 
-        all_tickets = Ticket.query.filter(Ticket.id != ticket_id, Ticket.embedding != None).all()
-        
-        similarities = []
-        for t in all_tickets:
-            emb = np.array(json.loads(t.embedding))
-            # Cosine similarity
-            score = np.dot(target_emb, emb) / (np.linalg.norm(target_emb) * np.linalg.norm(emb))
-            similarities.append((score, t))
-        
-        # Sort by score desc
-        similarities.sort(key=lambda x: x[0], reverse=True)
+        with span('vector_search'):
+            similarities = []
+            for t in all_tickets:
+                emb = np.array(json.loads(t.embedding))
+                # Cosine similarity
+                score = np.dot(target_emb, emb) / (np.linalg.norm(target_emb) * np.linalg.norm(emb))
+                similarities.append((score, t))
+
+            # Sort by score desc
+            similarities.sort(key=lambda x: x[0], reverse=True)
         
         return [{"score": float(s[0]), "ticket": s[1].to_dict()} for s in similarities[:top_k]]
 
     @staticmethod
-    def suggest_solution(ticket_id):
+    def _suggest_solution_messages(ticket_id, context=None):
         """
-        Suggest a solution for a given support ticket based on similar past tickets.
-        Returns a JSON object with keys: "suggested_solution", "relevant_links".
+        Build the chat messages for suggest_solution, or None if the ticket does not exist.
+        `context` is a ContextService.build_solution_context() result; it is built here when omitted.
+        All database access for the suggestion happens here, before any LLM call.
         """
-        client = AIService.get_client()
-        if not client:
-            return None
-
         target_ticket = Ticket.query.get(ticket_id)
         if not target_ticket:
             return None
 
-        similar_tickets = AIService.find_similar_tickets(ticket_id, top_k=3)
-        
-        context_str = ""
-        for item in similar_tickets:
-            t = item['ticket']
-            context_str += f"- Issue: {t['summary']}\n  Resolution: {t.get('resolution', 'None')}\n\n"
+        if context is None:
+            context = ContextService.build_solution_context(target_ticket)
 
         prompt = f"""
         I have a new support ticket:
         Summary: "{target_ticket.summary}"
         Description: "{target_ticket.summary}" (Using summary as description for now)
 
-        Here are similar past tickets and their resolutions:
-        {context_str}
+        Here is context from similar resolved tickets and the knowledge base:
+        {context['context'] or 'None available.'}
 
         Based on this, suggest a solution for the new ticket. 
         Also provide a list of relevant documentation links.
         Return JSON with keys: "suggested_solution", "relevant_links".
         """
 
+        return [
+            {"role": "system", "content": "You are a technical support expert."},
+            {"role": "user", "content": prompt}
+        ]
+
+    @staticmethod
+    @timed
+    def suggest_solution(ticket_id, context=None):
+        """
+        Suggest a solution for a given support ticket based on similar past tickets and knowledge articles.
+        Returns a JSON object with keys: "suggested_solution", "relevant_links".
+        """
+        client = AIService.get_client()
+        if not client:
+            return None
+
+        messages = AIService._suggest_solution_messages(ticket_id, context)
+        if not messages:
+            return None
+
         try:
-            response = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": "You are a technical support expert."},
-                    {"role": "user", "content": prompt}
-                ],
+            response = AIService._chat_completion(
+                'suggest_solution',
+                messages=messages,
                 response_format={"type": "json_object"}
             )
             return json.loads(response.choices[0].message.content)
@@ -156,6 +563,42 @@ class AIService:
             return None
 
     @staticmethod
+    @timed
+    async def asuggest_solution(ticket_id, context=None):
+        """
+        Async variant of suggest_solution; the worker thread is free while the completion is in flight.
+        """
+        client = AIService.get_async_client()
+        if not client:
+            return None
+
+        messages = AIService._suggest_solution_messages(ticket_id, context)
+        if not messages:
+            return None
+
+        try:
+            response = await AIService._achat_completion(
+                'suggest_solution',
+                messages=messages,
+                response_format={"type": "json_object"}
+            )
+            return json.loads(response.choices[0].message.content)
+        except Exception as e:
+            print(f"Error suggesting solution: {e}")
+            return None
+
+    @staticmethod
+    def _rank_knowledge(query_emb, top_k):
+        """
+        Score knowledge articles against a query embedding at passage level (best passage per article).
+        """
+        return [
+            {"score": score, "article": article.to_dict(), "passage": passage}
+            for score, article, passage in KnowledgeService.search(query_emb, top_k)
+        ]
+
+    @staticmethod
+    @timed
     def find_relevant_knowledge(query_text, top_k=3):
         """
         Find top 3 relevant knowledge base articles based on a query string.
@@ -165,26 +608,198 @@ class AIService:
         if not client or not query_text:
             return []
 
-        query_emb = AIService.generate_embedding(query_text)
+        query_emb = AIService.generate_embedding(query_text, operation='find_relevant_knowledge')
         if not query_emb:
             return []
 
-        target_emb = np.array(query_emb)
-        
-        # Fetch knowledge articles with embeddings
-        articles = KnowledgeArticle.query.filter(KnowledgeArticle.embedding != None).all()
-        
-        similarities = []
-        for a in articles:
-            emb = np.array(json.loads(a.embedding))
-            score = np.dot(target_emb, emb) / (np.linalg.norm(target_emb) * np.linalg.norm(emb))
-            similarities.append((score, a))
-        
-        similarities.sort(key=lambda x: x[0], reverse=True)
+        return AIService._rank_knowledge(query_emb, top_k)
+
+    @staticmethod
+    @timed
+    async def afind_relevant_knowledge(query_text, top_k=3):
+        """
+        Async variant of find_relevant_knowledge.
+        """
+        client = AIService.get_async_client()
+        if not client or not query_text:
+            return []
+
+        try:
+            response = await AIService._acreate_embedding('find_relevant_knowledge', query_text)
+            query_emb = response.data[0].embedding
+        except Exception as e:
+            print(f"Error generating embedding: {e}")
+            return []
+
+        return AIService._rank_knowledge(query_emb, top_k)
+
+    @staticmethod
+    def _draft_ticket_lines(ticket_ids):
+        """
+        Prompt lines for the requested tickets, ordered by id so chunking is deterministic.
+        """
+        tickets = Ticket.query.filter(Ticket.id.in_(ticket_ids)).order_by(Ticket.id).all()
+        return [
+            f"- Issue: {t.summary}\n  Resolution: {t.resolution}\n  Sentiment: {t.sentiment_score}\n\n"
+            for t in tickets
+        ]
+
+    @staticmethod
+    def _chunk_lines(lines, chunk_tokens):
+        """Greedily pack lines into chunks of at most chunk_tokens (an oversized line gets its own chunk)."""
+        chunks, current, used = [], [], 0
+        for line in lines:
+            tokens = ContextService.estimate_tokens(line)
+            if current and used + tokens > chunk_tokens:
+                chunks.append(current)
+                current, used = [], 0
+            current.append(line)
+            used += tokens
+        if current:
+            chunks.append(current)
+        return chunks
+
+    @staticmethod
+    def _chunk_cache_key(chunk):
+        return hashlib.sha256((AIService.CHAT_MODEL + "".join(chunk)).encode()).hexdigest()
+
+    @staticmethod
+    def _chunk_summary_messages(chunk):
+        prompt = f"""
+        Summarize the following resolved support tickets for a knowledge base writer.
+        Describe the recurring problems, their root causes, and the resolutions that worked.
+        Be concise and keep concrete steps, error messages and product names.
+
+        Tickets:
+        {"".join(chunk)}
+
+        Return JSON with key: "summary".
+        """
+        return [
+            {"role": "system", "content": "You are a technical document writer."},
+            {"role": "user", "content": prompt}
+        ]
+
+    @staticmethod
+    def _summarize_chunk(chunk):
+        try:
+            response = AIService._chat_completion(
+                'draft_article_chunk_summary',
+                messages=AIService._chunk_summary_messages(chunk),
+                response_format={"type": "json_object"}
+            )
+            return json.loads(response.choices[0].message.content).get('summary')
+        except Exception as e:
+            print(f"Error summarizing ticket chunk: {e}")
+            return None
+
+    @staticmethod
+    async def _asummarize_chunk(chunk, semaphore):
+        async with semaphore:
+            try:
+                response = await AIService._achat_completion(
+                    'draft_article_chunk_summary',
+                    messages=AIService._chunk_summary_messages(chunk),
+                    response_format={"type": "json_object"}
+                )
+                return json.loads(response.choices[0].message.content).get('summary')
+            except Exception as e:
+                print(f"Error summarizing ticket chunk: {e}")
+                return None
+
+    @staticmethod
+    def _compose_draft_messages(material, ticket_count, summarized):
+        if summarized:
+            intro = (f"Based on the following summaries of {ticket_count} resolved support tickets "
+                     f"(summarized in groups), draft a new Knowledge Base Article.")
+            heading = "Ticket group summaries:"
+        else:
+            intro = "Based on the following resolved support tickets, draft a new Knowledge Base Article."
+            heading = "Tickets:"
+
+        prompt = f"""
+        {intro}
+        The article should include a Title, a comprehensive Body (explaining the issue and solution), and tags.
         
-        return [{"score": float(s[0]), "article": s[1].to_dict()} for s in similarities[:top_k]]
+        {heading}
+        {material}
+
+        Return JSON with keys: "title", "content", "tags" (list of strings).
+        """
+
+        return [
+            {"role": "system", "content": "You are a technical document writer."},
+            {"role": "user", "content": prompt}
+        ]
+
+    @staticmethod
+    def _plan_draft(ticket_ids):
+        """
+        Load the tickets and decide between a single prompt and map-reduce.
+        Returns (lines, chunks, cached_summaries); chunks is None for the single-prompt path.
+        """
+        lines = AIService._draft_ticket_lines(ticket_ids)
+        if not lines:
+            return None, None, None
+        total = sum(ContextService.estimate_tokens(line) for line in lines)
+        if total <= AIService.DRAFT_SINGLE_PASS_TOKENS:
+            return lines, None, None
+        chunks = AIService._chunk_lines(lines, AIService.DRAFT_CHUNK_TOKENS)
+        cached = [AIService._chunk_summaries.get(AIService._chunk_cache_key(c)) for c in chunks]
+        return lines, chunks, cached
+
+    @staticmethod
+    def _finish_draft(lines, chunks, summaries):
+        for chunk, summary in zip(chunks, summaries):
+            if summary:
+                AIService._chunk_summaries.set(AIService._chunk_cache_key(chunk), summary)
+        summaries = [s for s in summaries if s]
+        if not summaries:
+            return None
+        material = "\n".join(f"Group {i + 1}:\n{s}\n" for i, s in enumerate(summaries))
+        return AIService._compose_draft_messages(material, len(lines), summarized=True)
 
     @staticmethod
+    def _draft_article_messages(ticket_ids):
+        """
+        Build the chat messages for draft_article_from_tickets, or None if no ticket matches.
+        Ticket sets larger than DRAFT_SINGLE_PASS_TOKENS are chunked, summarized in parallel
+        (bounded by DRAFT_MAX_CONCURRENCY, cached per chunk) and composed from the summaries.
+        """
+        lines, chunks, summaries = AIService._plan_draft(ticket_ids)
+        if not lines:
+            return None
+        if chunks is None:
+            return AIService._compose_draft_messages("".join(lines), len(lines), summarized=False)
+
+        missing = [i for i, summary in enumerate(summaries) if not summary]
+        if missing:
+            with ThreadPoolExecutor(max_workers=AIService.DRAFT_MAX_CONCURRENCY) as pool:
+                for i, summary in zip(missing, pool.map(lambda i: AIService._summarize_chunk(chunks[i]), missing)):
+                    summaries[i] = summary
+        return AIService._finish_draft(lines, chunks, summaries)
+
+    @staticmethod
+    async def _adraft_article_messages(ticket_ids):
+        """
+        Async variant of _draft_article_messages; chunk summaries run concurrently on the event loop.
+        """
+        lines, chunks, summaries = AIService._plan_draft(ticket_ids)
+        if not lines:
+            return None
+        if chunks is None:
+            return AIService._compose_draft_messages("".join(lines), len(lines), summarized=False)
+
+        missing = [i for i, summary in enumerate(summaries) if not summary]
+        if missing:
+            semaphore = asyncio.Semaphore(AIService.DRAFT_MAX_CONCURRENCY)
+            results = await asyncio.gather(*(AIService._asummarize_chunk(chunks[i], semaphore) for i in missing))
+            for i, summary in zip(missing, results):
+                summaries[i] = summary
+        return AIService._finish_draft(lines, chunks, summaries)
+
+    @staticmethod
+    @timed
     def draft_article_from_tickets(ticket_ids):
         """
         Draft a knowledge base article based on resolved tickets.
@@ -194,31 +809,39 @@ class AIService:
         if not client:
             return None
 
-        tickets = Ticket.query.filter(Ticket.id.in_(ticket_ids)).all()
-        if not tickets:
+        messages = AIService._draft_article_messages(ticket_ids)
+        if not messages:
             return None
 
-        context = ""
-        for t in tickets:
-            context += f"- Issue: {t.summary}\n  Resolution: {t.resolution}\n  Sentiment: {t.sentiment_score}\n\n"
-
-        prompt = f"""
-        Based on the following resolved support tickets, draft a new Knowledge Base Article.
-        The article should include a Title, a comprehensive Body (explaining the issue and solution), and tags.
-        
-        Tickets:
-        {context}
+        try:
+            response = AIService._chat_completion(
+                'draft_article_from_tickets',
+                messages=messages,
+                response_format={"type": "json_object"}
+            )
+            return json.loads(response.choices[0].message.content)
+        except Exception as e:
+            print(f"Error drafting article: {e}")
+            return None
 
-        Return JSON with keys: "title", "content", "tags" (list of strings).
+    @staticmethod
+    @timed
+    async def adraft_article_from_tickets(ticket_ids):
         """
+        Async variant of draft_article_from_tickets.
+        """
+        client = AIService.get_async_client()
+        if not client:
+            return None
+
+        messages = await AIService._adraft_article_messages(ticket_ids)
+        if not messages:
+            return None
 
         try:
-            response = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": "You are a technical document writer."},
-                    {"role": "user", "content": prompt}
-                ],
+            response = await AIService._achat_completion(
+                'draft_article_from_tickets',
+                messages=messages,
                 response_format={"type": "json_object"}
             )
             return json.loads(response.choices[0].message.content)
@@ -229,17 +852,18 @@ class AIService:
 
 
     @staticmethod
+    @timed
     def get_all_ticket_tags():
         """
         Get all unique tags from analyzed tickets.
         Returns a list of tags with count of tickets that have each tag.
         """
-        tickets = Ticket.query.filter(Ticket.auto_tags != None).all()
+        tag_rows = read_execute(select(Ticket.auto_tags).where(Ticket.auto_tags != None)).scalars()
         
         tag_counts = {}
-        for ticket in tickets:
-            if ticket.auto_tags:
-                tags = [t.strip() for t in str(ticket.auto_tags).split(',') if t.strip()]
+        for auto_tags in tag_rows:
+            if auto_tags:
+                tags = [t.strip() for t in str(auto_tags).split(',') if t.strip()]
                 for tag in tags:
                     tag_counts[tag] = tag_counts.get(tag, 0) + 1
         
@@ -254,12 +878,13 @@ class AIService:
         ]
 
     @staticmethod
+    @timed
     def get_tickets_by_tag(tag):
         """
         Get all tickets that have a specific tag.
         Returns tickets with basic info and their solutions.
         """
-        tickets = Ticket.query.filter(Ticket.auto_tags != None).all()
+        tickets = read_execute(select(Ticket).where(Ticket.auto_tags != None)).scalars()
         
         matching_tickets = []
         for ticket in tickets:
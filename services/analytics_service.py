@@ -1,255 +1,355 @@
-from flask_migrate import history
-import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 from models.ticket import Ticket
 from services.ai_service import AIService
-from extensions import db
+from sqlalchemy import select, func
+from extensions import db, read_execute
+from utils import forecasting
+from utils.cache import LRUCache
+from utils.metrics import span, timed
 import json
 import warnings
 warnings.filterwarnings('ignore')
 
 class AnalyticsService:
+    # Dimensions accepted by get_volume(group_by=...)
+    GROUPABLE = {
+        'issue_type': Ticket.issue_type,
+        'priority': Ticket.priority,
+        'status': Ticket.status,
+        'resolution': Ticket.resolution,
+        'assignee': Ticket.assignee,
+        'reporter': Ticket.reporter,
+        'auto_category': Ticket.auto_category,
+        'cluster_id': Ticket.cluster_id,
+    }
+    BUCKETS = ('day', 'week', 'month')
+    OTHER = 'other'
+    ISSUE_TYPES = ('Bug', 'Feature Request', 'Support', 'Task')
+    NONE_LABEL = '(none)'
+    BACKTEST_MAX_ORIGINS = 60
+    # Prediction intervals: default quantiles and Monte Carlo paths per series
+    INTERVAL_LOWER = 0.1
+    INTERVAL_UPPER = 0.9
+    SIMULATION_PATHS = 2000
+    # Backtest reports keyed by series and counts
+    _model_cache = LRUCache(maxsize=256)
+
     @staticmethod
-    def get_ticket_volume_history(days=30):
+    def _floor_dates(days, bucket):
+        """Floor datetime64[D] values to the start of their day, ISO week (Monday) or month."""
+        if bucket == 'week':
+            # 1970-01-01 was a Thursday
+            return days - ((days.astype(np.int64) + 3) % 7).astype('timedelta64[D]')
+        if bucket == 'month':
+            return days.astype('datetime64[M]').astype('datetime64[D]')
+        return days
+
+    @staticmethod
+    def _bucket_grid(start, end, bucket):
+        """Every bucket start between two dates, inclusive, as datetime64[D]."""
+        first, last = AnalyticsService._floor_dates(np.array([start, end], dtype='datetime64[D]'), bucket)
+        if bucket == 'month':
+            return np.arange(first.astype('datetime64[M]'), last.astype('datetime64[M]') + 1).astype('datetime64[D]')
+        step = 7 if bucket == 'week' else 1
+        return np.arange(first, last + 1, step)
+
+    @staticmethod
+    def _cap_dimension(values, counts, top_n):
+        """Keep the top_n values of one dimension by total count and roll the rest into OTHER."""
+        labels, inverse = np.unique(values, return_inverse=True)
+        if top_n is None or len(labels) <= top_n:
+            return values
+        totals = np.bincount(inverse, weights=counts)
+        keep = np.zeros(len(labels), dtype=bool)
+        keep[np.argsort(-totals, kind='stable')[:top_n]] = True
+        return np.where(keep[inverse], values, AnalyticsService.OTHER)
+
+    @staticmethod
+    @timed
+    def get_volume(group_by=(), bucket='day', days=30, top_n=10):
         """
-        Aggregate ticket counts by day for the last N days.
+        Ticket counts per time bucket, optionally split by any GROUPABLE dimensions.
+        Compiles to one SQL aggregate (per day and dimension values); week/month roll-up, gap filling
+        and top-N-plus-"other" capping of each dimension happen vectorized in NumPy.
+        Returns {"bucket", "group_by", "buckets": [date], "total": [int],
+                 "series": [{"key": {dim: value}, "total": int, "counts": [int]}]} with series largest first.
         """
+        group_by = list(group_by)
+        unknown = [d for d in group_by if d not in AnalyticsService.GROUPABLE]
+        if unknown:
+            raise ValueError(f"Cannot group by {', '.join(unknown)}; "
+                             f"choose from {', '.join(AnalyticsService.GROUPABLE)}")
+        if bucket not in AnalyticsService.BUCKETS:
+            raise ValueError(f"bucket must be one of {', '.join(AnalyticsService.BUCKETS)}")
+
         end_date = datetime.now()
         start_date = end_date - timedelta(days=days)
-        
-        # Query tickets created in range
-        tickets = Ticket.query.filter(Ticket.created_at >= start_date).all()
-        
-        # Create a DataFrame
-        data = [{'created_at': t.created_at} for t in tickets if t.created_at]
-        if not data:
-            # Return empty days for the range
-            date_range = pd.date_range(start=start_date.date(), end=end_date.date())
-            result = []
-            for date in date_range:
-                result.append({
-                    'date': date.strftime('%Y-%m-%d'),
-                    'count': 0
-                })
-            return result
-            
-        df = pd.DataFrame(data)
-        df['date'] = df['created_at'].dt.date
-        
-        # Group by date and count
-        daily_counts = df.groupby('date').size().reset_index(name='count')
-        
-        # Ensure all dates in range are present (fill gaps with 0)
-        date_range = pd.date_range(start=start_date.date(), end=end_date.date())
-        daily_counts.set_index('date', inplace=True)
-        daily_counts = daily_counts.reindex(date_range, fill_value=0).reset_index()
-        daily_counts.rename(columns={'index': 'date'}, inplace=True)
-        
-        # Convert to list of dicts
-        result = []
-        for _, row in daily_counts.iterrows():
-            result.append({
-                'date': row['date'].strftime('%Y-%m-%d'),
-                'count': int(row['count'])
-            })
-            
-        return result
+        tomorrow = datetime.combine(end_date.date() + timedelta(days=1), datetime.min.time())
+        grid = AnalyticsService._bucket_grid(start_date.date(), end_date.date(), bucket)
+
+        day = func.date(Ticket.created_at)
+        columns = [AnalyticsService.GROUPABLE[d] for d in group_by]
+        rows = read_execute(
+            select(day, *columns, func.count())
+            # Future-dated tickets (bad imports, clock skew) fall outside the grid and are ignored
+            .where(Ticket.created_at >= start_date, Ticket.created_at < tomorrow)
+            .group_by(day, *columns)
+        ).all()
+
+        if rows:
+            row_days = np.array([str(r[0])[:10] for r in rows], dtype='datetime64[D]')
+            counts = np.array([r[-1] for r in rows], dtype=np.int64)
+            bucket_idx = np.searchsorted(grid, AnalyticsService._floor_dates(row_days, bucket))
+        else:
+            counts = np.zeros(0, dtype=np.int64)
+            bucket_idx = np.zeros(0, dtype=np.int64)
+
+        # One label column per dimension, capped to its top_n values
+        dims = []
+        for i, _ in enumerate(group_by, start=1):
+            values = np.array([AnalyticsService.NONE_LABEL if r[i] is None else str(r[i]) for r in rows],
+                              dtype=object)
+            dims.append(AnalyticsService._cap_dimension(values, counts, top_n).astype(str))
+
+        if dims and rows:
+            keys = np.array(['\x1f'.join(parts) for parts in zip(*dims)], dtype=object)
+            labels, series_idx = np.unique(keys, return_inverse=True)
+        else:
+            labels, series_idx = np.array([''], dtype=object), np.zeros(len(rows), dtype=np.int64)
+
+        matrix = np.zeros((len(labels), len(grid)), dtype=np.int64)
+        np.add.at(matrix, (series_idx, bucket_idx), counts)
+
+        series = []
+        if group_by and rows:
+            totals = matrix.sum(axis=1)
+            series = [
+                {"key": dict(zip(group_by, labels[i].split('\x1f'))),
+                 "total": int(totals[i]),
+                 "counts": matrix[i].tolist()}
+                for i in np.argsort(-totals, kind='stable')
+            ]
+
+        return {
+            "bucket": bucket,
+            "group_by": group_by,
+            "buckets": [str(d) for d in grid],
+            "total": matrix.sum(axis=0).tolist(),
+            "series": series
+        }
 
     @staticmethod
+    def forecast_volume_series(volume, periods=7):
+        """
+        Forecast every series (and the total) of a get_volume() result for `periods` further buckets.
+        The first and last buckets only cover part of their period (the window starts mid-bucket and
+        the current bucket is still filling), so models are fitted on the complete buckets between
+        them. Week and month series are forecast without the weekly-season models.
+        Returns {"buckets": [date], "total": [int], "series": [{"key", "counts"}]}.
+        """
+        bucket = volume["bucket"]
+        grid = np.array(volume["buckets"], dtype='datetime64[D]')
+        if bucket == 'month':
+            future = (grid[-1].astype('datetime64[M]') + np.arange(1, periods + 1)).astype('datetime64[D]')
+        else:
+            future = grid[-1] + np.arange(1, periods + 1) * (7 if bucket == 'week' else 1)
+        models = None if bucket == 'day' else forecasting.NONSEASONAL
+
+        def forecast(counts, key):
+            history = [{'date': d, 'count': c} for d, c in zip(volume["buckets"][1:-1], counts[1:-1])]
+            # One extra step: the first forecast step is the current, incomplete bucket
+            _, values = AnalyticsService._point_forecast(history, periods + 1, series=(bucket, key),
+                                                         models=models)
+            return np.maximum(0, np.rint(values[1:])).astype(int).tolist()
+
+        return {
+            "buckets": [str(d) for d in future],
+            "total": forecast(volume["total"], 'total'),
+            "series": [{"key": s["key"], "counts": forecast(s["counts"], json.dumps(s["key"], sort_keys=True))}
+                       for s in volume["series"]]
+        }
+
+    @staticmethod
+    @timed
+    def get_ticket_volume_history(days=30):
+        """
+        Aggregate ticket counts by day for the last N days.
+        """
+        volume = AnalyticsService.get_volume(days=days)
+        return [{'date': d, 'count': c} for d, c in zip(volume['buckets'], volume['total'])]
+
+    @staticmethod
+    @timed
     def get_ticket_volume_by_type(days=30):
         """
         Get ticket volume history broken down by issue type.
         Returns: {date: str, Bug: int, Feature Request: int, Support: int, Task: int, total: int}
         """
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=days)
-        
-        tickets = Ticket.query.filter(Ticket.created_at >= start_date).all()
-        
-        if not tickets:
-            date_range = pd.date_range(start=start_date.date(), end=end_date.date())
-            result = []
-            for date in date_range:
-                result.append({
-                    'date': date.strftime('%Y-%m-%d'),
-                    'Bug': 0,
-                    'Feature Request': 0,
-                    'Support': 0,
-                    'Task': 0,
-                    'total': 0
-                })
-            return result
-        
-        # Create DataFrame with dates and types
-        data = [{'created_at': t.created_at, 'issue_type': t.issue_type} for t in tickets if t.created_at]
-        df = pd.DataFrame(data)
-        df['date'] = df['created_at'].dt.date
-        
-        # Pivot by type
-        type_counts = df.groupby(['date', 'issue_type']).size().unstack(fill_value=0)
-        
-        # Ensure all dates in range
-        date_range = pd.date_range(start=start_date.date(), end=end_date.date())
-        type_counts = type_counts.reindex(date_range, fill_value=0)
-        
-        # Ensure all types exist as columns
-        for issue_type in ['Bug', 'Feature Request', 'Support', 'Task']:
-            if issue_type not in type_counts.columns:
-                type_counts[issue_type] = 0
-        
-        # Build result
+        volume = AnalyticsService.get_volume(group_by=['issue_type'], days=days, top_n=None)
+        by_type = {s['key']['issue_type']: s['counts'] for s in volume['series']}
+        zeros = [0] * len(volume['buckets'])
+
         result = []
-        for date_idx, row in type_counts.iterrows():
-            total = int(row[['Bug', 'Feature Request', 'Support', 'Task']].sum())
-            result.append({
-                'date': date_idx.strftime('%Y-%m-%d'),
-                'Bug': int(row.get('Bug', 0)),
-                'Feature Request': int(row.get('Feature Request', 0)),
-                'Support': int(row.get('Support', 0)),
-                'Task': int(row.get('Task', 0)),
-                'total': total
-            })
-        
+        for i, date in enumerate(volume['buckets']):
+            row = {'date': date}
+            for issue_type in AnalyticsService.ISSUE_TYPES:
+                row[issue_type] = by_type.get(issue_type, zeros)[i]
+            row['total'] = sum(row[t] for t in AnalyticsService.ISSUE_TYPES)
+            result.append(row)
         return result
 
     @staticmethod
-    def forecast_future_volume(history, days_to_forecast=7):
+    def select_forecast_model(history, days_to_forecast=7, series='total', models=None):
+        """
+        Backtest report for one series (see forecasting.backtest), choosing the model among `models`
+        (default all) that forecasts it best.
+        Cached per (series, window, counts, horizon, models): the report depends only on the counts,
+        so series that share a name but not their data never share a report.
+        """
+        counts = tuple(h['count'] for h in history)
+        key = (series, history[0]['date'] if history else None, counts, days_to_forecast, models)
+        cached = AnalyticsService._model_cache.get(key)
+        if cached is not None:
+            return cached
+        report = forecasting.backtest(list(counts), days_to_forecast, models=models,
+                                      max_origins=AnalyticsService.BACKTEST_MAX_ORIGINS)
+        AnalyticsService._model_cache.set(key, report)
+        return report
+
+    @staticmethod
+    @timed
+    def backtest_forecasts(days=90, days_to_forecast=7):
         """
-        Forecast using Exponential Smoothing as primary method.
-        More stable and appropriate for business ticket data.
+        Rolling-origin accuracy of every forecasting model on total volume (every ticket, as
+        forecast_future_volume sees it) and on each issue type.
+        Returns {"total": report, "by_type": {issue_type: report}}.
+        """
+        total = AnalyticsService.get_ticket_volume_history(days)
+        by_type = AnalyticsService.get_ticket_volume_by_type(days)
+        return {
+            "total": AnalyticsService.select_forecast_model(total, days_to_forecast),
+            "by_type": {
+                issue_type: AnalyticsService.select_forecast_model(
+                    [{'date': h['date'], 'count': h[issue_type]} for h in by_type], days_to_forecast, issue_type)
+                for issue_type in AnalyticsService.ISSUE_TYPES
+            }
+        }
+
+    @staticmethod
+    def _interval_bounds(lower, upper):
+        lower = AnalyticsService.INTERVAL_LOWER if lower is None else lower
+        upper = AnalyticsService.INTERVAL_UPPER if upper is None else upper
+        if not 0 <= lower < upper <= 1:
+            raise ValueError("lower and upper must be quantiles with 0 <= lower < upper <= 1")
+        return lower, upper
+
+    @staticmethod
+    def _point_forecast(history, days_to_forecast, model=None, series='total', models=None):
+        """
+        (model, values) for one series, with the best of `models` (default all) unless `model` is given.
+        Model is None when the history is too short to fit one and the last value is repeated.
         """
         if len(history) < 3:
-            # Not enough data, repeat last value
             last_count = history[-1]['count'] if history else 0
-            last_date = datetime.strptime(history[-1]['date'], '%Y-%m-%d') if history else datetime.now()
-            return [{'date': (last_date + timedelta(days=i+1)).strftime('%Y-%m-%d'), 
-                    'count': int(last_count)} for i in range(days_to_forecast)]
-        
-        df = pd.DataFrame(history)
-        df['date'] = pd.to_datetime(df['date'])
-        series = df.set_index('date')['count'].astype(float)
-        
+            return None, np.full(days_to_forecast, float(last_count))
+
+        counts = [h['count'] for h in history]
         try:
-            # Use ExponentialSmoothing as primary (conservative, stable)
-            return AnalyticsService._forecast_exponential_smoothing(history, days_to_forecast)
+            model = model or AnalyticsService.select_forecast_model(
+                history, days_to_forecast, series, models)['selected']
+            return model, forecasting.forecast(model, counts, days_to_forecast)
         except Exception as e:
-            print(f"ExponentialSmoothing failed: {e}, falling back to linear")
-            return AnalyticsService._forecast_linear(history, days_to_forecast)
+            print(f"Forecast model {model} failed: {e}, falling back to linear")
+            return 'linear', forecasting.forecast('linear', counts, days_to_forecast)
+
+    @staticmethod
+    def _forecast_paths(history, days_to_forecast, model=None, series='total'):
+        """
+        Point forecast and simulated sample paths (SIMULATION_PATHS x days_to_forecast) for one series.
+        Paths are None when no model could be fitted.
+        """
+        model, values = AnalyticsService._point_forecast(history, days_to_forecast, model, series)
+        if model is None:
+            return values, None
+        with span('forecast_simulation'):
+            paths = forecasting.simulate(model, [h['count'] for h in history], days_to_forecast,
+                                         AnalyticsService.SIMULATION_PATHS)
+        return values, paths
+
+    @staticmethod
+    def _forecast_dates(history, days_to_forecast):
+        last_date = datetime.strptime(history[-1]['date'], '%Y-%m-%d') if history else datetime.now()
+        return [(last_date + timedelta(days=i+1)).strftime('%Y-%m-%d') for i in range(days_to_forecast)]
+
+    @staticmethod
+    def _quantiles(values, paths, lower, upper):
+        """Rounded, non-negative point forecast and interval bounds from sample paths."""
+        if paths is None:
+            bounds = np.vstack([values, values])
+        else:
+            bounds = np.quantile(paths, [lower, upper], axis=0)
+        rounded = np.maximum(0, np.rint(np.vstack([values, bounds]))).astype(int)
+        # Keep the point inside its interval after rounding
+        return rounded[0], np.minimum(rounded[1], rounded[0]), np.maximum(rounded[2], rounded[0])
+
+    @staticmethod
+    @timed
+    def forecast_future_volume(history, days_to_forecast=7, model=None, series='total', lower=None, upper=None):
+        """
+        Forecast daily volume with the model that backtests best on this series
+        (see select_forecast_model), or with `model` when given.
+        lower/upper bound the `lower`..`upper` quantile prediction interval of each day, taken from
+        Monte Carlo paths that bootstrap the model's residuals.
+        """
+        lower, upper = AnalyticsService._interval_bounds(lower, upper)
+        values, paths = AnalyticsService._forecast_paths(history, days_to_forecast, model, series)
+        counts, low, high = AnalyticsService._quantiles(values, paths, lower, upper)
+        return [{'date': date, 'count': int(counts[i]), 'lower': int(low[i]), 'upper': int(high[i])}
+                for i, date in enumerate(AnalyticsService._forecast_dates(history, days_to_forecast))]
 
     @staticmethod
-    def forecast_volume_by_type(history_by_type, days_to_forecast=7):
+    @timed
+    def forecast_volume_by_type(history_by_type, days_to_forecast=7, lower=None, upper=None):
         """
         Forecast ticket volume by type.
         history_by_type: list of dicts with {date, Bug, Feature Request, Support, Task, total}
-        Returns: list of dicts with same structure for forecasted dates
+        Returns: list of dicts with same structure for forecasted dates, plus "lower" and "upper"
+        dicts holding each type's (and the total's) prediction interval bounds.
+        The total's interval comes from summing the types' simulated paths.
         """
-        if len(history_by_type) < 3:
-            last = history_by_type[-1] if history_by_type else {}
-            last_date = datetime.strptime(last.get('date', datetime.now().strftime('%Y-%m-%d')), '%Y-%m-%d')
-            return [{'date': (last_date + timedelta(days=i+1)).strftime('%Y-%m-%d'),
-                     'Bug': int(last.get('Bug', 0)),
-                     'Feature Request': int(last.get('Feature Request', 0)),
-                     'Support': int(last.get('Support', 0)),
-                     'Task': int(last.get('Task', 0)),
-                     'total': int(last.get('total', 0))} for i in range(days_to_forecast)]
-        
-        forecast_result = []
-        
+        lower, upper = AnalyticsService._interval_bounds(lower, upper)
+        dates = AnalyticsService._forecast_dates(history_by_type, days_to_forecast)
+        forecast_result = [{'date': date, 'lower': {}, 'upper': {}} for date in dates]
+
+        total_values = np.zeros(days_to_forecast)
+        total_paths = np.zeros((AnalyticsService.SIMULATION_PATHS, days_to_forecast))
         # Forecast each type separately
-        for issue_type in ['Bug', 'Feature Request', 'Support', 'Task']:
+        for issue_type in AnalyticsService.ISSUE_TYPES:
             type_history = [{'date': h['date'], 'count': h[issue_type]} for h in history_by_type]
-            type_forecast = AnalyticsService.forecast_future_volume(type_history, days_to_forecast)
-            
-            for i, forecast_item in enumerate(type_forecast):
-                if i >= len(forecast_result):
-                    forecast_result.append({
-                        'date': forecast_item['date'],
-                        'Bug': 0,
-                        'Feature Request': 0,
-                        'Support': 0,
-                        'Task': 0
-                    })
-                forecast_result[i][issue_type] = forecast_item['count']
-        
+            values, paths = AnalyticsService._forecast_paths(type_history, days_to_forecast, series=issue_type)
+            counts, low, high = AnalyticsService._quantiles(values, paths, lower, upper)
+            for i, item in enumerate(forecast_result):
+                item[issue_type] = int(counts[i])
+                item['lower'][issue_type] = int(low[i])
+                item['upper'][issue_type] = int(high[i])
+            total_values += counts
+            total_paths += np.maximum(0, values if paths is None else paths)
+
         # Calculate totals
-        for item in forecast_result:
+        _, low, high = AnalyticsService._quantiles(total_values, total_paths, lower, upper)
+        for i, item in enumerate(forecast_result):
             item['total'] = item['Bug'] + item['Feature Request'] + item['Support'] + item['Task']
-        
-        return forecast_result
-
-    @staticmethod
-    def _forecast_exponential_smoothing(history, days_to_forecast):
-        """Fallback to Exponential Smoothing if SARIMAX fails."""
-        from statsmodels.tsa.holtwinters import ExponentialSmoothing
-        
-        if len(history) < 3:
-            last_count = history[-1]['count'] if history else 0
-            last_date = datetime.strptime(history[-1]['date'], '%Y-%m-%d') if history else datetime.now()
-            return [{'date': (last_date + timedelta(days=i+1)).strftime('%Y-%m-%d'), 
-                     'count': int(last_count)} for i in range(days_to_forecast)]
-        
-        df = pd.DataFrame(history)
-        df['date'] = pd.to_datetime(df['date'])
-        series = df.set_index('date')['count'].astype(float)
-        
-        try:
-            seasonal = 7 if len(series) >= 14 else None
-            if seasonal:
-                model = ExponentialSmoothing(series, trend='add', seasonal='add', seasonal_periods=seasonal)
-            else:
-                model = ExponentialSmoothing(series, trend='add', seasonal=None)
-            
-            fitted = model.fit(optimized=True)
-            forecast_vals = fitted.forecast(steps=days_to_forecast)
-            
-            last_date = series.index[-1]
-            forecast = []
-            for i, val in enumerate(forecast_vals):
-                next_date = last_date + timedelta(days=i+1)
-                forecast.append({
-                    'date': next_date.strftime('%Y-%m-%d'),
-                    'count': max(0, int(round(float(val))))
-                })
-            return forecast
-        except Exception as e2:
-            print(f"Exponential Smoothing also failed: {e2}, using linear fallback")
-            return AnalyticsService._forecast_linear(history, days_to_forecast)
+            item['lower']['total'] = int(low[i])
+            item['upper']['total'] = int(high[i])
 
-    @staticmethod
-    def _forecast_linear(history, days_to_forecast):
-        """Final fallback: simple linear regression."""
-        if len(history) < 2:
-            return []
-        df = pd.DataFrame(history)
-        df['day_index'] = range(len(df))
-        x = df['day_index'].values
-        y = df['count'].values
-        A = np.vstack([x, np.ones(len(x))]).T
-        m, b = np.linalg.lstsq(A, y, rcond=None)[0]
-        
-        last_date = datetime.strptime(history[-1]['date'], '%Y-%m-%d')
-        forecast = []
-        start_idx = len(df)
-        for i in range(days_to_forecast):
-            next_idx = start_idx + i
-            predicted_count = m * next_idx + b
-            next_date = last_date + timedelta(days=i+1)
-            forecast.append({
-                'date': next_date.strftime('%Y-%m-%d'),
-                'count': max(0, int(round(predicted_count)))
-            })
-        return forecast
+        return forecast_result
 
     @staticmethod
-    def generate_insight(history, forecast):
+    def _insight_messages(history, forecast):
         """
-        Use AI to generate a text summary of the trend based on full user-selected history.
+        Build the chat messages for generate_insight from the full user-selected history.
         """
-        client = AIService.get_client()
-        if not client:
-            return "AI Insight unavailable (API Key missing)."
-
         # Calculate statistics from FULL history (user-selected period)
         counts = [h['count'] for h in history]
         avg_tickets = sum(counts) / len(counts) if counts else 0
@@ -288,14 +388,45 @@ class AnalyticsService:
         Output just a 2-3 sentence executive summary.
         """
 
+        return [
+            {"role": "system", "content": "You are a data analyst."},
+            {"role": "user", "content": prompt}
+        ]
+
+    @staticmethod
+    @timed
+    def generate_insight(history, forecast):
+        """
+        Use AI to generate a text summary of the trend based on full user-selected history.
+        """
+        client = AIService.get_client()
+        if not client:
+            return "AI Insight unavailable (API Key missing)."
+
+        try:
+            response = AIService._chat_completion(
+                'generate_insight',
+                messages=AnalyticsService._insight_messages(history, forecast)
+            )
+            return response.choices[0].message.content
+        except Exception as e:
+            return f"Error generating insight: {str(e)}"
+
+    @staticmethod
+    @timed
+    async def agenerate_insight(history, forecast):
+        """
+        Async variant of generate_insight.
+        """
+        client = AIService.get_async_client()
+        if not client:
+            return "AI Insight unavailable (API Key missing)."
+
         try:
-            response = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": "You are a data analyst."},
-                    {"role": "user", "content": prompt}
-                ]
+            response = await AIService._achat_completion(
+                'generate_insight',
+                messages=AnalyticsService._insight_messages(history, forecast)
             )
             return response.choices[0].message.content
         except Exception as e:
-            return f"Error generating insight: {str(e)}"
\ No newline at end of file
+            return f"Error generating insight: {str(e)}"
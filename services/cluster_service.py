@@ -0,0 +1,274 @@
+import json
+import numpy as np
+from datetime import date, datetime, timedelta
+from sqlalchemy import select, update, delete, func
+from extensions import db, read_execute
+from models.ticket import Ticket
+from models.cluster import TicketCluster, TicketClusterSnapshot
+from models.data_version import DataVersion
+from utils.metrics import timed
+
+
+class ClusterService:
+    """
+    Discovers recurring issue themes with spherical mini-batch k-means over ticket embeddings.
+    Embeddings are streamed in batches, so memory is O(batch_size * dim + k * dim) regardless of N.
+    """
+    DEFAULT_K = 50
+    BATCH_SIZE = 1024
+    UPDATE_CHUNK = 5000
+
+    _centroid_cache = None  # (data version, cluster ids, centroid matrix)
+
+    @staticmethod
+    def _normalize(matrix):
+        norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+        return matrix / np.where(norms == 0, 1, norms)
+
+    @staticmethod
+    def _iter_batches(batch_size):
+        """
+        Yield (ids, unit-length float32 matrix) for tickets with embeddings, batch by batch.
+        Reads the primary: assignments are written back by id, so a lagging replica would leave
+        recently embedded tickets unassigned.
+        """
+        result = db.session.execute(
+            select(Ticket.id, Ticket.embedding)
+            .where(Ticket.embedding != None)
+            .order_by(Ticket.id)
+            .execution_options(yield_per=batch_size)
+        )
+        for partition in result.partitions():
+            ids = np.fromiter((row.id for row in partition), dtype=np.int64, count=len(partition))
+            matrix = np.array([json.loads(row.embedding) for row in partition], dtype=np.float32)
+            yield ids, ClusterService._normalize(matrix)
+
+    @staticmethod
+    def _kmeans_pp(X, k, rng, initial=None):
+        """k-means++ seeding (cosine distance) on a sample, continuing from `initial` centers if given."""
+        centers = list(initial) if initial is not None and len(initial) else [X[rng.integers(len(X))]]
+        d2 = np.min(1 - X @ np.stack(centers).T, axis=1).clip(0)
+        while len(centers) < k:
+            total = d2.sum()
+            idx = rng.choice(len(X), p=d2 / total) if total > 0 else rng.integers(len(X))
+            centers.append(X[idx])
+            d2 = np.minimum(d2, (1 - X @ X[idx]).clip(0))
+        return np.stack(centers[:k]).astype(np.float32)
+
+    @staticmethod
+    def _assign(X, centroids):
+        scores = X @ centroids.T
+        labels = np.argmax(scores, axis=1)
+        return labels, scores[np.arange(len(X)), labels]
+
+    @staticmethod
+    @timed
+    def run_clustering(k=None, batch_size=None, epochs=3, seed=0):
+        """
+        Fit k clusters over all ticket embeddings and persist centroids, assignments and a size snapshot.
+        Existing centroids warm-start the fit so cluster ids (and their growth history) stay stable.
+        Returns a summary dict.
+        """
+        k = k or ClusterService.DEFAULT_K
+        batch_size = batch_size or ClusterService.BATCH_SIZE
+        rng = np.random.default_rng(seed)
+
+        total = db.session.execute(select(func.count()).select_from(Ticket).where(Ticket.embedding != None)).scalar()
+        if not total:
+            return {"clusters": 0, "tickets": 0}
+        k = min(k, total)
+
+        # Seed: keep the largest existing clusters, fill the rest with k-means++ on the first batch
+        existing = TicketCluster.query.order_by(TicketCluster.size.desc()).all()
+        kept = existing[:k]
+        batches = ClusterService._iter_batches(max(batch_size, k))
+        _, first_batch = next(batches)
+        batches.close()
+        initial = np.array([json.loads(c.centroid) for c in kept], dtype=np.float32) if kept else None
+        centroids = ClusterService._kmeans_pp(first_batch, k, rng, initial)
+        slot_ids = [c.id for c in kept] + [None] * (k - len(kept))
+        del first_batch
+
+        # Mini-batch updates: each centroid moves towards its batch members with rate 1/count
+        counts = np.zeros(k, dtype=np.float64)
+        for _ in range(epochs):
+            for _, X in ClusterService._iter_batches(batch_size):
+                labels, _ = ClusterService._assign(X, centroids)
+                onehot = np.zeros((len(X), k), dtype=np.float32)
+                onehot[np.arange(len(X)), labels] = 1
+                n = onehot.sum(axis=0)
+                sums = onehot.T @ X
+                counts += n
+                hit = n > 0
+                centroids[hit] += (sums[hit] - n[hit, None] * centroids[hit]) / counts[hit, None].astype(np.float32)
+                centroids = ClusterService._normalize(centroids)
+
+        # Final assignment pass; only ids/labels/scores are kept (16 bytes per ticket)
+        all_ids, all_labels, all_scores = [], [], []
+        for ids, X in ClusterService._iter_batches(batch_size):
+            labels, scores = ClusterService._assign(X, centroids)
+            all_ids.append(ids)
+            all_labels.append(labels)
+            all_scores.append(scores)
+        all_ids = np.concatenate(all_ids)
+        all_labels = np.concatenate(all_labels)
+        all_scores = np.concatenate(all_scores)
+        sizes = np.bincount(all_labels, minlength=k)
+
+        # Persist clusters: reuse kept ids, create new rows, drop empty or superseded clusters
+        db.session.execute(update(Ticket).values(cluster_id=None, cluster_score=None))
+        live_ids = {slot_ids[j] for j in range(k) if slot_ids[j] and sizes[j] > 0}
+        for cluster in existing:
+            if cluster.id not in live_ids:
+                db.session.delete(cluster)
+        db.session.flush()
+
+        now = datetime.utcnow()
+        slot_clusters = {}
+        for j in range(k):
+            if sizes[j] == 0:
+                continue
+            cluster = db.session.get(TicketCluster, slot_ids[j]) if slot_ids[j] else None
+            if cluster is None:
+                cluster = TicketCluster(created_at=now)
+                db.session.add(cluster)
+            cluster.centroid = json.dumps(centroids[j].tolist())
+            cluster.size = int(sizes[j])
+            cluster.updated_at = now
+            slot_clusters[j] = cluster
+        db.session.flush()
+
+        cluster_ids = np.zeros(k, dtype=np.int64)
+        for j, cluster in slot_clusters.items():
+            cluster_ids[j] = cluster.id
+        for start in range(0, len(all_ids), ClusterService.UPDATE_CHUNK):
+            end = start + ClusterService.UPDATE_CHUNK
+            db.session.execute(update(Ticket), [
+                {"id": int(i), "cluster_id": int(cluster_ids[label]), "cluster_score": float(score)}
+                for i, label, score in zip(all_ids[start:end], all_labels[start:end], all_scores[start:end])
+            ])
+
+        ClusterService._refresh_labels()
+        ClusterService._record_snapshot()
+        DataVersion.bump(TicketCluster.__tablename__)
+        db.session.commit()
+        return {"clusters": len(slot_clusters), "tickets": int(len(all_ids))}
+
+    @staticmethod
+    def _refresh_labels():
+        """Label each cluster with the most common auto_category among its members."""
+        rows = db.session.execute(
+            select(Ticket.cluster_id, Ticket.auto_category, func.count().label('n'))
+            .where(Ticket.cluster_id != None, Ticket.auto_category != None)
+            .group_by(Ticket.cluster_id, Ticket.auto_category)
+        ).all()
+        best = {}
+        for cluster_id, category, n in rows:
+            if cluster_id not in best or n > best[cluster_id][1]:
+                best[cluster_id] = (category, n)
+        for cluster in TicketCluster.query.all():
+            cluster.label = best.get(cluster.id, (None, 0))[0]
+
+    @staticmethod
+    def _record_snapshot():
+        today = date.today()
+        db.session.execute(delete(TicketClusterSnapshot).where(TicketClusterSnapshot.snapshot_date == today))
+        for cluster in TicketCluster.query.all():
+            db.session.add(TicketClusterSnapshot(cluster_id=cluster.id, snapshot_date=today, size=cluster.size))
+
+    @staticmethod
+    def _load_centroids():
+        """Centroid matrix cached per process until the next clustering run bumps the data version."""
+        version = DataVersion.get_versions([TicketCluster.__tablename__])[TicketCluster.__tablename__]
+        cache = ClusterService._centroid_cache
+        if cache is None or cache[0] != version:
+            rows = db.session.execute(select(TicketCluster.id, TicketCluster.centroid)).all()
+            ids = np.array([r.id for r in rows], dtype=np.int64)
+            matrix = np.array([json.loads(r.centroid) for r in rows], dtype=np.float32) if rows else None
+            ClusterService._centroid_cache = cache = (version, ids, matrix)
+        return cache[1], cache[2]
+
+    @staticmethod
+    def assign_ticket(ticket):
+        """
+        Assign an analyzed ticket to its nearest cluster and keep cluster sizes in step.
+        No-op until the first clustering run. The caller commits.
+        """
+        if not ticket.embedding:
+            return
+        ids, centroids = ClusterService._load_centroids()
+        if centroids is None:
+            return
+
+        vec = ClusterService._normalize(np.array(json.loads(ticket.embedding), dtype=np.float32))
+        scores = centroids @ vec
+        j = int(np.argmax(scores))
+        new_id = int(ids[j])
+
+        if ticket.cluster_id != new_id:
+            if ticket.cluster_id:
+                db.session.execute(update(TicketCluster).where(TicketCluster.id == ticket.cluster_id)
+                                   .values(size=TicketCluster.size - 1))
+            db.session.execute(update(TicketCluster).where(TicketCluster.id == new_id)
+                               .values(size=TicketCluster.size + 1))
+        ticket.cluster_id = new_id
+        ticket.cluster_score = float(scores[j])
+
+    @staticmethod
+    def get_cluster_ticket_ids(cluster_id, limit=200):
+        """Ids of a cluster's most central tickets, e.g. to draft a knowledge article from it."""
+        return list(read_execute(
+            select(Ticket.id).where(Ticket.cluster_id == cluster_id)
+            .order_by(Ticket.cluster_score.desc()).limit(limit)
+        ).scalars())
+
+    @staticmethod
+    @timed
+    def get_clusters(limit=50, representatives=3, days=30):
+        """
+        Clusters by size with representative (most central) tickets, size history and recent growth.
+        """
+        clusters = TicketCluster.query.order_by(TicketCluster.size.desc()).limit(limit).all()
+        if not clusters:
+            return []
+        ids = [c.id for c in clusters]
+
+        rank = func.row_number().over(
+            partition_by=Ticket.cluster_id, order_by=Ticket.cluster_score.desc()
+        ).label('rank')
+        ranked = select(Ticket.id, Ticket.issue_key, Ticket.summary, Ticket.cluster_id,
+                        Ticket.cluster_score, rank).where(Ticket.cluster_id.in_(ids)).subquery()
+        reps = {}
+        for row in read_execute(select(ranked).where(ranked.c.rank <= representatives)).all():
+            reps.setdefault(row.cluster_id, []).append({
+                "id": row.id, "issue_key": row.issue_key, "summary": row.summary,
+                "score": row.cluster_score
+            })
+
+        since = date.today() - timedelta(days=days)
+        history = {}
+        for row in read_execute(
+            select(TicketClusterSnapshot.cluster_id, TicketClusterSnapshot.snapshot_date, TicketClusterSnapshot.size)
+            .where(TicketClusterSnapshot.cluster_id.in_(ids), TicketClusterSnapshot.snapshot_date >= since)
+            .order_by(TicketClusterSnapshot.snapshot_date)
+        ).all():
+            history.setdefault(row.cluster_id, []).append({"date": row.snapshot_date.isoformat(), "size": row.size})
+
+        now = datetime.now()
+        def created_counts(start, end):
+            return dict(read_execute(
+                select(Ticket.cluster_id, func.count())
+                .where(Ticket.cluster_id.in_(ids), Ticket.created_at >= start, Ticket.created_at < end)
+                .group_by(Ticket.cluster_id)
+            ).all())
+        last_week = created_counts(now - timedelta(days=7), now)
+        previous_week = created_counts(now - timedelta(days=14), now - timedelta(days=7))
+
+        return [
+            dict(c.to_dict(),
+                 representatives=reps.get(c.id, []),
+                 history=history.get(c.id, []),
+                 created_last_7_days=last_week.get(c.id, 0),
+                 created_previous_7_days=previous_week.get(c.id, 0))
+            for c in clusters
+        ]
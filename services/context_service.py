@@ -0,0 +1,152 @@
+import os
+import json
+import numpy as np
+from sqlalchemy import select
+from models.ticket import Ticket
+from extensions import read_execute
+from services.knowledge_service import KnowledgeService
+from services.embedding_index import EmbeddingIndex
+from utils.metrics import REGISTRY, span
+
+CONTEXT_TOKENS = REGISTRY.histogram(
+    'solution_context_tokens', 'Estimated prompt tokens used by retrieval context.', (),
+    (100, 250, 500, 1000, 1500, 2000, 3000, 4000, 8000))
+
+
+class ContextService:
+    """
+    Builds token-budgeted retrieval context for solution prompts from similar resolved tickets
+    and knowledge articles, scored against one query embedding in a single pass.
+    """
+    DEFAULT_TOKEN_BUDGET = int(os.getenv('SOLUTION_CONTEXT_TOKEN_BUDGET', 1500))
+    TICKET_CANDIDATES = 10
+    SNAPSHOT_OVERFETCH = 5
+    ARTICLE_CANDIDATES = 5
+    ARTICLE_MAX_TOKENS = 400
+    MIN_ITEM_TOKENS = 40
+
+    @staticmethod
+    def estimate_tokens(text):
+        """Rough token count (~4 characters per token for English text)."""
+        return max(1, len(text) // 4) if text else 0
+
+    @staticmethod
+    def _truncate(text, max_tokens):
+        max_chars = max_tokens * 4
+        if len(text) <= max_chars:
+            return text
+        cut = text[:max_chars].rsplit(' ', 1)[0]
+        return cut + " ..."
+
+    @staticmethod
+    def _top_k(query_vec, rows, k):
+        """Cosine-score rows of (..., embedding_json) against query_vec; return [(score, row)] best first."""
+        if not rows:
+            return []
+        with span('vector_search'):
+            matrix = np.array([json.loads(r.embedding) for r in rows], dtype=np.float32)
+            norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query_vec)
+            scores = matrix @ query_vec / np.where(norms == 0, 1, norms)
+            order = np.argsort(-scores)[:k]
+        return [(float(scores[i]), rows[i]) for i in order]
+
+    @staticmethod
+    def retrieve(ticket, query_emb):
+        """
+        Score resolved tickets and knowledge articles against query_emb.
+        Returns (ticket_hits, article_hits) best first: ticket hits are (score, row), article hits are
+        (score, article, best passage or None) from KnowledgeService.search().
+        """
+        query_vec = np.asarray(query_emb, dtype=np.float32)
+
+        # The shared snapshot ranks all tickets; over-fetch since unresolved ones are filtered afterwards
+        snapshot_hits = EmbeddingIndex.search('tickets', query_vec,
+                                              ContextService.TICKET_CANDIDATES * ContextService.SNAPSHOT_OVERFETCH)
+        if snapshot_hits is not None:
+            rows = {r.id: r for r in read_execute(
+                select(Ticket.id, Ticket.summary, Ticket.resolution)
+                .where(Ticket.id.in_([i for _, i in snapshot_hits]),
+                       Ticket.id != ticket.id, Ticket.resolution != None)
+            ).all()}
+            ticket_hits = [(score, rows[i]) for score, i in snapshot_hits if i in rows]
+            ticket_hits = ticket_hits[:ContextService.TICKET_CANDIDATES]
+        else:
+            ticket_rows = read_execute(
+                select(Ticket.id, Ticket.summary, Ticket.resolution, Ticket.embedding)
+                .where(Ticket.id != ticket.id, Ticket.embedding != None, Ticket.resolution != None)
+            ).all()
+            ticket_hits = ContextService._top_k(query_vec, ticket_rows, ContextService.TICKET_CANDIDATES)
+
+        return ticket_hits, KnowledgeService.search(query_vec, ContextService.ARTICLE_CANDIDATES)
+
+    @staticmethod
+    def build_solution_context(ticket, query_emb=None, token_budget=None):
+        """
+        Gather, deduplicate and pack similar resolved tickets and knowledge articles into a token budget.
+        Uses the ticket's stored embedding when present, so retrieval costs no extra API call.
+        Returns {"context", "tokens", "token_budget", "ticket_ids", "article_ids", "relevant_knowledge"}.
+        """
+        from services.ai_service import AIService
+
+        budget = token_budget or ContextService.DEFAULT_TOKEN_BUDGET
+        result = {"context": "", "tokens": 0, "token_budget": budget,
+                  "ticket_ids": [], "article_ids": [], "relevant_knowledge": []}
+
+        if query_emb is None:
+            if ticket.embedding:
+                query_emb = json.loads(ticket.embedding)
+            else:
+                query_emb = AIService.generate_embedding(ticket.summary, operation='suggest_solution')
+        if not query_emb:
+            return result
+
+        ticket_hits, article_hits = ContextService.retrieve(ticket, query_emb)
+        result["relevant_knowledge"] = [
+            {"score": score, "article": a.to_dict(), "passage": passage} for score, a, passage in article_hits[:3]
+        ]
+
+        candidates = [(score, 'ticket', row) for score, row in ticket_hits] + \
+                     [(score, 'article', (a, passage)) for score, a, passage in article_hits]
+        candidates.sort(key=lambda c: c[0], reverse=True)
+
+        seen = set()
+        ticket_lines, article_lines = [], []
+        remaining = budget
+        for score, kind, item in candidates:
+            if remaining < ContextService.MIN_ITEM_TOKENS:
+                break
+            if kind == 'ticket':
+                key = ('ticket', (item.summary or '').strip().lower(), (item.resolution or '').strip().lower())
+                text = f"- Issue: {item.summary}\n  Resolution: {item.resolution}\n"
+            else:
+                # Only the article's best-matching passage goes into the prompt
+                article, passage = item
+                key = ('article', article.title.strip().lower())
+                content = ContextService._truncate(
+                    passage['content'] if passage else article.content,
+                    min(ContextService.ARTICLE_MAX_TOKENS, remaining - ContextService.MIN_ITEM_TOKENS // 2))
+                text = f"- Article: {article.title}\n  {content}\n"
+            if key in seen:
+                continue
+
+            tokens = ContextService.estimate_tokens(text)
+            if tokens > remaining:
+                continue
+            seen.add(key)
+            remaining -= tokens
+            if kind == 'ticket':
+                ticket_lines.append(text)
+                result["ticket_ids"].append(item.id)
+            else:
+                article_lines.append(text)
+                result["article_ids"].append(item[0].id)
+
+        sections = []
+        if ticket_lines:
+            sections.append("Similar resolved tickets:\n" + "".join(ticket_lines))
+        if article_lines:
+            sections.append("Relevant knowledge base articles:\n" + "".join(article_lines))
+        result["context"] = "\n".join(sections)
+        result["tokens"] = budget - remaining
+        CONTEXT_TOKENS.observe(result["tokens"])
+        return result
@@ -0,0 +1,318 @@
+import os
+import json
+import time
+import shutil
+import threading
+import numpy as np
+from array import array
+from datetime import datetime
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+from extensions import db, read_execute
+from models.ticket import Ticket
+from models.knowledge_passage import KnowledgePassage
+from utils.metrics import span, timed
+
+
+def write_embedding_matrix(statement, path, batch_size=5000):
+    """
+    Stream (id, embedding JSON) rows of `statement` into a unit-normalized float32 .npy file at `path`.
+    Ids and vectors come from the same single query. Blocks are staged in a raw file and copied under
+    the .npy header once the row count is known, so memory stays O(batch_size * dim).
+    Returns the ids in row order (None when there are no rows).
+    """
+    result = read_execute(statement.execution_options(yield_per=batch_size))
+    staging = path + '.rows'
+    ids, dim = array('q'), None
+    try:
+        with open(staging, 'wb') as f:
+            for partition in result.partitions():
+                block = np.array([json.loads(r[1]) for r in partition], dtype=np.float32)
+                norms = np.linalg.norm(block, axis=1, keepdims=True)
+                (block / np.where(norms == 0, 1, norms)).tofile(f)
+                ids.extend(r[0] for r in partition)
+                dim = block.shape[1]
+        if not ids:
+            return None
+        rows = np.memmap(staging, dtype=np.float32, mode='r', shape=(len(ids), dim))
+        matrix = np.lib.format.open_memmap(path, mode='w+', dtype=np.float32, shape=(len(ids), dim))
+        for start in range(0, len(ids), batch_size):
+            matrix[start:start + batch_size] = rows[start:start + batch_size]
+        matrix.flush()
+        del matrix, rows
+    finally:
+        if os.path.exists(staging):
+            os.remove(staging)
+    return np.frombuffer(ids, dtype=np.int64).copy()
+
+
+class _Snapshot:
+    """One kind's memory-mapped snapshot plus this process's delta of newer vectors."""
+
+    def __init__(self, version, matrix, ids, watermark):
+        self.version = version
+        self.matrix = matrix  # read-only np.memmap, shared through the page cache
+        self.ids = ids  # ascending
+        self.watermark = watermark
+        self._delta = {}  # id -> unit vector embedded after the snapshot
+        self._lock = threading.Lock()  # request threads and the refresh thread both add
+        # (delta ids, delta matrix, snapshot positions the delta supersedes), swapped as one
+        self.view = (np.zeros(0, dtype=np.int64), None, np.zeros(0, dtype=np.int64))
+
+    def add(self, vectors):
+        with self._lock:
+            self._delta.update(vectors)
+            delta_ids = np.fromiter(self._delta, dtype=np.int64, count=len(self._delta))
+            delta_matrix = np.stack(list(self._delta.values()))
+            overridden = np.zeros(0, dtype=np.int64)
+            if self.ids is not None:
+                pos = np.searchsorted(self.ids, delta_ids)
+                inside = pos < len(self.ids)
+                overridden = pos[inside][self.ids[pos[inside]] == delta_ids[inside]]
+            self.view = (delta_ids, delta_matrix, overridden)
+
+
+class EmbeddingIndex:
+    """
+    Read-only, memory-mapped embedding snapshots shared by all workers on a host.
+    `flask tickets snapshot-embeddings` writes <EMBEDDING_SNAPSHOT_DIR>/<version>/{kind}.npy and
+    {kind}_ids.npy, then swaps the CURRENT pointer. Each worker maps the current version with
+    np.load(mmap_mode='r') (zero-copy, page-cache backed), keeps rows embedded since then in a small
+    in-memory delta, and a background thread picks up newer versions and deltas; only that thread
+    reads CURRENT after a worker has started.
+    search() returns None when no snapshot is configured, so callers fall back to database scans.
+    """
+    KINDS = ('tickets', 'passages')
+    KEEP_VERSIONS = 2
+    _PENDING = '_embedding_index_pending'  # Session.info key of vectors awaiting the commit
+
+    _app = None
+    _directory = None
+    _refresh_seconds = 30
+    _snapshots = {}
+    _lock = threading.Lock()
+    _pid = None
+    _session_listeners_installed = False
+
+    @classmethod
+    def init_app(cls, app):
+        cls._app = app
+        cls._directory = app.config.get('EMBEDDING_SNAPSHOT_DIR')
+        cls._refresh_seconds = app.config.get('EMBEDDING_SNAPSHOT_REFRESH_SECONDS', 30)
+        cls._install_session_listeners()
+
+    @classmethod
+    def _install_session_listeners(cls):
+        """Publish vectors queued by add() when their transaction commits; drop them otherwise."""
+        if cls._session_listeners_installed:
+            return
+
+        @event.listens_for(Session, 'after_commit')
+        def _after_commit(session):
+            # Also fired when a savepoint is released; wait for the outermost transaction
+            if not session.in_nested_transaction():
+                cls._publish(session.info.pop(cls._PENDING, None))
+
+        @event.listens_for(Session, 'after_transaction_end')
+        def _after_transaction_end(session, transaction):
+            if transaction.parent is None:
+                session.info.pop(cls._PENDING, None)  # rolled back
+
+        cls._session_listeners_installed = True
+
+    # --- writer -------------------------------------------------------------------------------
+
+    @staticmethod
+    def _statement(kind):
+        if kind == 'tickets':
+            return select(Ticket.id, Ticket.embedding).where(Ticket.embedding != None).order_by(Ticket.id)
+        return select(KnowledgePassage.id, KnowledgePassage.embedding) \
+            .where(KnowledgePassage.embedding != None).order_by(KnowledgePassage.id)
+
+    @classmethod
+    @timed
+    def write_snapshot(cls, directory=None):
+        """
+        Write a new snapshot version and make it current. Returns its manifest.
+        Rows embedded while the snapshot is written are picked up by the workers' deltas.
+        """
+        directory = directory or cls._directory
+        if not directory:
+            raise RuntimeError("EMBEDDING_SNAPSHOT_DIR is not configured")
+        version = str(time.time_ns())
+        path = os.path.join(directory, version)
+        os.makedirs(path)
+
+        manifest = {"version": version, "created_at": datetime.utcnow().isoformat(), "kinds": {}}
+        for kind in cls.KINDS:
+            ids = write_embedding_matrix(cls._statement(kind), os.path.join(path, f"{kind}.npy"))
+            if ids is None:
+                manifest["kinds"][kind] = {"count": 0, "max_id": 0}
+                continue
+            np.save(os.path.join(path, f"{kind}_ids.npy"), ids)
+            manifest["kinds"][kind] = {"count": int(len(ids)), "max_id": int(ids.max())}
+        with open(os.path.join(path, "manifest.json"), "w") as f:
+            json.dump(manifest, f)
+
+        pointer = os.path.join(directory, "CURRENT")
+        with open(pointer + ".tmp", "w") as f:
+            f.write(version)
+        os.replace(pointer + ".tmp", pointer)
+
+        # Keep the previous version around for workers that still map it
+        versions = sorted(v for v in os.listdir(directory) if v.isdigit())
+        for old in versions[:-cls.KEEP_VERSIONS]:
+            shutil.rmtree(os.path.join(directory, old), ignore_errors=True)
+        return manifest
+
+    # --- reader -------------------------------------------------------------------------------
+
+    @classmethod
+    def _current_version(cls):
+        try:
+            with open(os.path.join(cls._directory, "CURRENT")) as f:
+                return f.read().strip()
+        except OSError:
+            return None
+
+    @classmethod
+    def _load(cls, version):
+        path = os.path.join(cls._directory, version)
+        with open(os.path.join(path, "manifest.json")) as f:
+            manifest = json.load(f)
+        snapshots = {}
+        for kind in cls.KINDS:
+            info = manifest["kinds"].get(kind, {})
+            matrix = ids = None
+            if info.get("count"):
+                matrix = np.load(os.path.join(path, f"{kind}.npy"), mmap_mode='r')
+                ids = np.load(os.path.join(path, f"{kind}_ids.npy"))
+            # Tickets are re-embedded in place (embedded_at); passages are only ever inserted (id)
+            watermark = datetime.fromisoformat(manifest["created_at"]) if kind == 'tickets' \
+                else info.get("max_id", 0)
+            snapshots[kind] = _Snapshot(version, matrix, ids, watermark)
+        return snapshots
+
+    @staticmethod
+    def _normalized(embedding_json):
+        vec = np.asarray(json.loads(embedding_json), dtype=np.float32)
+        return vec / max(float(np.linalg.norm(vec)), 1e-12)
+
+    @classmethod
+    def refresh(cls):
+        """Switch to a newer snapshot version if one exists, then pull rows embedded since it."""
+        version = cls._current_version()
+        if version is None:
+            return
+        snapshots = cls._snapshots
+        if not snapshots or next(iter(snapshots.values())).version != version:
+            snapshots = cls._load(version)
+
+        tickets = snapshots['tickets']
+        rows = read_execute(
+            select(Ticket.id, Ticket.embedding, Ticket.embedded_at)
+            .where(Ticket.embedded_at > tickets.watermark, Ticket.embedding != None)
+        ).all()
+        if rows:
+            tickets.add({r.id: cls._normalized(r.embedding) for r in rows})
+            tickets.watermark = max(r.embedded_at for r in rows)
+
+        passages = snapshots['passages']
+        rows = read_execute(
+            select(KnowledgePassage.id, KnowledgePassage.embedding)
+            .where(KnowledgePassage.id > passages.watermark, KnowledgePassage.embedding != None)
+        ).all()
+        if rows:
+            passages.add({r.id: cls._normalized(r.embedding) for r in rows})
+            passages.watermark = max(r.id for r in rows)
+
+        with cls._lock:
+            cls._snapshots = snapshots
+
+    @classmethod
+    def _refresh_loop(cls):
+        while True:
+            time.sleep(cls._refresh_seconds)
+            try:
+                with cls._app.app_context():
+                    cls.refresh()
+                    db.session.remove()
+            except Exception as e:
+                print(f"Embedding snapshot refresh failed: {e}")
+
+    @classmethod
+    def _ensure_started(cls):
+        """Load the snapshot and start the refresh thread once per (forked) worker process."""
+        if cls._pid == os.getpid():
+            return
+        with cls._lock:
+            if cls._pid == os.getpid():
+                return
+            cls._pid = os.getpid()
+            cls._snapshots = {}
+        cls.refresh()
+        threading.Thread(target=cls._refresh_loop, name='embedding-snapshot-refresh', daemon=True).start()
+
+    @classmethod
+    def enabled(cls):
+        """Whether this worker has a snapshot loaded; newer versions arrive with the refresh thread."""
+        if not cls._directory:
+            return False
+        cls._ensure_started()
+        return bool(cls._snapshots)
+
+    @classmethod
+    def add(cls, kind, row_id, embedding):
+        """
+        Make a freshly written embedding searchable in this worker as soon as the caller's transaction
+        commits; a rollback discards it.
+        """
+        if not cls.enabled():
+            return
+        vec = np.asarray(embedding, dtype=np.float32)
+        vec = vec / max(float(np.linalg.norm(vec)), 1e-12)
+        db.session.info.setdefault(cls._PENDING, []).append((kind, row_id, vec))
+
+    @classmethod
+    def _publish(cls, pending):
+        by_kind = {}
+        for kind, row_id, vec in pending or ():
+            by_kind.setdefault(kind, {})[row_id] = vec
+        for kind, vectors in by_kind.items():
+            snapshot = cls._snapshots.get(kind)
+            if snapshot is not None:
+                snapshot.add(vectors)
+
+    @classmethod
+    def search(cls, kind, query_emb, top_k):
+        """
+        Top-k (score, id) by cosine similarity over the snapshot plus delta, best first,
+        or None when no snapshot is available.
+        """
+        if not cls.enabled():
+            return None
+        snapshot = cls._snapshots.get(kind)
+        if snapshot is None:
+            return None
+
+        query = np.asarray(query_emb, dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        with span('vector_search'):
+            delta_ids, delta_matrix, overridden = snapshot.view
+            scores, ids = [], []
+            if snapshot.matrix is not None:
+                main = snapshot.matrix @ query
+                main[overridden] = -np.inf
+                k = min(top_k, len(main))
+                top = np.argpartition(-main, k - 1)[:k]
+                scores.append(main[top])
+                ids.append(snapshot.ids[top])
+            if delta_matrix is not None:
+                scores.append(delta_matrix @ query)
+                ids.append(delta_ids)
+            if not scores:
+                return []
+            scores = np.concatenate(scores)
+            ids = np.concatenate(ids)
+            order = np.argsort(-scores)[:top_k]
+        return [(float(scores[i]), int(ids[i])) for i in order if np.isfinite(scores[i])]
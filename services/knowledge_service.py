@@ -0,0 +1,176 @@
+import os
+import re
+import json
+import numpy as np
+from sqlalchemy import select, delete, exists
+from extensions import db, read_execute
+from models.knowledge import KnowledgeArticle
+from models.knowledge_passage import KnowledgePassage
+from utils.metrics import span, timed
+from services.embedding_index import EmbeddingIndex
+
+
+class KnowledgeService:
+    """
+    Splits knowledge articles into overlapping passages, embeds them in batches and retrieves
+    at passage level: each article scores as its best-matching passage (max-sim).
+    """
+    PASSAGE_TOKENS = int(os.getenv('KNOWLEDGE_PASSAGE_TOKENS', 200))
+    PASSAGE_OVERLAP_TOKENS = int(os.getenv('KNOWLEDGE_PASSAGE_OVERLAP_TOKENS', 40))
+    SNAPSHOT_OVERFETCH = 5
+
+    _SENTENCE_BREAK = re.compile(r'(?<=[.!?])\s+|\n\s*\n')
+
+    @staticmethod
+    def _tokens(text):
+        return max(1, len(text) // 4)  # same estimate as ContextService
+
+    @staticmethod
+    def split_passages(content, max_tokens=None, overlap_tokens=None):
+        """
+        Pack sentences into passages of at most ~max_tokens, each starting with the last
+        ~overlap_tokens of the previous one. Sentences longer than a passage are cut at word boundaries.
+        """
+        max_tokens = max_tokens or KnowledgeService.PASSAGE_TOKENS
+        overlap_tokens = KnowledgeService.PASSAGE_OVERLAP_TOKENS if overlap_tokens is None else overlap_tokens
+        max_chars = max_tokens * 4
+
+        units = []
+        for sentence in KnowledgeService._SENTENCE_BREAK.split(content or ''):
+            sentence = ' '.join(sentence.split())
+            while len(sentence) > max_chars:
+                cut = sentence.rfind(' ', 0, max_chars)
+                cut = cut if cut > 0 else max_chars
+                units.append(sentence[:cut])
+                sentence = sentence[cut:].strip()
+            if sentence:
+                units.append(sentence)
+
+        passages, current, tokens = [], [], 0
+        for unit in units:
+            size = KnowledgeService._tokens(unit)
+            if current and tokens + size > max_tokens:
+                passages.append(' '.join(current))
+                carry, carried = [], 0
+                for previous in reversed(current):
+                    carried += KnowledgeService._tokens(previous)
+                    if carried > overlap_tokens:
+                        break
+                    carry.insert(0, previous)
+                current, tokens = carry, sum(KnowledgeService._tokens(u) for u in carry)
+            current.append(unit)
+            tokens += size
+        if current:
+            passages.append(' '.join(current))
+        return passages
+
+    @staticmethod
+    @timed
+    def index_article(article):
+        """
+        (Re)build an article's passages with one batched embedding request per EMBEDDING_BATCH_SIZE
+        passages. The article embedding becomes the normalized mean of its passages.
+        Returns the number of passages, or 0 if embedding failed. The caller commits.
+        """
+        from services.ai_service import AIService
+
+        passages = KnowledgeService.split_passages(article.content)
+        if not passages:
+            return 0
+        # The title gives every passage the article's context
+        vectors = AIService.generate_embeddings([f"{article.title}\n{p}" for p in passages],
+                                                operation='index_article')
+        if not vectors:
+            return 0
+
+        if article.id is None:
+            db.session.flush()
+        db.session.execute(delete(KnowledgePassage).where(KnowledgePassage.article_id == article.id))
+        rows = [
+            KnowledgePassage(article_id=article.id, position=i, content=text, embedding=json.dumps(vector))
+            for i, (text, vector) in enumerate(zip(passages, vectors))
+        ]
+        db.session.add_all(rows)
+        db.session.flush()
+        for row, vector in zip(rows, vectors):
+            EmbeddingIndex.add('passages', row.id, vector)
+
+        matrix = np.array(vectors, dtype=np.float32)
+        matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+        mean = matrix.mean(axis=0)
+        article.embedding = json.dumps((mean / max(np.linalg.norm(mean), 1e-12)).tolist())
+        return len(passages)
+
+    @staticmethod
+    def unindexed_articles():
+        """Articles without any passages (created before passage indexing or whose embedding failed)."""
+        return KnowledgeArticle.query.filter(
+            ~exists().where(KnowledgePassage.article_id == KnowledgeArticle.id)
+        ).order_by(KnowledgeArticle.id).all()
+
+    @staticmethod
+    def search(query_emb, top_k=3):
+        """
+        Score every passage against query_emb and keep each article's best passage.
+        Articles not indexed into passages yet are scored by their article embedding (passage None).
+        Returns [(score, KnowledgeArticle, passage dict or None)], best first.
+        """
+        query = np.asarray(query_emb, dtype=np.float32)
+        columns = (KnowledgePassage.id, KnowledgePassage.article_id, KnowledgePassage.position,
+                   KnowledgePassage.content)
+        unindexed = read_execute(
+            select(KnowledgeArticle.id, KnowledgeArticle.embedding)
+            .where(KnowledgeArticle.embedding != None,
+                   ~exists().where(KnowledgePassage.article_id == KnowledgeArticle.id))
+        ).all()
+
+        # Shared snapshot: score passages without loading their embeddings from the database.
+        # Several passages of one article can rank highly, so over-fetch before the max-sim reduction.
+        snapshot_hits = EmbeddingIndex.search('passages', query, top_k * KnowledgeService.SNAPSHOT_OVERFETCH)
+        if snapshot_hits is not None:
+            by_id = {r.id: r for r in read_execute(
+                select(*columns).where(KnowledgePassage.id.in_([i for _, i in snapshot_hits]))
+            ).all()}
+            # Passages deleted since the snapshot simply drop out
+            hits = [(score, by_id[i]) for score, i in snapshot_hits if i in by_id]
+            passages = [row for _, row in hits]
+            passage_scores = [score for score, _ in hits]
+        else:
+            passages = read_execute(select(*columns, KnowledgePassage.embedding)
+                                    .where(KnowledgePassage.embedding != None)).all()
+            passage_scores = None
+        if not passages and not unindexed:
+            return []
+
+        with span('vector_search'):
+            vectors = [json.loads(r.embedding) for r in unindexed]
+            if passage_scores is None:
+                vectors = [json.loads(r.embedding) for r in passages] + vectors
+            scores = np.zeros(0, dtype=np.float32)
+            if vectors:
+                matrix = np.array(vectors, dtype=np.float32)
+                norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query)
+                scores = matrix @ query / np.where(norms == 0, 1, norms)
+            if passage_scores is not None:
+                scores = np.concatenate([np.asarray(passage_scores, dtype=np.float32), scores])
+            article_ids = [r.article_id for r in passages] + [r.id for r in unindexed]
+
+            best = {}
+            for i in np.argsort(-scores):
+                article_id = article_ids[i]
+                if article_id not in best:
+                    best[article_id] = i
+                    if len(best) == top_k:
+                        break
+
+        articles = {a.id: a for a in read_execute(
+            select(KnowledgeArticle).where(KnowledgeArticle.id.in_(list(best)))
+        ).scalars()}
+        hits = []
+        for article_id, i in best.items():
+            passage = None
+            if i < len(passages):
+                row = passages[i]
+                passage = {'id': row.id, 'position': row.position, 'content': row.content}
+            hits.append((float(scores[i]), articles[article_id], passage))
+        return hits
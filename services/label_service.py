@@ -0,0 +1,274 @@
+import os
+import json
+import numpy as np
+from collections import Counter
+from sqlalchemy import select, update, func, or_
+from sqlalchemy.exc import IntegrityError
+from extensions import db, read_execute
+from models.ticket import Ticket
+from models.label import CanonicalLabel, LabelAlias
+from models.data_version import DataVersion
+from utils.metrics import span, timed
+
+
+class LabelService:
+    """
+    Canonical taxonomy for the free-form categories and tags produced by classification.
+    New labels are embedded once, matched against the cached canonical set in one matrix product,
+    and either mapped onto the most similar canonical label (similarity >= THRESHOLD) or become one.
+    """
+    KINDS = ('category', 'tag')
+    THRESHOLD = float(os.getenv('LABEL_MERGE_THRESHOLD', 0.85))
+    UPDATE_CHUNK = 1000
+    TOP_LABELS = 20
+
+    _cache = {}  # kind -> (data version, ids, names, unit-normalized matrix or None)
+
+    @staticmethod
+    def normalize(label):
+        """Alias key of a raw label: trimmed, single-spaced and case-folded."""
+        return ' '.join(str(label).split()).casefold()[:200]
+
+    @staticmethod
+    def _unit(vectors):
+        matrix = np.asarray(vectors, dtype=np.float32)
+        return matrix / np.maximum(np.linalg.norm(matrix, axis=-1, keepdims=True), 1e-12)
+
+    @staticmethod
+    def _canonical_set(kind):
+        """(ids, names, matrix) of a kind's canonical labels, cached per process until the data version changes."""
+        version = DataVersion.get_versions([CanonicalLabel.__tablename__])[CanonicalLabel.__tablename__]
+        cached = LabelService._cache.get(kind)
+        if cached is None or cached[0] != version:
+            rows = db.session.execute(
+                select(CanonicalLabel.id, CanonicalLabel.name, CanonicalLabel.embedding)
+                .where(CanonicalLabel.kind == kind, CanonicalLabel.embedding != None)
+                .order_by(CanonicalLabel.id)
+            ).all()
+            matrix = LabelService._unit([json.loads(r.embedding) for r in rows]) if rows else None
+            cached = LabelService._cache[kind] = (version, [r.id for r in rows], [r.name for r in rows], matrix)
+        return cached[1], cached[2], cached[3]
+
+    @staticmethod
+    def _create_canonical(kind, name, vector):
+        """Insert a canonical label, or return the existing one if another worker created it first."""
+        try:
+            with db.session.begin_nested():
+                label = CanonicalLabel(kind=kind, name=name, embedding=json.dumps(vector.tolist()))
+                db.session.add(label)
+        except IntegrityError:
+            label = CanonicalLabel.query.filter_by(kind=kind, name=name).one()
+        return label
+
+    @staticmethod
+    @timed
+    def match(kind, labels, threshold=None):
+        """
+        Map raw labels onto canonical labels of `kind`; pass the most frequent labels first, since
+        a label that matches nothing becomes the canonical name for the later labels close to it.
+        Known aliases are resolved with one query. The rest are embedded in one batch and scored against
+        the whole canonical set with one matrix product. Labels that could not be embedded stay unmapped.
+        Returns {normalized label: (canonical id, canonical name)}. The caller commits.
+        """
+        from services.ai_service import AIService
+
+        threshold = LabelService.THRESHOLD if threshold is None else threshold
+        raw = {}
+        for label in labels:
+            if label and str(label).strip():
+                raw.setdefault(LabelService.normalize(label), ' '.join(str(label).split())[:100])
+        if not raw:
+            return {}
+
+        mapping = {}
+        for chunk in range(0, len(raw), LabelService.UPDATE_CHUNK):
+            keys = list(raw)[chunk:chunk + LabelService.UPDATE_CHUNK]
+            mapping.update({alias: (canonical_id, name) for alias, canonical_id, name in db.session.execute(
+                select(LabelAlias.alias, CanonicalLabel.id, CanonicalLabel.name)
+                .join(CanonicalLabel, CanonicalLabel.id == LabelAlias.canonical_id)
+                .where(LabelAlias.kind == kind, LabelAlias.alias.in_(keys))
+            ).all()})
+        unseen = [key for key in raw if key not in mapping]
+        if not unseen:
+            return mapping
+
+        vectors = AIService.generate_embeddings([raw[key] for key in unseen], operation='canonicalize_labels')
+        if not vectors:
+            return mapping
+        vectors = LabelService._unit(vectors)
+
+        ids, names, canonical = LabelService._canonical_set(kind)
+        scores = np.zeros(len(unseen), dtype=np.float32)
+        best = np.full(len(unseen), -1)
+        if canonical is not None:
+            with span('label_match'):
+                similarity = vectors @ canonical.T
+                best = np.argmax(similarity, axis=1)
+                scores = similarity[np.arange(len(unseen)), best]
+                best[scores < threshold] = -1
+        assigned = [(ids[j], names[j]) if j >= 0 else None for j in best]
+
+        # Greedy leaders: an unmatched label becomes canonical and absorbs the later unmatched labels near it
+        unmatched = best < 0
+        created = False
+        for i in np.flatnonzero(unmatched):
+            if not unmatched[i]:
+                continue
+            label = LabelService._create_canonical(kind, raw[unseen[i]], vectors[i])
+            created = True
+            pending = np.flatnonzero(unmatched)
+            similarity = vectors[pending] @ vectors[i]
+            absorbed = pending[(similarity >= threshold) | (pending == i)]
+            scores[absorbed] = similarity[np.isin(pending, absorbed)]
+            unmatched[absorbed] = False
+            for k in absorbed:
+                assigned[k] = (label.id, label.name)
+
+        for key, target, score in zip(unseen, assigned, scores):
+            mapping[key] = target
+            db.session.merge(LabelAlias(kind=kind, alias=key, canonical_id=target[0], score=float(score)))
+        if created:
+            DataVersion.bump(CanonicalLabel.__tablename__)
+        return mapping
+
+    @staticmethod
+    def _split_tags(auto_tags):
+        return [t.strip() for t in str(auto_tags).split(',') if t.strip()] if auto_tags else []
+
+    @staticmethod
+    def _canonical_tags(tags, mapping):
+        """Canonical names of tags in their original order without duplicates; unmapped tags are kept."""
+        result = []
+        for tag in tags:
+            name = mapping.get(LabelService.normalize(tag), (None, tag))[1]
+            if name not in result:
+                result.append(name)
+        return result
+
+    @staticmethod
+    def _by_frequency(labels):
+        """Distinct labels as first seen, the most frequent alias keys first."""
+        first, counts = {}, Counter()
+        for label in labels:
+            if label and str(label).strip():
+                key = LabelService.normalize(label)
+                first.setdefault(key, label)
+                counts[key] += 1
+        return [first[key] for key, _ in counts.most_common()]
+
+    @staticmethod
+    def match_labels(categories, auto_tags):
+        """
+        Canonical mappings for the categories and comma-separated tag lists of a batch of tickets,
+        with one match() per kind, most frequent labels first. Returns {kind: mapping} for
+        canonicalize_ticket. The caller commits.
+        """
+        tags = [tag for value in auto_tags for tag in LabelService._split_tags(value)]
+        return {
+            'category': LabelService.match('category', LabelService._by_frequency(categories)),
+            'tag': LabelService.match('tag', LabelService._by_frequency(tags)),
+        }
+
+    @staticmethod
+    def canonicalize_ticket(ticket, mappings=None):
+        """
+        Replace a ticket's category and tags with their canonical labels, using the match_labels()
+        `mappings` of its batch or matching them for this ticket alone. The caller commits.
+        """
+        if mappings is None:
+            mappings = LabelService.match_labels([ticket.auto_category], [ticket.auto_tags])
+        if ticket.auto_category:
+            target = mappings['category'].get(LabelService.normalize(ticket.auto_category))
+            if target:
+                ticket.category_id, ticket.auto_category = target
+        tags = LabelService._split_tags(ticket.auto_tags)
+        if tags:
+            ticket.auto_tags = ",".join(LabelService._canonical_tags(tags, mappings['tag']))
+
+    @staticmethod
+    @timed
+    def merge_historical(threshold=None):
+        """
+        One-off job: canonicalize every category and tag already stored on tickets, most frequent
+        labels first, and rewrite the tickets. Daily trend statistics and cluster labels are rebuilt
+        because they are keyed by category. Returns {kind: {"labels", "canonical", "tickets_updated"}}.
+        """
+        from services.cluster_service import ClusterService
+        from services.trend_service import TrendService
+
+        stats = {}
+
+        categories = db.session.execute(
+            select(Ticket.auto_category, func.count()).where(Ticket.auto_category != None)
+            .group_by(Ticket.auto_category).order_by(func.count().desc())
+        ).all()
+        mapping = LabelService.match('category', [c for c, _ in categories], threshold)
+        updated = 0
+        for category, _ in categories:
+            target = mapping.get(LabelService.normalize(category))
+            if target:
+                stmt = update(Ticket).where(Ticket.auto_category == category)
+                if category == target[1]:
+                    stmt = stmt.where(or_(Ticket.category_id == None, Ticket.category_id != target[0]))
+                updated += db.session.execute(stmt.values(category_id=target[0], auto_category=target[1])).rowcount
+        stats['category'] = {"labels": len(categories), "canonical": len(set(mapping.values())),
+                             "tickets_updated": updated}
+
+        rows = db.session.execute(select(Ticket.id, Ticket.auto_tags).where(Ticket.auto_tags != None)).all()
+        counts = Counter(tag for _, auto_tags in rows for tag in LabelService._split_tags(auto_tags))
+        mapping = LabelService.match('tag', [tag for tag, _ in counts.most_common()], threshold)
+        changes = []
+        for ticket_id, auto_tags in rows:
+            tags = ",".join(LabelService._canonical_tags(LabelService._split_tags(auto_tags), mapping))
+            if tags != auto_tags:
+                changes.append({"id": ticket_id, "auto_tags": tags})
+        for chunk in range(0, len(changes), LabelService.UPDATE_CHUNK):
+            db.session.execute(update(Ticket), changes[chunk:chunk + LabelService.UPDATE_CHUNK])
+        stats['tag'] = {"labels": len(counts), "canonical": len(set(mapping.values())),
+                        "tickets_updated": len(changes)}
+
+        ClusterService._refresh_labels()
+        DataVersion.bump(Ticket.__tablename__)
+        db.session.commit()
+        TrendService.rebuild()
+        return stats
+
+    @staticmethod
+    @timed
+    def get_label_stats():
+        """
+        Cardinality of the category and tag taxonomies: canonical labels, raw aliases merged into them,
+        distinct labels currently on tickets, and the largest canonical labels.
+        """
+        alias_counts = {(kind, canonical_id): n for kind, canonical_id, n in read_execute(
+            select(LabelAlias.kind, LabelAlias.canonical_id, func.count())
+            .group_by(LabelAlias.kind, LabelAlias.canonical_id)
+        ).all()}
+        canonical = read_execute(select(CanonicalLabel.id, CanonicalLabel.kind, CanonicalLabel.name)).all()
+
+        category_tickets = dict(read_execute(
+            select(Ticket.category_id, func.count()).where(Ticket.category_id != None).group_by(Ticket.category_id)
+        ).all())
+        tag_rows = read_execute(select(Ticket.auto_tags).where(Ticket.auto_tags != None)).scalars()
+        tag_tickets = Counter(tag for auto_tags in tag_rows for tag in set(LabelService._split_tags(auto_tags)))
+        distinct_categories, unmapped = read_execute(
+            select(func.count(func.distinct(Ticket.auto_category)),
+                   func.count(Ticket.auto_category).filter(Ticket.category_id == None))
+        ).one()
+
+        result = {"threshold": LabelService.THRESHOLD}
+        for kind in LabelService.KINDS:
+            labels = [
+                {"id": label_id, "name": name, "aliases": alias_counts.get((kind, label_id), 0),
+                 "tickets": category_tickets.get(label_id, 0) if kind == 'category' else tag_tickets.get(name, 0)}
+                for label_id, label_kind, name in canonical if label_kind == kind
+            ]
+            labels.sort(key=lambda label: (-label["tickets"], -label["aliases"]))
+            result[kind] = {
+                "canonical_labels": len(labels),
+                "aliases": sum(label["aliases"] for label in labels),
+                "distinct_on_tickets": distinct_categories if kind == 'category' else len(tag_tickets),
+                "top": labels[:LabelService.TOP_LABELS],
+            }
+        result["category"]["tickets_unmapped"] = unmapped
+        return result
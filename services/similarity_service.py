@@ -0,0 +1,113 @@
+import os
+import tempfile
+from datetime import datetime
+from sqlalchemy import select, delete, insert, or_
+from sqlalchemy.orm import aliased
+from extensions import db, read_execute
+from models.ticket import Ticket
+from models.ticket_neighbor import TicketNeighbor
+from models.data_version import DataVersion
+from utils.metrics import timed
+from utils.similarity import all_pairs_top_k
+from services.embedding_index import write_embedding_matrix
+
+
+class SimilarityService:
+    """
+    Batch all-pairs ticket similarity. compute_neighbors() stores each ticket's top-k neighbors
+    in ticket_neighbors so similar-ticket and duplicate lookups never rescan embeddings.
+    """
+    DEFAULT_K = 10
+    BLOCK_SIZE = 2048
+    INSERT_CHUNK = 5000
+
+    @staticmethod
+    @timed
+    def compute_neighbors(k=None, block_size=None, workers=1):
+        """
+        Recompute the top-k neighbors of every ticket with tiled matrix products and replace
+        the contents of ticket_neighbors. Returns {"tickets", "neighbors"}.
+        """
+        k = k or SimilarityService.DEFAULT_K
+        block_size = block_size or SimilarityService.BLOCK_SIZE
+
+        fd, path = tempfile.mkstemp(suffix='.npy')
+        os.close(fd)
+        try:
+            ids = write_embedding_matrix(
+                select(Ticket.id, Ticket.embedding).where(Ticket.embedding != None).order_by(Ticket.id), path)
+            db.session.execute(delete(TicketNeighbor))
+            if ids is None or len(ids) < 2:
+                DataVersion.bump(TicketNeighbor.__tablename__)
+                db.session.commit()
+                return {"tickets": 0 if ids is None else int(len(ids)), "neighbors": 0}
+
+            k = min(k, len(ids) - 1)
+            now = datetime.utcnow()
+            written = 0
+            for start, idx, scores in all_pairs_top_k(path, len(ids), k, block_size, workers):
+                rows = [
+                    {"ticket_id": int(ids[start + i]), "rank": rank, "neighbor_id": int(ids[j]),
+                     "score": float(score), "computed_at": now}
+                    for i in range(len(idx))
+                    for rank, (j, score) in enumerate(zip(idx[i], scores[i]))
+                    if j >= 0
+                ]
+                for chunk in range(0, len(rows), SimilarityService.INSERT_CHUNK):
+                    db.session.execute(insert(TicketNeighbor), rows[chunk:chunk + SimilarityService.INSERT_CHUNK])
+                written += len(rows)
+
+            DataVersion.bump(TicketNeighbor.__tablename__)
+            db.session.commit()
+            return {"tickets": int(len(ids)), "neighbors": written}
+        finally:
+            os.remove(path)
+
+    @staticmethod
+    def invalidate(ticket_id):
+        """
+        Drop a ticket's stored neighbors, and its entries in other tickets' lists, after its embedding
+        changes; the caller commits.
+        """
+        db.session.execute(delete(TicketNeighbor).where(
+            or_(TicketNeighbor.ticket_id == ticket_id, TicketNeighbor.neighbor_id == ticket_id)))
+
+    @staticmethod
+    def get_neighbors(ticket_id, top_k=3):
+        """
+        Stored neighbors of a ticket as [{"score", "ticket"}], or None when the batch job
+        has not covered this ticket yet.
+        """
+        rows = read_execute(
+            select(TicketNeighbor.score, Ticket)
+            .join(Ticket, Ticket.id == TicketNeighbor.neighbor_id)
+            .where(TicketNeighbor.ticket_id == ticket_id)
+            .order_by(TicketNeighbor.rank)
+            .limit(top_k)
+        ).all()
+        if not rows:
+            return None
+        return [{"score": score, "ticket": ticket.to_dict()} for score, ticket in rows]
+
+    @staticmethod
+    @timed
+    def get_duplicate_pairs(min_score=0.95, limit=100):
+        """Likely duplicate pairs (each reported once) from the stored neighbors, most similar first."""
+        source = aliased(Ticket)
+        neighbor = aliased(Ticket)
+        rows = read_execute(
+            select(TicketNeighbor.score,
+                   source.id, source.issue_key, source.summary,
+                   neighbor.id, neighbor.issue_key, neighbor.summary)
+            .join(source, source.id == TicketNeighbor.ticket_id)
+            .join(neighbor, neighbor.id == TicketNeighbor.neighbor_id)
+            .where(TicketNeighbor.score >= min_score, TicketNeighbor.ticket_id < TicketNeighbor.neighbor_id)
+            .order_by(TicketNeighbor.score.desc())
+            .limit(limit)
+        ).all()
+        return [
+            {"score": score,
+             "ticket": {"id": a_id, "issue_key": a_key, "summary": a_summary},
+             "duplicate": {"id": b_id, "issue_key": b_key, "summary": b_summary}}
+            for score, a_id, a_key, a_summary, b_id, b_key, b_summary in rows
+        ]
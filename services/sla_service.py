@@ -0,0 +1,208 @@
+import json
+import numpy as np
+from datetime import datetime
+from sqlalchemy import select, delete
+from sqlalchemy.exc import IntegrityError
+from extensions import db, read_execute
+from models.ticket import Ticket
+from models.resolution_sketch import ResolutionSketch
+from models.data_version import DataVersion
+from utils.metrics import timed
+from utils.sketch import QuantileSketch
+
+
+class SLAService:
+    """
+    Resolution-time and due-date breach analytics served from per-group quantile sketches.
+    A ticket counts as resolved when it has a resolution or a closed status; its resolution time
+    is updated_at - created_at (the last update of a resolved ticket), in hours.
+    """
+    DIMENSIONS = ('priority', 'issue_type', 'assignee')
+    RESOLVED_STATUSES = ('done', 'resolved', 'closed')
+    RELATIVE_ACCURACY = 0.01
+    NONE_LABEL = '(none)'
+    QUANTILES = {'p50': 0.5, 'p90': 0.9, 'p99': 0.99}
+
+    @staticmethod
+    def _is_resolved(resolution, status):
+        if resolution is not None and resolution == resolution and str(resolution).strip():
+            return True
+        return status is not None and str(status).strip().lower() in SLAService.RESOLVED_STATUSES
+
+    @staticmethod
+    def _label(value):
+        return SLAService.NONE_LABEL if value is None or value != value or value == '' else str(value)
+
+    @staticmethod
+    def _keys(priority, issue_type, assignee):
+        return [('all', '')] + list(zip(SLAService.DIMENSIONS, map(SLAService._label, (priority, issue_type, assignee))))
+
+    @staticmethod
+    def observe(ticket):
+        """
+        What the sketches hold for this ticket: (group keys, resolution hours, breached or None),
+        or None while it is unresolved or lacks timestamps. Compare before and after an update.
+        """
+        if not ticket.created_at or not ticket.updated_at:
+            return None
+        if not SLAService._is_resolved(ticket.resolution, ticket.status):
+            return None
+        hours = max(0.0, (ticket.updated_at - ticket.created_at).total_seconds() / 3600)
+        breached = ticket.updated_at > ticket.due_date if ticket.due_date else None
+        return SLAService._keys(ticket.priority, ticket.issue_type, ticket.assignee), hours, breached
+
+    @staticmethod
+    def track(delta, before, after):
+        """Accumulate the sketch change from observation `before` to `after` into `delta`."""
+        if before == after:
+            return
+        for observation, sign in ((before, -1), (after, 1)):
+            if observation is None:
+                continue
+            keys, hours, breached = observation
+            for key in keys:
+                d = delta.setdefault(key, {"values": [], "weights": [], "with_due_date": 0, "breached": 0})
+                d["values"].append(hours)
+                d["weights"].append(sign)
+                if breached is not None:
+                    d["with_due_date"] += sign
+                    d["breached"] += sign * int(breached)
+
+    @staticmethod
+    def _locked_rows(keys):
+        """
+        The sketch rows of `keys`, locked with SELECT ... FOR UPDATE until the caller's transaction
+        ends. Missing rows are inserted (and so locked too); rows are taken in (dimension, value)
+        order so concurrent writers cannot deadlock.
+        """
+        rows = {}
+        for dimension in sorted({k[0] for k in keys}):
+            values = [k[1] for k in keys if k[0] == dimension]
+            for row in (ResolutionSketch.query
+                        .filter(ResolutionSketch.dimension == dimension, ResolutionSketch.value.in_(values))
+                        .order_by(ResolutionSketch.value).with_for_update().populate_existing()):
+                rows[(row.dimension, row.value)] = row
+
+        empty = json.dumps(QuantileSketch(SLAService.RELATIVE_ACCURACY).to_dict())
+        for dimension, value in sorted(set(keys) - set(rows)):
+            try:
+                with db.session.begin_nested():
+                    row = ResolutionSketch(dimension=dimension, value=value, sketch=empty,
+                                           resolved=0, with_due_date=0, breached=0)
+                    db.session.add(row)
+            except IntegrityError:
+                # Another worker created the row first; wait for its lock
+                row = (ResolutionSketch.query.filter_by(dimension=dimension, value=value)
+                       .with_for_update().populate_existing().one())
+            rows[(dimension, value)] = row
+        return rows
+
+    @staticmethod
+    def apply(delta):
+        """
+        Merge a tracked delta into the stored sketches under a row lock; the caller commits.
+        Removals of tickets a sketch never counted (resolved before it was built) are clamped at
+        zero rather than driving buckets or counters negative.
+        """
+        if not delta:
+            return
+        rows = SLAService._locked_rows(list(delta))
+
+        now = datetime.utcnow()
+        for key, d in delta.items():
+            row = rows[key]
+            sketch = QuantileSketch.from_dict(json.loads(row.sketch))
+            sketch.add_many(d["values"], d["weights"])
+            row.sketch = json.dumps(sketch.to_dict())
+            row.resolved = sketch.count
+            row.with_due_date = max(row.with_due_date + d["with_due_date"], 0)
+            row.breached = min(max(row.breached + d["breached"], 0), row.with_due_date)
+            row.updated_at = now
+        DataVersion.bump(ResolutionSketch.__tablename__)
+
+    @staticmethod
+    @timed
+    def rebuild(batch_size=10000):
+        """
+        Recompute every sketch from the tickets table (backfill or repair), vectorized per batch.
+        Resolution is decided by _is_resolved, as in observe(), so a rebuild matches the sketches
+        kept up to date incrementally. Returns the number of resolved tickets included.
+        """
+        result = read_execute(
+            select(Ticket.created_at, Ticket.updated_at, Ticket.due_date,
+                   Ticket.priority, Ticket.issue_type, Ticket.assignee, Ticket.resolution, Ticket.status)
+            .where(Ticket.created_at != None, Ticket.updated_at != None)
+            .execution_options(yield_per=batch_size)
+        )
+
+        sketches, counters, total = {}, {}, 0
+        for partition in result.partitions():
+            partition = [r for r in partition if SLAService._is_resolved(r.resolution, r.status)]
+            if not partition:
+                continue
+            created = np.array([r.created_at for r in partition], dtype='datetime64[s]')
+            updated = np.array([r.updated_at for r in partition], dtype='datetime64[s]')
+            due = np.array([r.due_date if r.due_date else 'NaT' for r in partition], dtype='datetime64[s]')
+            hours = np.maximum((updated - created).astype(np.float64) / 3600, 0)
+            has_due = ~np.isnat(due)
+            breached = has_due & (updated > due)
+            total += len(partition)
+
+            groups = {'all': np.full(len(partition), '', dtype=object)}
+            for i, dimension in enumerate(SLAService.DIMENSIONS, start=3):
+                groups[dimension] = np.array([SLAService._label(r[i]) for r in partition], dtype=object)
+
+            for dimension, labels in groups.items():
+                values, inverse = np.unique(labels.astype(str), return_inverse=True)
+                sizes = np.bincount(inverse, minlength=len(values))
+                due_counts = np.bincount(inverse, weights=has_due, minlength=len(values))
+                breach_counts = np.bincount(inverse, weights=breached, minlength=len(values))
+                per_group = np.split(hours[np.argsort(inverse, kind='stable')], np.cumsum(sizes)[:-1])
+                for j, value in enumerate(values.tolist()):
+                    key = (dimension, value)
+                    sketch = sketches.setdefault(key, QuantileSketch(SLAService.RELATIVE_ACCURACY))
+                    sketch.add_many(per_group[j])
+                    c = counters.setdefault(key, [0, 0])
+                    c[0] += int(due_counts[j])
+                    c[1] += int(breach_counts[j])
+
+        db.session.execute(delete(ResolutionSketch))
+        now = datetime.utcnow()
+        for (dimension, value), sketch in sketches.items():
+            with_due, breached = counters[(dimension, value)]
+            db.session.add(ResolutionSketch(
+                dimension=dimension, value=value, sketch=json.dumps(sketch.to_dict()),
+                resolved=sketch.count, with_due_date=with_due, breached=breached, updated_at=now))
+        DataVersion.bump(ResolutionSketch.__tablename__)
+        db.session.commit()
+        return total
+
+    @staticmethod
+    @timed
+    def get_resolution_stats(dimension='all', limit=50):
+        """
+        p50/p90/p99/mean resolution hours and due-date breach rate per value of `dimension`,
+        largest groups first. Reads one stored sketch per group, independent of ticket count.
+        """
+        if dimension != 'all' and dimension not in SLAService.DIMENSIONS:
+            raise ValueError(f"dimension must be one of all, {', '.join(SLAService.DIMENSIONS)}")
+
+        rows = read_execute(
+            select(ResolutionSketch)
+            .where(ResolutionSketch.dimension == dimension, ResolutionSketch.resolved > 0)
+            .order_by(ResolutionSketch.resolved.desc())
+            .limit(limit)
+        ).scalars().all()
+
+        stats = []
+        for row in rows:
+            sketch = QuantileSketch.from_dict(json.loads(row.sketch))
+            item = {"value": row.value, "resolved": row.resolved,
+                    "mean_hours": round(sketch.mean(), 2)}
+            for name, q in SLAService.QUANTILES.items():
+                item[f"{name}_hours"] = round(sketch.quantile(q), 2)
+            item["with_due_date"] = row.with_due_date
+            item["breached"] = row.breached
+            item["breach_rate"] = round(row.breached / row.with_due_date, 4) if row.with_due_date else None
+            stats.append(item)
+        return stats
@@ -1,11 +1,30 @@
+import json
+import hashlib
+from sqlalchemy import update
 from extensions import db
 from models.ticket import Ticket
-import pandas as pd
+from models.ticket_neighbor import TicketNeighbor
+from models.data_version import DataVersion
+from services.ai_service import AIService
+from services.cluster_service import ClusterService
+from services.similarity_service import SimilarityService
+from services.sla_service import SLAService
+from services.trend_service import TrendService
+from services.embedding_index import EmbeddingIndex
+from services.label_service import LabelService
+from utils.schema import add_missing_columns, create_missing_indexes
 from datetime import datetime
 
 class TicketService:
+    # Single-column indexes superseded by the composite/partial indexes declared on Ticket
+    OBSOLETE_INDEXES = ('ix_tickets_needs_analysis', 'ix_tickets_cluster_id')
+    # Columns added to tickets after its first release (see upgrade_schema)
+    UPGRADE_COLUMNS = ['content_hash', 'needs_analysis', 'cluster_id', 'cluster_score', 'embedded_at',
+                       'category_id']
+
     @staticmethod
     def process_csv_upload(file):
+        import pandas as pd
         try:
             # Read CSV
             df = pd.read_csv(file)
@@ -14,6 +33,9 @@ class TicketService:
             df.columns = [c.strip().lower() for c in df.columns]
             
             tickets_processed = 0
+            tickets_dirty = 0
+            sla_delta = {}
+            trend_delta = {}
             
             for _, row in df.iterrows():
                 issue_key = row.get('issue_key')
@@ -31,11 +53,25 @@ class TicketService:
                 if not ticket:
                     ticket = Ticket(issue_key=issue_key)
                     db.session.add(ticket)
+                sla_before = SLAService.observe(ticket)
+                trend_before = TrendService.observe(ticket)
                 
+                # Mark for re-analysis only when the analyzed content actually changed
+                summary = row.get('summary')
+                new_hash = TicketService.content_hash(summary)
+                if ticket.content_hash is None and ticket.embedding and ticket.summary == summary:
+                    # Analyzed before hashes existed and unchanged since: adopt the hash
+                    ticket.content_hash = new_hash
+                    ticket.needs_analysis = False
+                elif new_hash != ticket.content_hash:
+                    ticket.needs_analysis = True
+                if ticket.needs_analysis is not False:
+                    tickets_dirty += 1
+
                 # Update fields
                 ticket.issue_id = row.get('issue_id') if pd.notna(row.get('issue_id')) else None
                 ticket.issue_type = row.get('issue_type')
-                ticket.summary = row.get('summary')
+                ticket.summary = summary
                 ticket.assignee = row.get('assignee')
                 ticket.assignee_id = row.get('assignee_id')
                 ticket.reporter = row.get('reporter')
@@ -46,18 +82,161 @@ class TicketService:
                 ticket.created_at = created_at
                 ticket.updated_at = updated_at
                 ticket.due_date = due_date
+                SLAService.track(sla_delta, sla_before, SLAService.observe(ticket))
+                TrendService.track(trend_delta, trend_before, TrendService.observe(ticket))
                 
                 tickets_processed += 1
             
+            SLAService.apply(sla_delta)
+            TrendService.apply(trend_delta)
+            TrendService.advance()
+            DataVersion.bump(Ticket.__tablename__)
             db.session.commit()
-            return {"message": f"Successfully processed {tickets_processed} tickets", "count": tickets_processed}
+            return {
+                "message": f"Successfully processed {tickets_processed} tickets",
+                "count": tickets_processed,
+                "needs_analysis": tickets_dirty
+            }
             
         except Exception as e:
             db.session.rollback()
             raise e
 
+    @staticmethod
+    def content_hash(summary):
+        """
+        Hash of the content that analysis depends on plus the prompt/model version.
+        """
+        text = "" if summary is None or summary != summary else str(summary)  # NaN from pandas -> ""
+        return hashlib.sha256(f"{AIService.ANALYSIS_VERSION}\n{text}".encode()).hexdigest()
+
+    @staticmethod
+    def _auto_tags(analysis):
+        """auto_tags value of a classification's tags."""
+        tags = analysis.get('tags')
+        if isinstance(tags, list):
+            return ",".join(tags)
+        return str(tags)
+
+    @staticmethod
+    def analyze_ticket(ticket, analysis=None, labels=None):
+        """
+        Classify, embed and suggest a solution for a ticket, then record the analyzed content hash.
+        `analysis` is a classification already obtained for the ticket (see AIService.classify_tickets);
+        the ticket is classified here when it is None. `labels` are the LabelService.match_labels
+        mappings of its batch; the ticket's labels are matched alone when it is None.
+        The ticket stays marked for analysis if classification or embedding fails. The caller commits.
+        """
+        trend_before = TrendService.observe(ticket)
+
+        # Categorize
+        if analysis is None:
+            analysis = AIService.classify_ticket(ticket.summary)
+        if analysis:
+            ticket.auto_category = analysis.get('category')
+            ticket.auto_tags = TicketService._auto_tags(analysis)
+            ticket.sentiment_score = analysis.get('sentiment')
+            LabelService.canonicalize_ticket(ticket, labels)
+        
+        #  Embedding
+        emb = AIService.generate_embedding(ticket.summary)
+        if emb:
+            ticket.embedding = json.dumps(emb)
+            ticket.embedded_at = datetime.utcnow()
+            EmbeddingIndex.add('tickets', ticket.id, emb)
+            ClusterService.assign_ticket(ticket)
+            SimilarityService.invalidate(ticket.id)
+        
+        # Generate AI solution
+        suggestion = AIService.suggest_solution(ticket.id)
+        if suggestion and suggestion.get('suggested_solution'):
+            ticket.auto_solution = suggestion['suggested_solution']
+
+        if analysis and emb:
+            ticket.content_hash = TicketService.content_hash(ticket.summary)
+            ticket.needs_analysis = False
+
+        trend_delta = {}
+        TrendService.track(trend_delta, trend_before, TrendService.observe(ticket))
+        TrendService.apply(trend_delta)
+        return ticket
+
+    @staticmethod
+    def analyze_dirty(limit=None, batch_size=50):
+        """
+        Analyze only tickets whose content changed since their last analysis, committing per batch.
+        At most `limit` dirty tickets are attempted. Tickets whose classification failed are skipped
+        without embedding or solution calls and stay dirty for the next run.
+        Returns the number of tickets analyzed.
+        """
+        analyzed = 0
+        attempted = 0
+        last_id = 0
+        while limit is None or attempted < limit:
+            size = batch_size if limit is None else min(batch_size, limit - attempted)
+            batch = Ticket.query.filter(Ticket.needs_analysis == True, Ticket.id > last_id) \
+                .order_by(Ticket.id).limit(size).all()
+            if not batch:
+                break
+            # One multi-ticket classification request per token budget instead of one per ticket
+            classified = AIService.classify_tickets((t.id, t.summary) for t in batch)
+            analyses = [classified[t.id] for t in batch if classified.get(t.id)]
+            # One label match per kind for the whole batch instead of two per ticket
+            labels = LabelService.match_labels([a.get('category') for a in analyses],
+                                               [TicketService._auto_tags(a) for a in analyses])
+            for ticket in batch:
+                analysis = classified.get(ticket.id)
+                if analysis:
+                    TicketService.analyze_ticket(ticket, analysis=analysis, labels=labels)
+                    analyzed += 1
+            last_id = batch[-1].id
+            attempted += len(batch)
+            DataVersion.bump(Ticket.__tablename__)
+            db.session.commit()
+        if analyzed:
+            # Refold the baselines that new sentiment scores invalidated
+            TrendService.advance()
+            db.session.commit()
+        return analyzed
+
+    @staticmethod
+    def upgrade_schema():
+        """
+        Add the columns introduced since the tickets table was first created (create_all never alters
+        existing tables) and backfill them. When needs_analysis is new, tickets analyzed before change
+        detection (embedded and categorized) are marked clean and adopt their hash on the next import,
+        so the upgrade does not queue every ticket. A new embedded_at is set to now on embedded
+        tickets, so running workers pick them up in their snapshot deltas. A new category_id is
+        filled by `flask tickets canonicalize-labels`. Returns the names of the columns added.
+        """
+        added = add_missing_columns(Ticket, TicketService.UPGRADE_COLUMNS)
+        if 'needs_analysis' in added:
+            db.session.execute(
+                update(Ticket).where(Ticket.embedding != None, Ticket.auto_category != None)
+                .values(needs_analysis=False)
+            )
+        if 'embedded_at' in added:
+            db.session.execute(
+                update(Ticket).where(Ticket.embedding != None).values(embedded_at=datetime.utcnow())
+            )
+        db.session.commit()
+        return added
+
+    @staticmethod
+    def create_indexes():
+        """
+        Create the declared ticket and ticket-neighbor indexes that existing tables lack (create_all
+        never adds indexes to existing tables) and drop the ones they replace. Run upgrade_schema
+        first: the indexes cover upgraded columns.
+        Returns (created, dropped) index names.
+        """
+        created, dropped = create_missing_indexes(Ticket, TicketService.OBSOLETE_INDEXES)
+        created += create_missing_indexes(TicketNeighbor)[0]
+        return created, dropped
+
     @staticmethod
     def _parse_date(date_str):
+        import pandas as pd
         if pd.isna(date_str) or not date_str:
             return None
         try:
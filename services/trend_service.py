@@ -0,0 +1,293 @@
+import os
+import math
+from datetime import date, datetime, timedelta
+from sqlalchemy import select, update, delete, func
+from sqlalchemy.exc import IntegrityError
+from extensions import db
+from models.ticket import Ticket
+from models.trend import DailyTicketStat, TrendState
+from utils.metrics import timed
+
+
+class TrendService:
+    """
+    Incremental daily volume and sentiment statistics per category, with EWMA-based anomaly detection.
+    Imports and analyses apply deltas to daily_ticket_stats; each trend_states row folds completed
+    days into an EWMA mean/variance once, so anomaly checks never rescan ticket history.
+    """
+    ALL = '(all)'
+    NONE_LABEL = '(none)'
+    METRICS = ('volume', 'sentiment')
+    ALPHA = float(os.getenv('TREND_EWMA_ALPHA', 0.1))  # ~ 2/alpha - 1 = 19-day span
+    MIN_OBSERVATIONS = 7  # days of history before a series can be flagged
+    Z_THRESHOLD = 3.0
+    ROLLING_DAYS = 7
+    ACTIVE_DAYS = 30  # categories without tickets in this window are not evaluated
+    SENTIMENT_STD_FLOOR = 0.1
+
+    @staticmethod
+    def _label(value):
+        return TrendService.NONE_LABEL if value is None or value == '' else str(value)
+
+    @staticmethod
+    def observe(ticket):
+        """(created day, category, sentiment or None) for a ticket, or None without created_at."""
+        if not ticket.created_at:
+            return None
+        return ticket.created_at.date(), TrendService._label(ticket.auto_category), ticket.sentiment_score
+
+    @staticmethod
+    def track(delta, before, after):
+        """Accumulate the daily-stat change from observation `before` to `after` into `delta`."""
+        if before == after:
+            return
+        for observation, sign in ((before, -1), (after, 1)):
+            if observation is None:
+                continue
+            day, category, sentiment = observation
+            for key in ((day, TrendService.ALL), (day, category)):
+                d = delta.setdefault(key, [0, 0.0, 0])
+                d[0] += sign
+                if sentiment is not None:
+                    d[1] += sign * sentiment
+                    d[2] += sign
+
+    @staticmethod
+    def apply(delta):
+        """
+        Add a tracked delta to daily_ticket_stats with atomic updates; the caller commits.
+        Changes to already folded days invalidate that category's EWMA state.
+        """
+        earliest = {}
+        for (day, category), (count, sentiment_sum, sentiment_count) in delta.items():
+            if not (count or sentiment_count):
+                continue
+            result = db.session.execute(
+                update(DailyTicketStat)
+                .where(DailyTicketStat.day == day, DailyTicketStat.category == category)
+                .values(count=DailyTicketStat.count + count,
+                        sentiment_sum=DailyTicketStat.sentiment_sum + sentiment_sum,
+                        sentiment_count=DailyTicketStat.sentiment_count + sentiment_count)
+            )
+            if result.rowcount == 0:
+                db.session.add(DailyTicketStat(day=day, category=category, count=count,
+                                               sentiment_sum=sentiment_sum, sentiment_count=sentiment_count))
+            earliest[category] = min(day, earliest.get(category, day))
+
+        for category, day in earliest.items():
+            db.session.execute(
+                update(TrendState)
+                .where(TrendState.category == category, TrendState.through_date >= day)
+                .values(through_date=None)
+            )
+        TrendService._create_states(list(earliest))
+
+    @staticmethod
+    def _create_states(categories):
+        """
+        Insert the missing, not yet folded EWMA states of `categories`, so reads only ever update
+        existing rows. A state another worker inserted first is kept. The caller commits.
+        """
+        if not categories:
+            return
+        existing = set(db.session.execute(
+            select(TrendState.metric, TrendState.category).where(TrendState.category.in_(categories))
+        ).all())
+        for category in categories:
+            for metric in TrendService.METRICS:
+                if (metric, category) in existing:
+                    continue
+                try:
+                    with db.session.begin_nested():
+                        db.session.add(TrendState(metric=metric, category=category, observations=0))
+                except IntegrityError:
+                    pass
+
+    @staticmethod
+    def _fold(state, until):
+        """
+        Fold every completed day after state.through_date up to `until` into the EWMA state.
+        A state already folded past `until` is left as is; start from a fresh one to go back.
+        """
+        if state.through_date is None:
+            state.mean, state.variance, state.observations = None, None, 0
+        elif state.through_date >= until:
+            return
+
+        query = select(DailyTicketStat.day, DailyTicketStat.count,
+                       DailyTicketStat.sentiment_sum, DailyTicketStat.sentiment_count) \
+            .where(DailyTicketStat.category == state.category, DailyTicketStat.day <= until) \
+            .order_by(DailyTicketStat.day)
+        if state.through_date is not None:
+            query = query.where(DailyTicketStat.day > state.through_date)
+        rows = db.session.execute(query).all()
+
+        if state.metric == 'volume':
+            # Days without tickets are zero-volume observations
+            by_day = {r.day: r.count for r in rows}
+            day = state.through_date + timedelta(days=1) if state.through_date else (rows[0].day if rows else until)
+            values = []
+            while day <= until:
+                values.append(by_day.get(day, 0))
+                day += timedelta(days=1)
+        else:
+            values = [r.sentiment_sum / r.sentiment_count for r in rows if r.sentiment_count > 0]
+
+        alpha = TrendService.ALPHA
+        for x in values:
+            if not state.observations:
+                state.mean, state.variance = float(x), 0.0
+            else:
+                diff = x - state.mean
+                state.mean += alpha * diff
+                state.variance = (1 - alpha) * (state.variance + alpha * diff * diff)
+            state.observations += 1
+        state.through_date = until
+
+    @staticmethod
+    def _working_copy(state, metric, category, until):
+        """
+        Transient copy of a persisted state to fold up to `until` for one read, so reads never
+        write. A missing state, or one already folded past `until` (a past date), is refolded
+        from the start of the series.
+        """
+        if state is None or (state.through_date is not None and state.through_date > until):
+            return TrendState(metric=metric, category=category, observations=0)
+        return TrendState(metric=metric, category=category, mean=state.mean, variance=state.variance,
+                          observations=state.observations, through_date=state.through_date)
+
+    @staticmethod
+    @timed
+    def advance(until=None):
+        """
+        Fold every category's persisted state up to `until` (default yesterday), creating missing
+        ones, so anomaly reads only fold the days since. Runs after imports and rebuilds; schedule
+        `flask analytics advance-trends` daily. The caller commits.
+        """
+        until = until or date.today() - timedelta(days=1)
+        TrendService._create_states(list(db.session.execute(
+            select(DailyTicketStat.category).distinct()).scalars()))
+        states = TrendState.query.filter(
+            (TrendState.through_date == None) | (TrendState.through_date < until)).all()
+        for state in states:
+            TrendService._fold(state, until)
+        return len(states)
+
+    @staticmethod
+    @timed
+    def get_anomalies(threshold=None, day=None):
+        """
+        Compare each active category's volume and mean sentiment on `day` (default today) with its
+        EWMA baseline. Today's partial volume is compared with the pro-rated daily baseline.
+        Baselines are folded in memory from the persisted states (see advance); nothing is written.
+        Returns {"date", "threshold", "evaluated", "anomalies": [...]} with the largest |z| first.
+        """
+        threshold = TrendService.Z_THRESHOLD if threshold is None else threshold
+        today = date.today()
+        day = day or today
+        until = day - timedelta(days=1)
+        elapsed = 1.0
+        if day == today:
+            now = datetime.now()
+            elapsed = max((now - datetime.combine(today, datetime.min.time())).total_seconds() / 86400, 1 / 24)
+
+        categories = list(db.session.execute(
+            select(DailyTicketStat.category).distinct()
+            .where(DailyTicketStat.day >= day - timedelta(days=TrendService.ACTIVE_DAYS), DailyTicketStat.day <= day)
+        ).scalars())
+        if not categories:
+            return {"date": day.isoformat(), "threshold": threshold, "evaluated": 0, "anomalies": []}
+
+        states = {(s.metric, s.category): s
+                  for s in TrendState.query.filter(TrendState.category.in_(categories))}
+        current = {r.category: r for r in DailyTicketStat.query.filter(
+            DailyTicketStat.day == day, DailyTicketStat.category.in_(categories))}
+        rolling = {r.category: r for r in db.session.execute(
+            select(DailyTicketStat.category,
+                   func.sum(DailyTicketStat.count).label('count'),
+                   func.sum(DailyTicketStat.sentiment_sum).label('sentiment_sum'),
+                   func.sum(DailyTicketStat.sentiment_count).label('sentiment_count'))
+            .where(DailyTicketStat.category.in_(categories),
+                   DailyTicketStat.day > until - timedelta(days=TrendService.ROLLING_DAYS),
+                   DailyTicketStat.day <= until)
+            .group_by(DailyTicketStat.category)
+        )}
+
+        results = []
+        for category in categories:
+            row = current.get(category)
+            window = rolling.get(category)
+            for metric in TrendService.METRICS:
+                state = TrendService._working_copy(states.get((metric, category)), metric, category, until)
+                TrendService._fold(state, until)
+                if state.observations < TrendService.MIN_OBSERVATIONS:
+                    continue
+
+                if metric == 'volume':
+                    value = row.count if row else 0
+                    expected = state.mean * elapsed
+                    # Counts are at least Poisson-noisy: variance no smaller than the mean
+                    std = math.sqrt(max(state.variance, state.mean, 1.0) * elapsed)
+                    rolling_mean = window.count / TrendService.ROLLING_DAYS if window else 0.0
+                else:
+                    if not row or not row.sentiment_count:
+                        continue
+                    value = row.sentiment_sum / row.sentiment_count
+                    expected = state.mean
+                    std = max(math.sqrt(state.variance), TrendService.SENTIMENT_STD_FLOOR)
+                    rolling_mean = window.sentiment_sum / window.sentiment_count \
+                        if window and window.sentiment_count else None
+
+                z = (value - expected) / std
+                results.append({
+                    "metric": metric,
+                    "category": category,
+                    "value": round(value, 4),
+                    "expected": round(expected, 4),
+                    "z_score": round(z, 2),
+                    "ewma_mean": round(state.mean, 4),
+                    "ewma_std": round(math.sqrt(state.variance), 4),
+                    f"rolling_{TrendService.ROLLING_DAYS}d_mean":
+                        round(rolling_mean, 4) if rolling_mean is not None else None,
+                    "observations": state.observations,
+                    # Volume spikes and sentiment drops
+                    "anomaly": z >= threshold if metric == 'volume' else z <= -threshold
+                })
+
+        anomalies = sorted((r for r in results if r["anomaly"]), key=lambda r: -abs(r["z_score"]))
+        return {"date": day.isoformat(), "threshold": threshold, "evaluated": len(results), "anomalies": anomalies}
+
+    @staticmethod
+    @timed
+    def rebuild():
+        """
+        Recompute daily_ticket_stats from the tickets table in one aggregate and refold the EWMA state
+        of every category from scratch (backfill after upgrading). Returns the number of daily rows written.
+        """
+        day = func.date(Ticket.created_at)
+        rows = db.session.execute(
+            select(day, Ticket.auto_category, func.count(),
+                   func.coalesce(func.sum(Ticket.sentiment_score), 0.0), func.count(Ticket.sentiment_score))
+            .where(Ticket.created_at != None)
+            .group_by(day, Ticket.auto_category)
+        ).all()
+
+        totals = {}
+        for day_value, category, count, sentiment_sum, sentiment_count in rows:
+            day_value = date.fromisoformat(str(day_value)[:10])
+            for key in ((day_value, TrendService._label(category)), (day_value, TrendService.ALL)):
+                t = totals.setdefault(key, [0, 0.0, 0])
+                t[0] += count
+                t[1] += float(sentiment_sum)
+                t[2] += sentiment_count
+
+        db.session.execute(delete(DailyTicketStat))
+        db.session.execute(delete(TrendState))
+        db.session.add_all([
+            DailyTicketStat(day=d, category=c, count=t[0], sentiment_sum=t[1], sentiment_count=t[2])
+            for (d, c), t in totals.items()
+        ])
+        TrendService._create_states(sorted({c for _, c in totals}))
+        TrendService.advance()
+        db.session.commit()
+        return len(totals)
@@ -0,0 +1,176 @@
+import time
+import threading
+from datetime import datetime, timezone
+from flask import has_request_context, request
+from sqlalchemy import select, update, insert, delete, func
+from sqlalchemy.exc import IntegrityError
+from extensions import db
+from models.ai_usage import AIUsageBucket
+
+
+class UsageService:
+    """
+    Aggregated ledger of LLM/embedding token usage, latency and cost.
+    Calls are folded in memory into per-minute buckets keyed by (operation, model, endpoint) and
+    flushed into ai_usage_buckets when the app context ends, so the report covers every worker
+    and survives restarts.
+    """
+    BUCKET_SECONDS = 60
+    RETENTION_DAYS = 30
+    FIELDS = ('calls', 'errors', 'prompt_tokens', 'completion_tokens', 'latency_seconds')
+
+    # USD per 1M tokens: (prompt, completion)
+    MODEL_PRICING = {
+        'gpt-4o-mini': (0.15, 0.60),
+        'text-embedding-3-small': (0.02, 0.0),
+    }
+
+    _pending = {}
+    _lock = threading.Lock()
+    _pruned_at = 0.0
+
+    @classmethod
+    def init_app(cls, app):
+        """
+        Flush pending usage when each app context ends. Register before db.init_app: teardown
+        functions run in reverse order, so the request's session is already removed when the
+        ledger takes its own connection.
+        """
+        app.teardown_appcontext(lambda exc: cls.flush())
+
+    @classmethod
+    def record(cls, operation, model, usage=None, latency=0.0, error=False):
+        """
+        Add one API call to the pending ledger. `usage` is the `usage` object of an OpenAI response.
+        Safe to call from any thread; nothing touches the database until flush().
+        """
+        prompt_tokens = getattr(usage, 'prompt_tokens', 0) or 0
+        completion_tokens = getattr(usage, 'completion_tokens', 0) or 0
+        endpoint = request.url_rule.rule if has_request_context() and request.url_rule else ''
+
+        bucket_start = int(time.time() // cls.BUCKET_SECONDS) * cls.BUCKET_SECONDS
+        key = (bucket_start, operation, model, endpoint)
+
+        with cls._lock:
+            entry = cls._pending.setdefault(key, [0, 0, 0, 0, 0.0])
+            entry[0] += 1
+            entry[1] += 1 if error else 0
+            entry[2] += prompt_tokens
+            entry[3] += completion_tokens
+            entry[4] += latency
+
+    @classmethod
+    def flush(cls):
+        """
+        Add pending buckets to ai_usage_buckets in one transaction on its own connection, so the
+        caller's session is neither committed nor rolled back. Needs an app context. On failure
+        the buckets are kept and retried on the next flush.
+        """
+        with cls._lock:
+            pending, cls._pending = cls._pending, {}
+        if not pending:
+            return
+        try:
+            with db.engine.begin() as conn:
+                for key, values in pending.items():
+                    cls._upsert(conn, key, values)
+                now = time.time()
+                if now - cls._pruned_at > 3600:
+                    conn.execute(delete(AIUsageBucket).where(
+                        AIUsageBucket.bucket_start < now - cls.RETENTION_DAYS * 86400))
+                    cls._pruned_at = now
+        except Exception as e:
+            print(f"Error flushing AI usage: {e}")
+            with cls._lock:
+                for key, values in pending.items():
+                    entry = cls._pending.setdefault(key, [0, 0, 0, 0, 0.0])
+                    for i, value in enumerate(values):
+                        entry[i] += value
+
+    @classmethod
+    def _upsert(cls, conn, key, values):
+        bucket_start, operation, model, endpoint = key
+        where = (AIUsageBucket.bucket_start == bucket_start, AIUsageBucket.operation == operation,
+                 AIUsageBucket.model == model, AIUsageBucket.endpoint == endpoint)
+        increment = update(AIUsageBucket).where(*where).values(
+            {getattr(AIUsageBucket, f): getattr(AIUsageBucket, f) + v for f, v in zip(cls.FIELDS, values)})
+        if conn.execute(increment).rowcount:
+            return
+        try:
+            with conn.begin_nested():
+                conn.execute(insert(AIUsageBucket).values(
+                    bucket_start=bucket_start, operation=operation, model=model, endpoint=endpoint,
+                    **dict(zip(cls.FIELDS, values))))
+        except IntegrityError:
+            # Another worker created the bucket first
+            conn.execute(increment)
+
+    @classmethod
+    def estimate_cost(cls, model, prompt_tokens, completion_tokens):
+        prompt_price, completion_price = cls.MODEL_PRICING.get(model, (0.0, 0.0))
+        return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+    @classmethod
+    def get_usage_report(cls, hours=24, bucket='hour'):
+        """
+        Summarise usage of all workers over the last N hours, including this worker's unflushed calls.
+        Returns totals by operation, model and endpoint plus a time series at hour or day granularity.
+        """
+        cls.flush()
+        bucket_seconds = 86400 if bucket == 'day' else 3600
+        cutoff = int(time.time() - hours * 3600)
+
+        # One aggregate row per series bucket and (operation, model, endpoint)
+        series_start = (AIUsageBucket.bucket_start // bucket_seconds) * bucket_seconds
+        rows = db.session.execute(
+            select(series_start, AIUsageBucket.operation, AIUsageBucket.model, AIUsageBucket.endpoint,
+                   *(func.sum(getattr(AIUsageBucket, f)) for f in cls.FIELDS))
+            .where(AIUsageBucket.bucket_start + cls.BUCKET_SECONDS > cutoff)
+            .group_by(series_start, AIUsageBucket.operation, AIUsageBucket.model, AIUsageBucket.endpoint)
+        ).all()
+
+        def empty():
+            return {'calls': 0, 'errors': 0, 'prompt_tokens': 0, 'completion_tokens': 0,
+                    'total_tokens': 0, 'latency_seconds': 0.0, 'cost_usd': 0.0}
+
+        totals = empty()
+        by_operation, by_model, by_endpoint, series = {}, {}, {}, {}
+
+        for series_key, operation, model, endpoint, calls, errors, prompt, completion, latency in rows:
+            prompt, completion = int(prompt), int(completion)
+            cost = cls.estimate_cost(model, prompt, completion)
+            for group in (totals,
+                          by_operation.setdefault(operation, empty()),
+                          by_model.setdefault(model, empty()),
+                          by_endpoint.setdefault(endpoint or 'background', empty()),
+                          series.setdefault(int(series_key), empty())):
+                group['calls'] += int(calls)
+                group['errors'] += int(errors)
+                group['prompt_tokens'] += prompt
+                group['completion_tokens'] += completion
+                group['total_tokens'] += prompt + completion
+                group['latency_seconds'] += float(latency)
+                group['cost_usd'] += cost
+
+        def finish(group):
+            group['avg_latency_seconds'] = round(group['latency_seconds'] / group['calls'], 4) if group['calls'] else 0.0
+            group['latency_seconds'] = round(group['latency_seconds'], 4)
+            group['cost_usd'] = round(group['cost_usd'], 6)
+            return group
+
+        def ranked(groups):
+            return [dict(name=name, **finish(g)) for name, g in
+                    sorted(groups.items(), key=lambda x: x[1]['total_tokens'], reverse=True)]
+
+        return {
+            'window_hours': hours,
+            'bucket': 'day' if bucket == 'day' else 'hour',
+            'totals': finish(totals),
+            'by_operation': ranked(by_operation),
+            'by_model': ranked(by_model),
+            'by_endpoint': ranked(by_endpoint),
+            'series': [
+                dict(bucket_start=datetime.fromtimestamp(start, tz=timezone.utc).isoformat(), **finish(g))
+                for start, g in sorted(series.items())
+            ],
+        }
@@ -0,0 +1,194 @@
+import os
+import json
+import hashlib
+import tempfile
+import types
+
+import numpy as np
+import pytest
+
+# Configuration is read at import time, so point the app at a scratch SQLite file first.
+_DB_DIR = tempfile.mkdtemp(prefix='ticketing-tests-')
+os.environ['DATABASE_URL_Dev'] = f"sqlite:///{os.path.join(_DB_DIR, 'app.db')}"
+os.environ.pop('DATABASE_REPLICA_URL_Dev', None)
+os.environ.pop('EMBEDDING_SNAPSHOT_DIR', None)
+
+from run import create_app
+from extensions import db
+
+
+@pytest.fixture(scope='session')
+def app():
+    app = create_app('default')
+    app.config['TESTING'] = True
+    return app
+
+
+@pytest.fixture(autouse=True)
+def database(app):
+    """Fresh schema and empty per-process caches for every test."""
+    from services.analytics_service import AnalyticsService
+    from services.label_service import LabelService
+    from services.cluster_service import ClusterService
+    from services.usage_service import UsageService
+    from services.ai_service import AIService
+
+    AnalyticsService._model_cache.clear()
+    LabelService._cache.clear()
+    ClusterService._centroid_cache = None
+    UsageService._pending.clear()
+    AIService._client = None
+
+    with app.app_context():
+        # Primary only: apps built with extra binds register their metadata on the shared `db`
+        db.drop_all(bind_key=None)
+        db.create_all(bind_key=None)
+    yield
+
+
+@pytest.fixture
+def app_context(app):
+    """
+    Application context for calling services directly. Request tests use `client` without it,
+    so each request pushes and tears down its own context.
+    """
+    with app.app_context():
+        yield
+        db.session.remove()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+class _Usage:
+    def __init__(self, prompt_tokens, completion_tokens):
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+        self.total_tokens = prompt_tokens + completion_tokens
+
+
+def fake_embedding(text, dimensions=16):
+    """Deterministic pseudo-random unit vector per text."""
+    seed = int(hashlib.md5(text.encode()).hexdigest(), 16) % 2 ** 32
+    vector = np.random.default_rng(seed).normal(size=dimensions)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+class FakeStream:
+    """Chat completion stream: `content` in STEP-character deltas, then a usage-only chunk."""
+    STEP = 8
+
+    def __init__(self, content):
+        self.closed = False
+        self._chunks = [
+            types.SimpleNamespace(usage=None, choices=[
+                types.SimpleNamespace(delta=types.SimpleNamespace(content=content[i:i + self.STEP]))])
+            for i in range(0, len(content), self.STEP)
+        ] + [types.SimpleNamespace(usage=_Usage(100, 20), choices=[])]
+
+    def __iter__(self):
+        for chunk in self._chunks:
+            if self.closed:
+                return
+            yield chunk
+
+    def close(self):
+        self.closed = True
+
+
+class FakeOpenAI:
+    """
+    Stand-in for the OpenAI client: chat completions return `responder(kwargs)` as message content
+    (as a FakeStream with stream=True, kept in `streams`) and embeddings come from fake_embedding.
+    Every call is appended to `calls`.
+    """
+
+    def __init__(self, responder=None):
+        self.responder = responder or (lambda kwargs: json.dumps({}))
+        self.calls = []
+        self.streams = []
+        self.chat = types.SimpleNamespace(completions=types.SimpleNamespace(create=self._chat))
+        self.embeddings = types.SimpleNamespace(create=self._embed)
+
+    def _chat(self, **kwargs):
+        self.calls.append(('chat', kwargs))
+        content = self.responder(kwargs)
+        if kwargs.get('stream'):
+            self.streams.append(FakeStream(content))
+            return self.streams[-1]
+        message = types.SimpleNamespace(content=content)
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)], usage=_Usage(100, 20))
+
+    def _embed(self, input, model):
+        self.calls.append(('embedding', input))
+        items = input if isinstance(input, list) else [input]
+        data = [types.SimpleNamespace(embedding=fake_embedding(text), index=i) for i, text in enumerate(items)]
+        return types.SimpleNamespace(data=data, usage=_Usage(8 * len(items), 0))
+
+
+@pytest.fixture
+def fake_openai():
+    """Install a FakeOpenAI as the AIService client; set `.responder` to script chat replies."""
+    from services.ai_service import AIService
+
+    fake = FakeOpenAI()
+    AIService._client = fake
+    yield fake
+    AIService._client = None
+
+
+@pytest.fixture
+def add_tickets(app):
+    """
+    Factory inserting tickets and bumping the tickets data version: add_tickets(n, **fields).
+    Callable fields are called with the ticket index. Returns the new ticket ids.
+    """
+    from datetime import datetime, timedelta
+    from models.ticket import Ticket
+    from models.data_version import DataVersion
+
+    def add(n, **fields):
+        with app.app_context():
+            start = db.session.query(db.func.count(Ticket.id)).scalar()
+            tickets = []
+            for i in range(start, start + n):
+                values = {
+                    'issue_key': f"T-{i + 1}",
+                    'issue_type': 'Task',
+                    'summary': f"Ticket {i + 1}",
+                    'status': 'Open',
+                    'priority': 'Medium',
+                    'created_at': datetime(2024, 1, 1) + timedelta(hours=i),
+                }
+                values.update({k: v(i) if callable(v) else v for k, v in fields.items()})
+                tickets.append(Ticket(**values))
+            db.session.add_all(tickets)
+            DataVersion.bump(Ticket.__tablename__)
+            db.session.commit()
+            return [t.id for t in tickets]
+    return add
+
+
+@pytest.fixture
+def legacy_tickets(app):
+    """
+    Rebuild the tickets table, rows included, as it was before the TicketService.UPGRADE_COLUMNS
+    were added: no upgraded columns, no indexes, no foreign keys.
+    """
+    from models.ticket import Ticket
+    from services.ticket_service import TicketService
+
+    def rebuild():
+        columns = [c for c in Ticket.__table__.columns if c.name not in TicketService.UPGRADE_COLUMNS]
+        legacy = db.Table('tickets_legacy', db.MetaData(),
+                          *(db.Column(c.name, c.type, primary_key=c.primary_key) for c in columns))
+        names = ', '.join(c.name for c in columns)
+        with app.app_context():
+            with db.engine.begin() as conn:
+                legacy.create(conn)
+                conn.execute(db.text(f"INSERT INTO tickets_legacy ({names}) SELECT {names} FROM tickets"))
+                conn.execute(db.text("DROP TABLE tickets"))
+                conn.execute(db.text("ALTER TABLE tickets_legacy RENAME TO tickets"))
+    return rebuild
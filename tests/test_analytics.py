@@ -0,0 +1,55 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+
+@pytest.fixture
+def recent_tickets(add_tickets):
+    """Three tickets a day over the last 60 days, plus one dated next month."""
+    now = datetime.now()
+    noon = datetime.combine(now.date(), datetime.min.time()) + timedelta(hours=12)
+    add_tickets(180, created_at=lambda i: noon - timedelta(days=i // 3),
+                issue_type=lambda i: ('Bug', 'Task', 'Support')[i % 3])
+    add_tickets(1, created_at=now + timedelta(days=30), issue_type='Bug')
+
+
+@pytest.mark.parametrize('url', [
+    '/analytics/volume?group_by=issue_type&days=30',
+    '/analytics/volume?bucket=week&days=60',
+    '/analytics/volume?bucket=month&days=120&forecast=2',
+    '/analytics/volume?group_by=issue_type&bucket=week&days=60&forecast=3',
+    '/analytics/forecast?days=30',
+    '/analytics/forecast-by-type?days=30',
+    '/analytics/forecast/backtest?days=60',
+])
+def test_future_dated_tickets_are_ignored(client, recent_tickets, url):
+    response = client.get(url)
+    assert response.status_code == 200, response.get_json()
+
+
+def test_volume_counts_exclude_future_tickets(client, recent_tickets):
+    volume = client.get('/analytics/volume?group_by=issue_type&days=10').get_json()
+    assert volume['buckets'][-1] == datetime.now().date().isoformat()
+    assert sum(volume['total']) == sum(s['total'] for s in volume['series'])
+    assert volume['total'][-1] == 3  # today's tickets only
+
+
+def test_backtest_total_covers_every_issue_type(app_context, add_tickets):
+    from services.analytics_service import AnalyticsService
+    from utils import forecasting
+
+    # Incidents are outside ISSUE_TYPES, so the per-type series do not add up to the total
+    now = datetime.now()
+    noon = datetime.combine(now.date(), datetime.min.time()) + timedelta(hours=12)
+    add_tickets(120, created_at=lambda i: noon - timedelta(days=i % 40),
+                issue_type=lambda i: 'Incident' if i % 40 < 20 and i >= 40 else 'Bug')
+
+    history = AnalyticsService.get_ticket_volume_history(40)
+    by_type = AnalyticsService.get_ticket_volume_by_type(40)
+    assert [h['count'] for h in history] != [h['total'] for h in by_type]
+
+    report = AnalyticsService.backtest_forecasts(40)
+    expected = forecasting.backtest([h['count'] for h in history], 7,
+                                    max_origins=AnalyticsService.BACKTEST_MAX_ORIGINS)
+    assert report['total'] == expected
+    assert AnalyticsService.select_forecast_model(history) == expected
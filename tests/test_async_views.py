@@ -0,0 +1,97 @@
+import asyncio
+import json
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+
+import openai
+import pytest
+
+from services.ai_service import AIService
+from tests.conftest import fake_embedding
+
+LATENCY = 0.2  # seconds per simulated OpenAI call
+
+
+class FakeAsyncOpenAI:
+    """AsyncOpenAI stand-in whose calls take LATENCY seconds; tracks open clients and peak concurrency."""
+    created = closed = in_flight = peak = 0
+
+    def __init__(self, api_key=None):
+        type(self).created += 1
+        self.chat = types.SimpleNamespace(completions=types.SimpleNamespace(create=self._chat))
+        self.embeddings = types.SimpleNamespace(create=self._embed)
+
+    @classmethod
+    async def _call(cls):
+        cls.in_flight += 1
+        cls.peak = max(cls.peak, cls.in_flight)
+        await asyncio.sleep(LATENCY)
+        cls.in_flight -= 1
+
+    async def _chat(self, **kwargs):
+        await self._call()
+        content = json.dumps({"summary": "S", "title": "T", "content": "C", "tags": []})
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=types.SimpleNamespace(content=content))],
+                                     usage=types.SimpleNamespace(prompt_tokens=10, completion_tokens=5))
+
+    async def _embed(self, input, model):
+        await self._call()
+        return types.SimpleNamespace(data=[types.SimpleNamespace(embedding=fake_embedding(input))],
+                                     usage=types.SimpleNamespace(prompt_tokens=4, completion_tokens=0))
+
+    async def close(self):
+        type(self).closed += 1
+
+
+@pytest.fixture
+def async_openai(monkeypatch):
+    monkeypatch.setenv('OPENAI_API_KEY', 'test')
+    monkeypatch.setattr(openai, 'AsyncOpenAI', FakeAsyncOpenAI)
+    for counter in ('created', 'closed', 'in_flight', 'peak'):
+        monkeypatch.setattr(FakeAsyncOpenAI, counter, 0)
+    return FakeAsyncOpenAI
+
+
+def test_each_request_closes_its_client(client, async_openai):
+    for _ in range(3):
+        assert client.get('/knowledge/search?q=vpn').status_code == 200
+    assert async_openai.created == async_openai.closed == 3
+    assert len(AIService._async_clients) == 0
+
+
+def test_one_request_keeps_many_calls_in_flight(client, add_tickets, async_openai, monkeypatch):
+    ids = add_tickets(8, summary=lambda i: f"Disk full on build agent {i} " * 20, resolution='Cleaned up')
+    monkeypatch.setattr(AIService, 'DRAFT_SINGLE_PASS_TOKENS', 100)
+    monkeypatch.setattr(AIService, 'DRAFT_CHUNK_TOKENS', 100)
+    monkeypatch.setattr(AIService, 'DRAFT_MAX_CONCURRENCY', 8)
+
+    start = time.perf_counter()
+    response = client.post('/knowledge/draft', json={"ticket_ids": ids})
+    elapsed = time.perf_counter() - start
+
+    assert response.status_code == 200
+    # Eight chunk summaries run together on one client, then one composing call
+    assert async_openai.peak == 8
+    assert elapsed < 4 * LATENCY
+    assert async_openai.created == async_openai.closed == 1
+
+
+def test_concurrent_request_capacity_per_worker(client, async_openai):
+    """
+    Load test: one worker with 16 threads (the gthread default) serving 32 search requests.
+    Each request waits LATENCY on the API; serially that would take 32 * LATENCY.
+    """
+    requests, threads = 32, 16
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        statuses = list(pool.map(lambda _: client.get('/knowledge/search?q=printer').status_code, range(requests)))
+    elapsed = time.perf_counter() - start
+
+    assert statuses == [200] * requests
+    throughput = requests / elapsed
+    print(f"\n{requests} requests in {elapsed:.2f}s: {throughput:.1f} req/s per worker, "
+          f"peak {async_openai.peak} API calls in flight")
+    assert async_openai.peak > threads // 2
+    assert elapsed < requests * LATENCY / 4
+    assert async_openai.created == async_openai.closed == requests
@@ -0,0 +1,69 @@
+import json
+
+from sqlalchemy import inspect, text
+
+from extensions import db
+from models.ticket import Ticket
+from services.ticket_service import TicketService
+
+
+def _responder(kwargs):
+    """Classify only summaries containing 'printer'; every other request gets a solution."""
+    prompt = kwargs['messages'][-1]['content']
+    if kwargs.get('response_format', {}).get('type') == 'json_schema':
+        lines = [json.loads(line) for line in prompt.splitlines() if line.strip().startswith('{"id"')]
+        return json.dumps({"results": [
+            {"id": item["id"], "category": "Hardware", "tags": ["printer"], "sentiment": -0.2}
+            for item in lines if 'printer' in item["summary"]
+        ]})
+    if 'Ticket Summary:' in prompt:
+        return "{}"
+    return json.dumps({"suggested_solution": "Restart it", "relevant_links": []})
+
+
+def test_failed_classifications_are_skipped_and_stay_dirty(app_context, add_tickets, fake_openai):
+    fake_openai.responder = _responder
+    add_tickets(3, summary=lambda i: ['printer jam', 'vpn drops', 'printer offline'][i])
+
+    assert TicketService.analyze_dirty() == 2
+
+    tickets = {t.summary: t for t in Ticket.query}
+    assert not tickets['printer jam'].needs_analysis and tickets['printer jam'].embedding
+    assert tickets['vpn drops'].needs_analysis
+    assert tickets['vpn drops'].embedding is None and tickets['vpn drops'].auto_solution is None
+    embedded = [call[1] for call in fake_openai.calls if call[0] == 'embedding']
+    assert 'vpn drops' not in embedded
+
+    # The next run retries only the ticket that failed
+    assert TicketService.analyze_dirty() == 0
+    assert Ticket.query.filter(Ticket.needs_analysis == True).count() == 1
+
+
+def test_upgrade_adds_columns_without_requeuing_analyzed_tickets(app, add_tickets, legacy_tickets):
+    add_tickets(2, embedding=lambda i: '[0.1, 0.2]' if i == 0 else None,
+                auto_category=lambda i: 'Hardware' if i == 0 else None)
+    legacy_tickets()
+
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=['tickets', 'upgrade-schema'])
+    assert result.exit_code == 0, result.output
+    assert ', '.join(TicketService.UPGRADE_COLUMNS) in result.output
+
+    with app.app_context():
+        columns = {c['name'] for c in inspect(db.engine).get_columns('tickets')}
+        assert set(TicketService.UPGRADE_COLUMNS) <= columns
+        # (table, column, on delete); the inspector does not report ON DELETE of inline references
+        foreign_keys = {(row[2], row[3], row[6]) for row in db.session.execute(text('PRAGMA foreign_key_list(tickets)'))}
+        assert ('ticket_clusters', 'cluster_id', 'SET NULL') in foreign_keys
+        assert ('canonical_labels', 'category_id', 'SET NULL') in foreign_keys
+        flags = dict(db.session.execute(db.select(Ticket.issue_key, Ticket.needs_analysis)).all())
+        assert flags == {'T-1': False, 'T-2': True}
+        embedded = dict(db.session.execute(db.select(Ticket.issue_key, Ticket.embedded_at != None)).all())
+        assert embedded == {'T-1': True, 'T-2': False}
+
+        db.session.execute(text("INSERT INTO tickets (issue_key) VALUES ('T-3')"))
+        assert db.session.execute(text("SELECT needs_analysis FROM tickets WHERE issue_key = 'T-3'")).scalar() == 1
+        db.session.rollback()
+
+    # Re-running leaves the flags alone
+    assert 'already present' in runner.invoke(args=['tickets', 'upgrade-schema']).output
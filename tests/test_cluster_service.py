@@ -0,0 +1,85 @@
+import json
+from datetime import date, datetime
+
+import numpy as np
+
+from extensions import db
+from models.cluster import TicketCluster
+from models.ticket import Ticket
+from services.cluster_service import ClusterService
+
+THEMES = ['VPN', 'Printer', 'Password']
+
+
+def _theme_embedding(theme, i=0, noise=0.1):
+    """A unit vector near the theme's own axis, so the themes are linearly separable."""
+    vector = np.eye(16)[THEMES.index(theme)] + np.random.default_rng(i).normal(scale=noise, size=16)
+    return json.dumps((vector / np.linalg.norm(vector)).tolist())
+
+
+def _seed(add_tickets, n=60):
+    # Themes interleaved, so every mini-batch (and the k-means++ seed batch) sees all of them
+    return add_tickets(n, summary=lambda i: f"{THEMES[i % 3]} issue {i}", auto_category=lambda i: THEMES[i % 3],
+                       embedding=lambda i: _theme_embedding(THEMES[i % 3], i), created_at=datetime.now())
+
+
+def _members():
+    members = {}
+    for ticket in Ticket.query:
+        members.setdefault(ticket.cluster_id, set()).add(ticket.auto_category)
+    return members
+
+
+def test_mini_batches_recover_separable_themes(app_context, add_tickets):
+    _seed(add_tickets)
+
+    assert ClusterService.run_clustering(k=3, batch_size=8, epochs=3) == {"clusters": 3, "tickets": 60}
+
+    members = _members()
+    assert sorted(len(themes) for themes in members.values()) == [1, 1, 1]
+    clusters = {c.id: c for c in TicketCluster.query}
+    assert set(members) == set(clusters)
+    assert sorted(c.label for c in clusters.values()) == sorted(THEMES)
+    assert all(c.size == 20 for c in clusters.values())
+    assert all(t.cluster_score > 0.8 for t in Ticket.query)
+
+    # Warm start: a re-fit keeps the same cluster ids for the same themes
+    before = {c.label: c.id for c in clusters.values()}
+    ClusterService.run_clustering(k=3, batch_size=8, epochs=3)
+    assert {c.label: c.id for c in TicketCluster.query} == before
+
+
+def test_assign_ticket_to_nearest_cluster(app_context, add_tickets):
+    _seed(add_tickets)
+    ClusterService.run_clustering(k=3, batch_size=8)
+    printer = TicketCluster.query.filter_by(label='Printer').one()
+
+    ticket = db.session.get(Ticket, add_tickets(1, embedding=_theme_embedding('Printer', 99))[0])
+    ClusterService.assign_ticket(ticket)
+    db.session.commit()
+
+    assert ticket.cluster_id == printer.id and ticket.cluster_score > 0.8
+    assert db.session.get(TicketCluster, printer.id).size == 21
+
+    # Re-embedded as a VPN issue: it moves, and both sizes follow
+    ticket.embedding = _theme_embedding('VPN', 99)
+    ClusterService.assign_ticket(ticket)
+    db.session.commit()
+    vpn = TicketCluster.query.filter_by(label='VPN').one()
+    assert ticket.cluster_id == vpn.id
+    assert (db.session.get(TicketCluster, printer.id).size, vpn.size) == (20, 21)
+
+
+def test_get_clusters_reports_representatives_history_and_growth(app_context, add_tickets):
+    _seed(add_tickets)
+    ClusterService.run_clustering(k=3, batch_size=8)
+
+    clusters = ClusterService.get_clusters(representatives=2)
+
+    assert [c["size"] for c in clusters] == [20, 20, 20]
+    for cluster in clusters:
+        reps = cluster["representatives"]
+        assert len(reps) == 2 and reps[0]["score"] >= reps[1]["score"]
+        assert {r["summary"].split()[0] for r in reps} == {cluster["label"]}
+        assert cluster["history"] == [{"date": date.today().isoformat(), "size": 20}]
+        assert (cluster["created_last_7_days"], cluster["created_previous_7_days"]) == (20, 0)
@@ -0,0 +1,60 @@
+import json
+
+import numpy as np
+
+from extensions import db
+from models.knowledge import KnowledgeArticle
+from models.ticket import Ticket
+from services.context_service import ContextService
+
+QUERY = np.ones(16) / 4
+
+
+def _near_query(i):
+    """Unit vectors close to QUERY, less similar as i grows."""
+    vector = QUERY + np.eye(16)[i % 16] * 0.05 * (i + 1)
+    return json.dumps((vector / np.linalg.norm(vector)).tolist())
+
+
+def _seed(add_tickets):
+    # Three copies of one resolved issue (differing only in case and padding), two distinct ones,
+    # one unresolved ticket and the ticket we build context for
+    summaries = ['VPN drops hourly', 'vpn drops hourly ', 'VPN DROPS HOURLY', 'Printer offline', 'Disk full',
+                 'Mail bounces', 'Laptop will not boot']
+    resolutions = ['Renew the VPN certificate', ' renew the vpn certificate', 'Renew the VPN certificate',
+                   'Power-cycle the printer', 'Rotate the logs', None, None]
+    ids = add_tickets(7, summary=lambda i: summaries[i], resolution=lambda i: resolutions[i],
+                      embedding=lambda i: _near_query(i))
+    db.session.add_all([
+        KnowledgeArticle(title='VPN troubleshooting', content='Check the certificate. ' * 150, embedding=_near_query(0)),
+        KnowledgeArticle(title=' vpn Troubleshooting', content='Copy of the same guide.', embedding=_near_query(1)),
+        KnowledgeArticle(title='Printer guide', content='Power-cycle the printer.', embedding=_near_query(3)),
+    ])
+    db.session.commit()
+    return db.session.get(Ticket, ids[-1])
+
+
+def test_context_has_no_duplicate_tickets_or_articles(app_context, add_tickets):
+    ticket = _seed(add_tickets)
+
+    result = ContextService.build_solution_context(ticket, query_emb=QUERY.tolist(), token_budget=4000)
+
+    assert result["tokens"] <= result["token_budget"] == 4000
+    assert len(result["ticket_ids"]) == 3  # one VPN copy, printer, disk; never unresolved or the ticket itself
+    assert ticket.id not in result["ticket_ids"]
+    assert result["context"].lower().count("issue: vpn drops hourly") == 1
+    titles = [db.session.get(KnowledgeArticle, i).title.strip().lower() for i in result["article_ids"]]
+    assert sorted(titles) == ['printer guide', 'vpn troubleshooting']
+
+
+def test_small_budget_is_never_exceeded(app_context, add_tickets):
+    ticket = _seed(add_tickets)
+
+    for budget in (45, 60, 120, 300):
+        result = ContextService.build_solution_context(ticket, query_emb=QUERY.tolist(), token_budget=budget)
+        assert 0 < result["tokens"] <= budget, (budget, result["tokens"])
+        assert ContextService.estimate_tokens(result["context"]) <= budget + 20  # plus section headings
+        assert len(set(result["ticket_ids"])) == len(result["ticket_ids"])
+        assert len(set(result["article_ids"])) == len(result["article_ids"])
+    # The long article is cut to fit rather than dropped or overflowing
+    assert 'Check the certificate.' in result["context"] and ' ...' in result["context"]
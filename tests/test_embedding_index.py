@@ -0,0 +1,139 @@
+import json
+import os
+import threading
+from datetime import datetime
+
+import numpy as np
+import pytest
+from sqlalchemy import select
+
+from extensions import db
+from models.ticket import Ticket
+from services.embedding_index import EmbeddingIndex, _Snapshot, write_embedding_matrix
+from tests.conftest import fake_embedding
+
+
+def test_write_embedding_matrix_streams_one_query(app_context, add_tickets, tmp_path):
+    add_tickets(23, embedding=lambda i: json.dumps([3 * v for v in fake_embedding(f"t{i}")]))
+    add_tickets(2)  # not embedded
+    path = str(tmp_path / 'tickets.npy')
+
+    ids = write_embedding_matrix(
+        select(Ticket.id, Ticket.embedding).where(Ticket.embedding != None).order_by(Ticket.id),
+        path, batch_size=5)
+
+    matrix = np.load(path, mmap_mode='r')
+    assert matrix.shape == (23, 16) and ids.tolist() == list(range(1, 24))
+    assert np.allclose(matrix, [fake_embedding(f"t{i}") for i in range(23)], atol=1e-6)
+    assert os.listdir(tmp_path) == ['tickets.npy']
+
+
+def test_write_embedding_matrix_without_rows(app_context, tmp_path):
+    path = str(tmp_path / 'tickets.npy')
+    assert write_embedding_matrix(select(Ticket.id, Ticket.embedding), path) is None
+    assert os.listdir(tmp_path) == []
+
+
+def test_snapshot_add_from_many_threads():
+    snapshot = _Snapshot('1', None, np.arange(0, 100, 2), None)
+    errors = []
+
+    def add(worker):
+        try:
+            for i in range(200):
+                row_id = worker * 1000 + i
+                snapshot.add({row_id: np.full(4, row_id, dtype=np.float32)})
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=add, args=(w,)) for w in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    delta_ids, delta_matrix, overridden = snapshot.view
+    assert not errors
+    assert len(delta_ids) == 8 * 200
+    assert np.array_equal(delta_matrix[:, 0], delta_ids.astype(np.float32))
+    assert sorted(overridden.tolist()) == list(range(50))
+
+
+@pytest.fixture
+def snapshot_dir(app, tmp_path, monkeypatch):
+    """EmbeddingIndex on a scratch directory with fresh per-process state; the refresh thread stays asleep."""
+    monkeypatch.setattr(EmbeddingIndex, '_directory', str(tmp_path))
+    monkeypatch.setattr(EmbeddingIndex, '_refresh_seconds', 3600)
+    monkeypatch.setattr(EmbeddingIndex, '_snapshots', {})
+    monkeypatch.setattr(EmbeddingIndex, '_pid', None)
+    return tmp_path
+
+
+def _embed(ticket_id, text):
+    """Re-embed a ticket the way analyze_ticket does; the caller commits."""
+    ticket = db.session.get(Ticket, ticket_id)
+    ticket.embedding = json.dumps(fake_embedding(text))
+    ticket.embedded_at = datetime.utcnow()
+    EmbeddingIndex.add('tickets', ticket_id, fake_embedding(text))
+
+
+def _top(text, k=3):
+    return EmbeddingIndex.search('tickets', fake_embedding(text), k)
+
+
+def test_search_covers_snapshot_and_committed_delta(app_context, add_tickets, snapshot_dir):
+    ids = add_tickets(10, embedding=lambda i: json.dumps(fake_embedding(f"t{i}")))
+    assert EmbeddingIndex.search('tickets', fake_embedding('t3'), 3) is None  # no snapshot yet
+    EmbeddingIndex.write_snapshot()
+    EmbeddingIndex.refresh()
+
+    score, top = _top('t3')[0]
+    assert top == ids[3] and score == pytest.approx(1, abs=1e-5)
+
+    new_id = add_tickets(1)[0]
+    _embed(new_id, 'new')
+    with db.session.begin_nested():
+        pass  # releasing a savepoint is not the commit
+    assert _top('new')[0][1] != new_id
+    db.session.commit()
+    assert _top('new')[0] == (pytest.approx(1, abs=1e-5), new_id)
+
+    _embed(ids[5], 'rolled back')
+    db.session.rollback()
+    assert _top('rolled back')[0][1] != ids[5]
+    db.session.commit()
+    assert _top('rolled back')[0][1] != ids[5]
+
+
+def test_delta_row_overrides_its_snapshot_row(app_context, add_tickets, snapshot_dir):
+    ids = add_tickets(10, embedding=lambda i: json.dumps(fake_embedding(f"t{i}")))
+    EmbeddingIndex.write_snapshot()
+    EmbeddingIndex.refresh()
+
+    _embed(ids[3], 'moved')
+    db.session.commit()
+
+    hits = _top('t3', k=11)
+    assert [i for _, i in hits].count(ids[3]) == 1
+    assert dict((i, s) for s, i in hits)[ids[3]] < 0.9  # the stale snapshot vector no longer scores
+    assert _top('moved')[0] == (pytest.approx(1, abs=1e-5), ids[3])
+
+
+def test_current_version_is_only_read_by_refresh(app_context, add_tickets, snapshot_dir, monkeypatch):
+    add_tickets(3, embedding=lambda i: json.dumps(fake_embedding(f"t{i}")))
+    first = EmbeddingIndex.write_snapshot()["version"]
+    assert _top('t0')
+
+    reads = []
+    current_version = EmbeddingIndex._current_version
+    monkeypatch.setattr(EmbeddingIndex, '_current_version', classmethod(
+        lambda cls: reads.append(1) or current_version()))
+    second = EmbeddingIndex.write_snapshot()["version"]
+    for _ in range(5):
+        _top('t1')
+    _embed(1, 'again')
+    db.session.commit()
+    assert reads == [] and EmbeddingIndex._snapshots['tickets'].version == first
+
+    EmbeddingIndex.refresh()
+    assert len(reads) == 1 and EmbeddingIndex._snapshots['tickets'].version == second
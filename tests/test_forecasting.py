@@ -0,0 +1,103 @@
+import os
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+from services.analytics_service import AnalyticsService
+
+# Cold forecast of one series (backtest, fit and simulation); generous for shared CI machines
+FORECAST_BUDGET_SECONDS = float(os.getenv('FORECAST_BUDGET_SECONDS', 0.5))
+HISTORY_DAYS = 90
+HORIZON = 7
+
+
+def _synthetic_series(days=400, seed=7):
+    """Poisson daily counts around a slow upward trend with weekly seasonality."""
+    t = np.arange(days)
+    rate = 20 + 0.02 * t + 6 * np.sin(2 * np.pi * t / 7)
+    counts = np.random.default_rng(seed).poisson(rate)
+    dates = [(date(2024, 1, 1) + timedelta(days=i)).isoformat() for i in range(days)]
+    return dates, counts
+
+
+def _history(dates, counts, origin):
+    return [{'date': d, 'count': int(c)}
+            for d, c in zip(dates[origin - HISTORY_DAYS:origin], counts[origin - HISTORY_DAYS:origin])]
+
+
+def test_interval_coverage_on_held_out_days():
+    dates, counts = _synthetic_series()
+    inside = total = 0
+    for origin in range(HISTORY_DAYS, len(counts) - HORIZON, HORIZON):
+        forecast = AnalyticsService.forecast_future_volume(_history(dates, counts, origin), HORIZON)
+        assert [f['date'] for f in forecast] == dates[origin:origin + HORIZON]
+        for item, actual in zip(forecast, counts[origin:origin + HORIZON]):
+            assert item['lower'] <= item['count'] <= item['upper']
+            inside += item['lower'] <= actual <= item['upper']
+            total += 1
+
+    # Nominal 0.1-0.9 interval: about 80% of held-out days should fall inside it
+    assert 0.75 <= inside / total <= 0.9, inside / total
+
+
+def test_wider_quantiles_widen_the_interval():
+    dates, counts = _synthetic_series()
+    history = _history(dates, counts, 200)
+    narrow = AnalyticsService.forecast_future_volume(history, HORIZON, lower=0.25, upper=0.75)
+    wide = AnalyticsService.forecast_future_volume(history, HORIZON, lower=0.05, upper=0.95)
+    for n, w in zip(narrow, wide):
+        assert n['count'] == w['count']
+        assert w['lower'] <= n['lower'] and n['upper'] <= w['upper']
+    assert sum(w['upper'] - w['lower'] for w in wide) > sum(n['upper'] - n['lower'] for n in narrow)
+
+
+def test_forecast_latency_budget():
+    dates, counts = _synthetic_series()
+    history = _history(dates, counts, 300)
+    start = time.perf_counter()
+    AnalyticsService.forecast_future_volume(history, HORIZON)
+    elapsed = time.perf_counter() - start
+    assert elapsed < FORECAST_BUDGET_SECONDS, f"forecast took {elapsed:.3f}s"
+
+
+def _weekly_volume(weeks=20, bucket='week'):
+    """A get_volume() result with a steady 70 tickets per week and partial first and last buckets."""
+    start = np.datetime64('2024-01-01')
+    step = 7 if bucket == 'week' else 1
+    buckets = [str(start + i * step) for i in range(weeks)]
+    counts = [12] + [70 + (i % 3) - 1 for i in range(weeks - 2)] + [25]
+    return {"bucket": bucket, "group_by": [], "buckets": buckets, "total": counts, "series": []}
+
+
+def test_week_buckets_skip_partial_edges_and_weekly_season(monkeypatch):
+    from utils import forecasting
+
+    scored = []
+    backtest = forecasting.backtest
+    monkeypatch.setattr(forecasting, 'backtest',
+                        lambda y, horizon, models=None, **kw: scored.append((list(y), models))
+                        or backtest(y, horizon, models=models, **kw))
+
+    volume = _weekly_volume()
+    result = AnalyticsService.forecast_volume_series(volume, periods=4)
+
+    assert result["buckets"] == [str(np.datetime64(volume["buckets"][-1]) + 7 * i) for i in range(1, 5)]
+    assert all(abs(count - 70) <= 3 for count in result["total"]), result["total"]
+    y, models = scored[0]
+    assert y == volume["total"][1:-1]
+    assert set(models) == set(forecasting.NONSEASONAL)
+
+
+def test_day_buckets_keep_seasonal_models(monkeypatch):
+    from utils import forecasting
+
+    scored = []
+    backtest = forecasting.backtest
+    monkeypatch.setattr(forecasting, 'backtest',
+                        lambda y, horizon, models=None, **kw: scored.append(models)
+                        or backtest(y, horizon, models=models, **kw))
+
+    result = AnalyticsService.forecast_volume_series(_weekly_volume(40, bucket='day'), periods=7)
+    assert len(result["total"]) == 7
+    assert scored == [None]
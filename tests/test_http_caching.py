@@ -0,0 +1,75 @@
+import gzip
+import json
+
+import pytest
+
+from services.ai_service import AIService
+
+
+def _seed(add_tickets):
+    # Well above COMPRESS_MIN_SIZE even as compact JSON
+    add_tickets(60, auto_tags=lambda i: f"printer-floor-{i},network-floor-{i},shared",
+                summary=lambda i: f"Printer on floor {i} is jammed")
+
+
+def test_gzip_and_brotli_round_trip(client, add_tickets):
+    _seed(add_tickets)
+    plain = client.get('/tickets/tags', headers={'Accept-Encoding': 'identity'})
+    assert 'Content-Encoding' not in plain.headers
+    expected = plain.get_json()
+
+    gzipped = client.get('/tickets/tags', headers={'Accept-Encoding': 'gzip'})
+    assert gzipped.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in gzipped.headers['Vary']
+    assert json.loads(gzip.decompress(gzipped.data)) == expected
+
+    brotli = pytest.importorskip('brotli')
+    encoded = client.get('/tickets/tags', headers={'Accept-Encoding': 'br, gzip'})
+    assert encoded.headers['Content-Encoding'] == 'br'
+    assert json.loads(brotli.decompress(encoded.data)) == expected
+
+
+def test_streamed_list_round_trip(client, add_tickets):
+    _seed(add_tickets)
+    expected = client.get('/tickets', headers={'Accept-Encoding': 'identity'}).get_json()
+    assert len(expected) == 60
+
+    response = client.get('/tickets', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Content-Length' not in response.headers
+    assert json.loads(gzip.decompress(response.data)) == expected
+
+
+def test_small_responses_are_not_compressed(client):
+    response = client.get('/tickets/tags', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+
+
+def test_etag_short_circuits_until_data_changes(client, add_tickets, monkeypatch):
+    _seed(add_tickets)
+    first = client.get('/tickets/tags', headers={'Accept-Encoding': 'identity'})
+    etag = first.headers['ETag']
+    assert first.headers['Cache-Control'] == 'no-cache'
+
+    # The 304 is answered before the view loads any rows
+    def fail():
+        raise AssertionError("view ran for a matching If-None-Match")
+    monkeypatch.setattr(AIService, 'get_all_ticket_tags', staticmethod(fail))
+    cached = client.get('/tickets/tags', headers={'If-None-Match': etag, 'Accept-Encoding': 'identity'})
+    assert cached.status_code == 304
+    assert cached.data == b''
+    monkeypatch.undo()
+
+    # Encoded representations carry a suffixed tag that still validates
+    gzipped = client.get('/tickets/tags', headers={'Accept-Encoding': 'gzip'})
+    gzip_etag = gzipped.headers['ETag']
+    assert gzip_etag != etag and gzip_etag.strip('"').startswith(etag.strip('"'))
+    assert client.get('/tickets/tags', headers={'If-None-Match': gzip_etag,
+                                                'Accept-Encoding': 'gzip'}).status_code == 304
+
+    # A write bumps the data version, so the old tag no longer matches
+    add_tickets(1, auto_tags='new-tag')
+    changed = client.get('/tickets/tags', headers={'If-None-Match': etag, 'Accept-Encoding': 'identity'})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+    assert {"tag": "new-tag", "count": 1} in changed.get_json()['tags']
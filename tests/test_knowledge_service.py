@@ -0,0 +1,71 @@
+import json
+
+import numpy as np
+
+from extensions import db
+from models.knowledge import KnowledgeArticle
+from models.knowledge_passage import KnowledgePassage
+from services.ai_service import AIService
+from services.knowledge_service import KnowledgeService
+from tests.conftest import fake_embedding
+
+SENTENCES = [f"Step {i}: check that service number {i} responds before restarting it." for i in range(12)]
+
+
+def test_passages_respect_the_size_and_overlap_the_previous_one():
+    passages = KnowledgeService.split_passages(" ".join(SENTENCES), max_tokens=40, overlap_tokens=20)
+
+    assert len(passages) > 3
+    assert all(KnowledgeService._tokens(p) <= 40 for p in passages)
+    for previous, current in zip(passages, passages[1:]):
+        carried = previous.split('. ')[-1]
+        assert current.startswith(carried) and carried != previous  # overlap, but progress
+    # Every sentence survives, in order
+    joined = " ".join(passages)
+    assert [joined.find(s) for s in SENTENCES] == sorted(joined.find(s) for s in SENTENCES)
+    assert all(s in joined for s in SENTENCES)
+
+
+def test_long_sentences_are_cut_at_word_boundaries():
+    words = [f"word{i}" for i in range(200)]
+    passages = KnowledgeService.split_passages(" ".join(words), max_tokens=25, overlap_tokens=0)
+    assert all(len(p) <= 100 for p in passages)
+    assert " ".join(passages).split() == words
+
+
+def test_index_article_embeds_passages_in_batches(app_context, fake_openai, monkeypatch):
+    monkeypatch.setattr(KnowledgeService, 'PASSAGE_TOKENS', 40)
+    monkeypatch.setattr(AIService, 'EMBEDDING_BATCH_SIZE', 4)
+    article = KnowledgeArticle(title='Service restarts', content=" ".join(SENTENCES))
+    db.session.add(article)
+
+    count = KnowledgeService.index_article(article)
+    db.session.commit()
+
+    batches = [call[1] for call in fake_openai.calls if call[0] == 'embedding']
+    assert count == KnowledgePassage.query.count() > 4
+    assert [len(b) for b in batches] == [4] * (count // 4) + ([count % 4] if count % 4 else [])
+    assert all(text.startswith('Service restarts\n') for batch in batches for text in batch)
+    # The article embedding is the normalized mean of its (unit) passage vectors
+    mean = np.mean([fake_embedding(t) for batch in batches for t in batch], axis=0)
+    assert np.allclose(json.loads(article.embedding), mean / np.linalg.norm(mean), atol=1e-6)
+
+
+def test_article_ranks_by_its_best_passage(app_context, fake_openai, monkeypatch):
+    monkeypatch.setattr(KnowledgeService, 'PASSAGE_TOKENS', 40)
+    long_article = KnowledgeArticle(title='Runbook', content=" ".join(SENTENCES))
+    short_articles = [KnowledgeArticle(title=f"Note {i}", content=f"Unrelated note {i}.") for i in range(4)]
+    db.session.add_all([long_article] + short_articles)
+    for article in [long_article] + short_articles:
+        KnowledgeService.index_article(article)
+    db.session.commit()
+
+    # The query matches one passage in the middle of the long article exactly
+    target = long_article.passages.all()[2]
+    hits = KnowledgeService.search(fake_embedding(f"Runbook\n{target.content}"), top_k=3)
+
+    score, article, passage = hits[0]
+    assert article.id == long_article.id and score > 0.999
+    assert passage == {'id': target.id, 'position': 2, 'content': target.content}
+    assert len({a.id for _, a, _ in hits}) == len(hits) == 3  # one hit per article
+    assert [s for s, _, _ in hits] == sorted((s for s, _, _ in hits), reverse=True)
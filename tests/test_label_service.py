@@ -0,0 +1,47 @@
+import json
+
+from models.label import CanonicalLabel
+from models.ticket import Ticket
+from services.ticket_service import TicketService
+
+CLASSIFICATIONS = {
+    'printer jam': ('Hardware', ['printer', 'jam']),
+    'printer offline': ('hardware ', ['Printer', 'network']),
+    'vpn drops': ('Network', ['vpn', 'network']),
+    'wifi slow': ('Network', ['wifi']),
+}
+
+
+def _responder(kwargs):
+    prompt = kwargs['messages'][-1]['content']
+    if kwargs.get('response_format', {}).get('type') == 'json_schema':
+        lines = [json.loads(line) for line in prompt.splitlines() if line.strip().startswith('{"id"')]
+        return json.dumps({"results": [
+            {"id": item["id"], "category": CLASSIFICATIONS[item["summary"]][0],
+             "tags": CLASSIFICATIONS[item["summary"]][1], "sentiment": 0.0}
+            for item in lines
+        ]})
+    return json.dumps({"suggested_solution": "Restart it", "relevant_links": []})
+
+
+def test_analyze_dirty_matches_labels_once_per_batch(app_context, add_tickets, fake_openai):
+    fake_openai.responder = _responder
+    add_tickets(4, summary=lambda i: list(CLASSIFICATIONS)[i])
+
+    assert TicketService.analyze_dirty(batch_size=10) == 4
+
+    label_batches = [call[1] for call in fake_openai.calls
+                     if call[0] == 'embedding' and isinstance(call[1], list)]
+    assert label_batches == [['Hardware', 'Network'], ['printer', 'network', 'jam', 'vpn', 'wifi']]
+
+    tickets = {t.summary: t for t in Ticket.query}
+    assert tickets['printer offline'].auto_category == 'Hardware'
+    assert tickets['printer offline'].category_id == tickets['printer jam'].category_id
+    assert tickets['printer offline'].auto_tags == 'printer,network'
+    assert CanonicalLabel.query.filter_by(kind='category').count() == 2
+
+    # Known labels resolve through their aliases without embedding
+    fake_openai.calls.clear()
+    tickets['wifi slow'].needs_analysis = True
+    assert TicketService.analyze_dirty() == 1
+    assert not [call for call in fake_openai.calls if call[0] == 'embedding' and isinstance(call[1], list)]
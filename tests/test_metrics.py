@@ -0,0 +1,75 @@
+import json
+import re
+
+from flask import g
+
+from services.ai_service import AIService
+from services.usage_service import UsageService
+
+
+def _sample(client, metric, **labels):
+    """Value of one exposition line of /metrics (0 when the series does not exist yet)."""
+    text = client.get('/metrics').get_data(as_text=True)
+    selector = ",".join(f'{k}="{v}"' for k, v in labels.items())
+    match = re.search(rf'^{metric}\{{{re.escape(selector)}\}} (\S+)$', text, re.M)
+    return float(match.group(1)) if match else 0.0
+
+
+def _timings(response):
+    return {part.split(';')[0].strip(): part for part in response.headers['Server-Timing'].split(',')}
+
+
+def test_request_histograms_and_server_timing(client, add_tickets):
+    add_tickets(3, auto_tags='vpn,printer')
+    labels = dict(endpoint='/tickets/tags', method='GET', status='200')
+    requests_before = _sample(client, 'http_request_duration_seconds_count', **labels)
+    queries_before = _sample(client, 'http_request_sql_queries_count', endpoint='/tickets/tags')
+
+    response = client.get('/tickets/tags')
+    assert response.status_code == 200
+
+    timings = _timings(response)
+    assert {'db', 'serialize', 'total'} <= set(timings)
+    assert re.search(r'db;dur=[\d.]+;desc="[1-9]\d* calls"', timings['db'])
+    assert _sample(client, 'http_request_duration_seconds_count', **labels) == requests_before + 1
+    assert _sample(client, 'http_request_sql_queries_count', endpoint='/tickets/tags') == queries_before + 1
+    assert _sample(client, 'http_request_span_seconds_count', endpoint='/tickets/tags', span='db') >= 1
+
+
+def test_llm_calls_show_in_server_timing(client, fake_openai):
+    response = client.post('/knowledge', json={"title": "VPN", "content": "Reconnect the VPN client."})
+    assert response.status_code == 201
+    assert 'llm;dur=' in _timings(response)['llm']
+
+
+def test_streamed_llm_time_is_observed_after_the_headers(client, add_tickets, fake_openai):
+    fake_openai.responder = lambda kwargs: json.dumps(
+        {"suggested_solution": "Restart the print spooler", "relevant_links": []})
+    ticket_id = add_tickets(1, summary='printer jam')[0]
+    endpoint = '/tickets/<int:ticket_id>/suggest-solution'
+    before = _sample(client, 'http_request_span_seconds_count', endpoint=endpoint, span='llm')
+
+    response = client.get(f'/tickets/{ticket_id}/suggest-solution?stream=true')
+    assert 'event: result' in response.get_data(as_text=True)
+
+    # The context's embedding lookup is observed with the headers, the streamed completion after the body
+    assert [call[0] for call in fake_openai.calls] == ['embedding', 'chat']
+    assert _sample(client, 'http_request_span_seconds_count', endpoint=endpoint, span='llm') == before + 2
+    report = client.get('/analytics/ai-usage').get_json()
+    operation = next(o for o in report['by_operation'] if o['name'] == 'suggest_solution')
+    # Context embedding (8 tokens) plus the streamed completion's final usage chunk
+    assert (operation['calls'], operation['prompt_tokens'], operation['completion_tokens']) == (2, 108, 20)
+
+
+def test_abandoned_stream_is_closed_and_recorded(app, fake_openai):
+    fake_openai.responder = lambda kwargs: json.dumps({"suggested_solution": "x" * 40})
+    with app.test_request_context('/tickets/1/suggest-solution'):
+        deltas = AIService._stream_chat_completion('suggest_solution', messages=[])
+        assert next(deltas)
+        deltas.close()  # client disconnected
+
+        assert fake_openai.streams[0].closed
+        assert g._metric_spans['llm'][0] == 1
+        [(key, entry)] = UsageService._pending.items()
+        assert key[1] == 'suggest_solution'
+        assert entry[:2] == [1, 0]  # one call, not an error
@@ -0,0 +1,113 @@
+import json
+import re
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event, insert, inspect, text
+
+from extensions import db
+from models.cluster import TicketCluster
+from models.ticket import Ticket
+from models.ticket_neighbor import TicketNeighbor
+from services.analytics_service import AnalyticsService
+from services.cluster_service import ClusterService
+from services.embedding_index import EmbeddingIndex, write_embedding_matrix
+from services.similarity_service import SimilarityService
+from services.ticket_service import TicketService
+
+# Plans are checked with SQLite's EXPLAIN QUERY PLAN against the test database.
+TICKETS = 5000
+LARGE_TABLES = ('tickets', 'ticket_neighbors')
+# A bare "SCAN <table>" is a full table scan; index scans read "SCAN <table> USING ... INDEX"
+FULL_SCAN = re.compile(r'^SCAN (\w+)(?: AS \w+)?$')
+
+
+@pytest.fixture
+def seeded(app_context):
+    now = datetime.now()
+    db.session.execute(insert(TicketCluster), [{"id": c, "centroid": "[]", "size": 0} for c in range(1, 21)])
+    db.session.execute(insert(Ticket), [{
+        "issue_key": f"T-{i}",
+        "issue_type": ('Bug', 'Task', 'Support', 'Feature Request')[i % 4],
+        "summary": f"Ticket {i}",
+        "created_at": now - timedelta(minutes=105 * i),  # about a year of history
+        "auto_category": f"Category {i % 40}",
+        "embedding": json.dumps([1.0, i % 7, 0.5]) if i % 10 == 0 else None,
+        "needs_analysis": i % 100 == 0,
+        "cluster_id": i % 20 + 1 if i % 10 == 0 else None,
+        "cluster_score": (i % 97) / 97,
+    } for i in range(1, TICKETS + 1)])
+    db.session.execute(insert(TicketNeighbor), [
+        {"ticket_id": i, "rank": r, "neighbor_id": (i + r) % TICKETS + 1, "score": 0.5 + (i * 7 + r) % 50 / 100}
+        for i in range(1, TICKETS + 1) for r in range(3)
+    ])
+    db.session.commit()
+    db.session.execute(text('ANALYZE'))
+
+
+@pytest.fixture
+def captured_selects():
+    """Every SELECT sent to the database while the test runs, with its parameters."""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            statements.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', capture)
+    yield statements
+    event.remove(db.engine, 'before_cursor_execute', capture)
+
+
+def _full_scans(statement, parameters):
+    cursor = db.session.connection().connection.cursor()
+    rows = cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+    return [detail for *_, detail in rows
+            if (m := FULL_SCAN.match(detail)) and m.group(1) in LARGE_TABLES]
+
+
+def test_hot_path_queries_use_indexes(seeded, captured_selects, tmp_path):
+    AnalyticsService.get_ticket_volume_history(30)
+    AnalyticsService.get_volume(group_by=['issue_type'], days=90)
+    TicketService.analyze_dirty(limit=10)  # no AI client: only the dirty-set queries run
+    ClusterService.get_cluster_ticket_ids(3)
+    SimilarityService.get_neighbors(42)
+    SimilarityService.get_duplicate_pairs(min_score=0.98)
+    write_embedding_matrix(EmbeddingIndex._statement('tickets'), str(tmp_path / 'tickets.npy'))
+
+    hot = [(s, p) for s, p in captured_selects if any(t in s for t in LARGE_TABLES)]
+    assert len(hot) >= 7
+    offenders = {s: scans for s, p in hot if (scans := _full_scans(s, p))}
+    assert not offenders, json.dumps(offenders, indent=2)
+
+
+def test_create_indexes_adds_missing_and_drops_superseded(app):
+    with app.app_context():
+        db.session.execute(text('DROP INDEX ix_tickets_created_at_issue_type'))
+        db.session.execute(text('DROP INDEX ix_tickets_embedded_id'))
+        db.session.execute(text('CREATE INDEX ix_tickets_cluster_id ON tickets (cluster_id)'))
+        db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=['tickets', 'create-indexes'])
+    assert result.exit_code == 0, result.output
+    assert 'ix_tickets_cluster_id' in result.output
+
+    with app.app_context():
+        names = {i['name'] for i in inspect(db.engine).get_indexes('tickets')}
+    assert {index.name for index in Ticket.__table__.indexes} <= names
+    assert 'ix_tickets_cluster_id' not in names
+    assert 'already present' in app.test_cli_runner().invoke(args=['tickets', 'create-indexes']).output
+
+
+def test_create_indexes_upgrades_a_legacy_tickets_table(app, add_tickets, legacy_tickets):
+    add_tickets(3)
+    legacy_tickets()
+
+    result = app.test_cli_runner().invoke(args=['tickets', 'create-indexes'])
+    assert result.exit_code == 0, result.output
+    assert 'Added columns: ' in result.output
+
+    with app.app_context():
+        names = {i['name'] for i in inspect(db.engine).get_indexes('tickets')}
+        assert {index.name for index in Ticket.__table__.indexes} <= names
+        assert Ticket.query.count() == 3
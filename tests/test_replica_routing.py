@@ -0,0 +1,93 @@
+import io
+import json
+
+import pytest
+from sqlalchemy import insert, select
+
+from config import DevelopmentConfig, _replica_binds, config
+from extensions import db, read_engine
+from models.ticket import Ticket
+from run import create_app
+
+
+@pytest.fixture
+def replica_app(app, tmp_path):
+    """The test app with a 'replica' bind on a second SQLite file holding its own rows."""
+    class ReplicaConfig(DevelopmentConfig):
+        SQLALCHEMY_BINDS = _replica_binds(f"sqlite:///{tmp_path / 'replica.db'}")
+
+    config['replica-test'] = ReplicaConfig
+    replica_app = create_app('replica-test')
+    with replica_app.app_context():
+        db.metadata.create_all(db.engines['replica'])
+        with db.engines['replica'].begin() as conn:
+            conn.execute(insert(Ticket).values(issue_key='R-1', summary='VPN drops', auto_tags='vpn'))
+        db.session.add(Ticket(issue_key='P-1', summary='Printer jam', auto_tags='printer'))
+        db.session.commit()
+    yield replica_app
+    del config['replica-test']
+
+
+def test_reads_use_the_replica_and_writes_the_primary(replica_app):
+    client = replica_app.test_client()
+
+    tags = client.get('/tickets/tags').get_json()['tags']
+    assert tags == [{"tag": "vpn", "count": 1}]
+
+    csv = b"issue_key,summary,issue_type,created_at\nP-2,Password reset,Task,2024-05-01 09:00:00\n"
+    response = client.post('/tickets/import', data={'file': (io.BytesIO(csv), 'tickets.csv')},
+                           content_type='multipart/form-data')
+    assert response.status_code == 200
+
+    with replica_app.app_context():
+        assert read_engine() is db.engines['replica']
+        primary = set(db.session.execute(select(Ticket.issue_key)).scalars())
+        with db.engines['replica'].connect() as conn:
+            replica = set(conn.execute(select(Ticket.issue_key)).scalars())
+    assert primary == {'P-1', 'P-2'}
+    assert replica == {'R-1'}
+
+
+def test_pool_gauges_cover_both_binds(replica_app):
+    metrics = replica_app.test_client().get('/metrics').get_data(as_text=True)
+    assert 'db_pool_checked_out{bind="primary"}' in metrics
+    assert 'db_pool_checked_out{bind="replica"}' in metrics
+
+
+def test_without_a_replica_reads_fall_back_to_the_primary(app_context):
+    assert read_engine() is db.engine
+
+
+def test_etags_follow_the_replica_data_version(replica_app):
+    from models.data_version import DataVersion
+
+    client = replica_app.test_client()
+    etag = client.get('/tickets/tags').headers['ETag']
+
+    # A write the replica has not replayed yet: same stale body, so the tag must not change
+    with replica_app.app_context():
+        DataVersion.bump(Ticket.__tablename__)
+        db.session.commit()
+    response = client.get('/tickets/tags', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+
+    # Once the replica catches up, the new rows come with a new tag
+    with replica_app.app_context():
+        with db.engines['replica'].begin() as conn:
+            conn.execute(insert(Ticket).values(issue_key='R-2', summary='Printer jam', auto_tags='printer'))
+            conn.execute(insert(DataVersion).values(table_name=Ticket.__tablename__, version=1))
+    response = client.get('/tickets/tags', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert {t['tag'] for t in response.get_json()['tags']} == {'vpn', 'printer'}
+
+
+def test_clustering_reads_embeddings_from_the_primary(replica_app):
+    from services.cluster_service import ClusterService
+
+    with replica_app.app_context():
+        # The replica lags: it has no embedded tickets yet, the primary has one
+        db.session.query(Ticket).filter_by(issue_key='P-1').update({'embedding': json.dumps([1.0, 0.0])})
+        db.session.commit()
+        assert ClusterService.run_clustering(k=2) == {"clusters": 1, "tickets": 1}
+        assert db.session.query(Ticket.cluster_id).filter_by(issue_key='P-1').scalar() is not None
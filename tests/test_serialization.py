@@ -0,0 +1,81 @@
+import os
+import time
+from datetime import datetime, timedelta
+
+from flask import jsonify
+from sqlalchemy import insert, text
+
+from extensions import db
+from models.knowledge import KnowledgeArticle
+from models.ticket import Ticket
+from utils import serialization
+
+# Rows serialized per benchmark run, and the minimum rows/s ratio of streaming over to_dict()+jsonify
+BENCHMARK_ROWS = int(os.getenv('SERIALIZATION_BENCHMARK_ROWS', 5000))
+MIN_STREAM_SPEEDUP = float(os.getenv('MIN_STREAM_SPEEDUP', 1.5))
+
+
+def test_ticket_stream_matches_to_dict(app, client, add_tickets, monkeypatch):
+    add_tickets(5, auto_tags=lambda i: ' login , auth,,' if i % 2 else None,
+                updated_at=lambda i: datetime(2024, 2, 1, 8, 30, 15, 123456) if i % 2 else None,
+                sentiment_score=lambda i: i / 10, issue_id=lambda i: 100 + i, assignee=None)
+    monkeypatch.setattr(serialization, 'CHUNK_SIZE', 2)  # several chunks spliced together
+
+    streamed = client.get('/tickets', headers={'Accept-Encoding': 'identity'}).get_json()
+    with app.app_context():
+        expected = [t.to_dict() for t in Ticket.query.order_by(Ticket.id)]
+    assert streamed == expected
+    assert streamed[1]['auto_tags'] == ['login', 'auth']
+
+
+def test_knowledge_stream_matches_to_dict(app, client):
+    with app.app_context():
+        db.session.add_all([KnowledgeArticle(title=f"Article {i}", content="Steps", tags="vpn, network" if i else None)
+                            for i in range(3)])
+        db.session.commit()
+        expected = [a.to_dict() for a in KnowledgeArticle.query.order_by(KnowledgeArticle.id)]
+    assert client.get('/knowledge', headers={'Accept-Encoding': 'identity'}).get_json() == expected
+
+
+def test_empty_stream_is_an_empty_array(client):
+    assert client.get('/tickets').get_json() == []
+
+
+def test_query_errors_return_500_before_streaming(app, client):
+    with app.app_context():
+        db.session.execute(text('DROP TABLE knowledge_articles'))
+        db.session.commit()
+    response = client.get('/knowledge')
+    assert response.status_code == 500
+    assert 'error' in response.get_json()
+
+
+def _rows_per_second(app, build):
+    """Best of three: rows/s to build the /tickets response and drain its body."""
+    best = 0.0
+    for _ in range(3):
+        with app.test_request_context('/tickets'):
+            db.session.expire_all()
+            start = time.perf_counter()
+            body = b''.join(build().iter_encoded())
+            elapsed = time.perf_counter() - start
+        best = max(best, BENCHMARK_ROWS / elapsed)
+    return best, body
+
+
+def test_streaming_rows_per_second_beats_to_dict(app, app_context):
+    db.session.execute(insert(Ticket), [
+        {'issue_key': f"T-{i}", 'issue_type': 'Task', 'summary': f"Ticket {i} cannot reach the VPN",
+         'status': 'Open', 'priority': 'Medium', 'auto_tags': 'vpn, network',
+         'created_at': datetime(2024, 1, 1) + timedelta(minutes=i), 'sentiment_score': 0.1}
+        for i in range(BENCHMARK_ROWS)])
+    db.session.commit()
+
+    baseline, expected = _rows_per_second(app, lambda: jsonify(
+        [t.to_dict() for t in Ticket.query.order_by(Ticket.id).all()]))
+    streamed, body = _rows_per_second(app, lambda: serialization.stream_json_rows(
+        Ticket.serialized_columns(), csv_columns=('auto_tags',)))
+
+    assert app.json.loads(body) == app.json.loads(expected)
+    print(f"to_dict+jsonify: {baseline:,.0f} rows/s, stream_json_rows: {streamed:,.0f} rows/s")
+    assert streamed >= MIN_STREAM_SPEEDUP * baseline, (baseline, streamed)
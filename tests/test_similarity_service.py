@@ -0,0 +1,56 @@
+import json
+
+import numpy as np
+import pytest
+
+from extensions import db
+from models.ticket_neighbor import TicketNeighbor
+from services.similarity_service import SimilarityService
+
+
+def _random_embedding(i, dimensions=16):
+    return json.dumps(np.random.default_rng(i).normal(size=dimensions).tolist())
+
+
+def _brute_force(ids, k):
+    matrix = np.array([json.loads(_random_embedding(i)) for i in range(len(ids))])
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    scores = matrix @ matrix.T
+    np.fill_diagonal(scores, -np.inf)
+    return {ids[i]: [(ids[j], scores[i, j]) for j in np.argsort(-scores[i])[:k]] for i in range(len(ids))}
+
+
+def _stored():
+    stored = {}
+    for row in TicketNeighbor.query.order_by(TicketNeighbor.ticket_id, TicketNeighbor.rank):
+        stored.setdefault(row.ticket_id, []).append((row.neighbor_id, row.score))
+    return stored
+
+
+@pytest.mark.parametrize('block_size', [7, 64])
+def test_tiled_top_k_matches_brute_force(app_context, add_tickets, block_size):
+    ids = add_tickets(30, embedding=_random_embedding)
+    add_tickets(2)  # not embedded: never a neighbor
+
+    assert SimilarityService.compute_neighbors(k=4, block_size=block_size) == {"tickets": 30, "neighbors": 120}
+
+    stored, expected = _stored(), _brute_force(ids, 4)
+    assert set(stored) == set(ids)
+    for ticket_id, neighbors in expected.items():
+        assert [n for n, _ in stored[ticket_id]] == [n for n, _ in neighbors]
+        assert np.allclose([s for _, s in stored[ticket_id]], [s for _, s in neighbors], atol=1e-5)
+
+
+def test_invalidate_drops_rows_in_both_directions(app_context, add_tickets):
+    ids = add_tickets(12, embedding=_random_embedding)
+    SimilarityService.compute_neighbors(k=3)
+    target = ids[0]
+    assert any(target in [n for n, _ in neighbors] for neighbors in _stored().values())
+
+    SimilarityService.invalidate(target)
+    db.session.commit()
+
+    stored = _stored()
+    assert target not in stored
+    assert all(target not in [n for n, _ in neighbors] for neighbors in stored.values())
+    assert SimilarityService.get_neighbors(target) is None
@@ -0,0 +1,101 @@
+import json
+import types
+from datetime import datetime, timedelta
+
+import pytest
+
+from extensions import db
+from models.resolution_sketch import ResolutionSketch
+from models.ticket import Ticket
+from services.sla_service import SLAService
+from utils.sketch import QuantileSketch
+
+
+def _ticket(hours, priority='High', due_in_hours=None):
+    created = datetime(2024, 1, 1)
+    return types.SimpleNamespace(
+        created_at=created, updated_at=created + timedelta(hours=hours), status='Done', resolution='Fixed',
+        due_date=created + timedelta(hours=due_in_hours) if due_in_hours is not None else None,
+        priority=priority, issue_type='Bug', assignee=None)
+
+
+def _apply(changes):
+    delta = {}
+    for before, after in changes:
+        SLAService.track(delta, before and SLAService.observe(before), after and SLAService.observe(after))
+    SLAService.apply(delta)
+    db.session.commit()
+
+
+def _row(dimension='all', value=''):
+    return ResolutionSketch.query.filter_by(dimension=dimension, value=value).one()
+
+
+def test_sketch_removals_never_go_negative():
+    sketch = QuantileSketch()
+    sketch.add_many([5.0, 10.0])
+    sketch.add_many([10.0, 10.0, 200.0, 0.0], [-1, -1, -1, -1])
+    assert sketch.count == 1 and sketch.zero_count == 0
+    assert all(n > 0 for n in sketch.bins.values())
+    assert sketch.quantile(0.5) == pytest.approx(5.0, rel=0.01)
+    assert sketch.total == pytest.approx(5.0)
+
+
+def test_apply_adds_and_removes_exactly(app_context):
+    first, second = _ticket(10, due_in_hours=5), _ticket(30, due_in_hours=50)
+    _apply([(None, first), (None, second)])
+    row = _row()
+    assert (row.resolved, row.with_due_date, row.breached) == (2, 2, 1)
+
+    reopened = _ticket(10, due_in_hours=5)
+    reopened.status, reopened.resolution = 'Open', None
+    _apply([(first, reopened)])
+    row = _row()
+    assert (row.resolved, row.with_due_date, row.breached) == (1, 1, 0)
+    assert QuantileSketch.from_dict(json.loads(row.sketch)).quantile(0.5) == pytest.approx(30, rel=0.01)
+
+
+def test_apply_clamps_removals_of_uncounted_tickets(app_context):
+    # Resolved before the sketches existed, then reopened: nothing to remove
+    resolved = _ticket(12, priority='Low', due_in_hours=1)
+    reopened = _ticket(12, priority='Low', due_in_hours=1)
+    reopened.status, reopened.resolution = 'Open', None
+    _apply([(resolved, reopened)])
+
+    for dimension, value in (('all', ''), ('priority', 'Low')):
+        row = _row(dimension, value)
+        assert (row.resolved, row.with_due_date, row.breached) == (0, 0, 0)
+        sketch = json.loads(row.sketch)
+        assert sketch['bins'] == {} and sketch['count'] == 0
+    assert SLAService.get_resolution_stats('priority') == []
+
+    _apply([(None, _ticket(4, priority='Low'))])
+    stats = SLAService.get_resolution_stats('priority')
+    assert stats[0]['resolved'] == 1 and stats[0]['p50_hours'] == pytest.approx(4, rel=0.01)
+
+
+def _sketch_rows():
+    return {(r.dimension, r.value): (r.resolved, r.with_due_date, r.breached, json.loads(r.sketch))
+            for r in ResolutionSketch.query}
+
+
+def test_rebuild_matches_incremental_sketches(app_context, add_tickets):
+    # Whitespace-only resolutions and padded statuses are where SQL and Python rules used to disagree
+    statuses = ['Done', ' done ', 'Closed\n', 'Open', 'In Progress', 'RESOLVED', ' Open ']
+    resolutions = [None, '', '  ', '\t', 'Fixed', ' Fixed ', None]
+    add_tickets(21, status=lambda i: statuses[i % 7], resolution=lambda i: resolutions[i // 3 % 7],
+                priority=lambda i: ['High', 'Low', None][i % 3],
+                updated_at=lambda i: datetime(2024, 1, 1) + timedelta(hours=i * 5 + 3),
+                due_date=lambda i: datetime(2024, 1, 1) + timedelta(hours=i * 3) if i % 2 else None)
+
+    delta = {}
+    for ticket in Ticket.query:
+        SLAService.track(delta, None, SLAService.observe(ticket))
+    SLAService.apply(delta)
+    db.session.commit()
+    incremental = _sketch_rows()
+    assert incremental[('all', '')][0] == sum(
+        SLAService._is_resolved(t.resolution, t.status) for t in Ticket.query)
+
+    assert SLAService.rebuild(batch_size=4) == incremental[('all', '')][0]
+    assert _sketch_rows() == incremental
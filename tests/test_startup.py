@@ -0,0 +1,37 @@
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Import plus first request measured ~1.0s; the budget leaves room for slower machines.
+STARTUP_BUDGET_SECONDS = float(os.getenv('STARTUP_BUDGET_SECONDS', 3.0))
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import run
+imported = time.perf_counter() - start
+run.app.test_client().get('/')
+print(json.dumps({
+    "import_seconds": imported,
+    "first_request_seconds": time.perf_counter() - start,
+    "heavy_modules": [m for m in ("pandas", "openai", "statsmodels") if m in sys.modules],
+}))
+"""
+
+
+def _probe():
+    # A fresh interpreter, so modules imported by the test session do not count
+    result = subprocess.run([sys.executable, '-c', _PROBE], cwd=ROOT, env=os.environ.copy(),
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_startup_does_not_import_heavy_modules():
+    assert _probe()["heavy_modules"] == []
+
+
+def test_time_to_first_request_within_budget():
+    timings = min((_probe() for _ in range(2)), key=lambda t: t["first_request_seconds"])
+    assert timings["first_request_seconds"] < STARTUP_BUDGET_SECONDS, timings
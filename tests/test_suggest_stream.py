@@ -0,0 +1,41 @@
+import json
+
+from tests.conftest import FakeStream
+
+SUGGESTION = {"suggested_solution": "Clear the queue and restart the print spooler", "relevant_links": []}
+
+
+def _events(response):
+    assert response.mimetype == 'text/event-stream'
+    events = []
+    for block in response.get_data(as_text=True).split('\n\n'):
+        if block:
+            event, data = block.split('\n')
+            events.append((event.removeprefix('event: '), json.loads(data.removeprefix('data: '))))
+    return events
+
+
+def test_stream_emits_tokens_then_one_result(client, add_tickets, fake_openai):
+    fake_openai.responder = lambda kwargs: json.dumps(SUGGESTION)
+    ticket_id = add_tickets(1, summary='printer jam')[0]
+
+    events = _events(client.get(f'/tickets/{ticket_id}/suggest-solution?stream=true'))
+
+    names = [event for event, _ in events]
+    assert names == ['token'] * (len(names) - 1) + ['result']
+    assert len(names) - 1 == -(-len(json.dumps(SUGGESTION)) // FakeStream.STEP)
+    assert "".join(data["content"] for _, data in events[:-1]) == json.dumps(SUGGESTION)
+
+    result = events[-1][1]
+    assert result["ai_suggestion"] == SUGGESTION
+    assert set(result) == {"ai_suggestion", "relevant_knowledge", "context"}
+
+
+def test_error_event_is_terminal(client, add_tickets, fake_openai):
+    fake_openai.responder = lambda kwargs: '{"suggested_solution": "Restart'  # truncated JSON
+    ticket_id = add_tickets(1)[0]
+
+    events = _events(client.get(f'/tickets/{ticket_id}/suggest-solution?stream=true'))
+
+    assert [event for event, _ in events[-2:]] == ['token', 'error']
+    assert 'result' not in {event for event, _ in events}
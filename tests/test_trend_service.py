@@ -0,0 +1,93 @@
+from datetime import date, timedelta
+
+from extensions import db
+from models.trend import TrendState
+from services.trend_service import TrendService
+
+DAY = date(2024, 3, 1)
+
+
+def _apply_history(days=20, spike=12):
+    """Two or three tickets a day in Network before DAY, `spike` tickets on DAY."""
+    delta = {}
+    for i in range(days, 0, -1):
+        for _ in range(2 + i % 2):
+            TrendService.track(delta, None, (DAY - timedelta(days=i), 'Network', None))
+    for _ in range(spike):
+        TrendService.track(delta, None, (DAY, 'Network', None))
+    TrendService.apply(delta)
+    db.session.commit()
+
+
+def _state_count():
+    return db.session.query(db.func.count()).select_from(TrendState).scalar()
+
+
+def _states():
+    return {(s.metric, s.category): (s.mean, s.variance, s.observations, s.through_date)
+            for s in TrendState.query}
+
+
+def test_states_are_created_by_writes_and_never_written_by_reads(app_context):
+    _apply_history()
+    assert _state_count() == 2 * len(TrendService.METRICS)
+
+    before = _states()
+    result = TrendService.get_anomalies(day=DAY)
+    assert result["evaluated"] == 2
+    assert _states() == before
+
+    db.session.query(TrendState).delete()
+    db.session.commit()
+    assert TrendService.get_anomalies(day=DAY) == result
+    assert _state_count() == 0
+
+    TrendService.rebuild()
+    assert _state_count() == 0  # no tickets to rebuild from
+
+
+def test_advance_persists_folded_states(app, app_context):
+    _apply_history()
+    assert TrendService.advance(until=DAY - timedelta(days=1)) == 2 * len(TrendService.METRICS)
+    db.session.commit()
+    folded = db.session.get(TrendState, ('volume', 'Network'))
+    assert folded.through_date == DAY - timedelta(days=1) and folded.observations == 20
+    assert TrendService.advance(until=DAY - timedelta(days=1)) == 0
+
+    result = app.test_cli_runner().invoke(args=['analytics', 'advance-trends'])
+    assert result.exit_code == 0, result.output
+    assert 'Advanced 4 trend states' in result.output
+
+
+def test_past_dates_ignore_states_folded_beyond_them(app_context):
+    _apply_history()
+    expected = TrendService.get_anomalies(day=DAY)
+
+    # Baselines folded through later days must not leak into an earlier evaluation
+    TrendService.advance(until=DAY + timedelta(days=5))
+    db.session.commit()
+    assert TrendService.get_anomalies(day=DAY) == expected
+    assert {(a["metric"], a["category"]) for a in expected["anomalies"]} == {
+        ('volume', 'Network'), ('volume', TrendService.ALL)}
+
+
+def test_volume_spike_and_explicit_zero_threshold(app_context):
+    _apply_history()
+
+    result = TrendService.get_anomalies(day=DAY)
+    assert result["threshold"] == TrendService.Z_THRESHOLD
+    assert {(a["metric"], a["category"]) for a in result["anomalies"]} == {
+        ('volume', 'Network'), ('volume', TrendService.ALL)}
+
+    result = TrendService.get_anomalies(threshold=0, day=DAY + timedelta(days=1))
+    assert result["threshold"] == 0
+    # No tickets on the next day: z < 0, which a zero threshold does not flag as a spike
+    assert result["evaluated"] == 2 and result["anomalies"] == []
+
+
+def test_anomalies_endpoint_passes_zero_threshold(client, app):
+    with app.app_context():
+        _apply_history()
+    response = client.get(f'/analytics/anomalies?threshold=0&date={DAY.isoformat()}')
+    assert response.status_code == 200
+    assert response.get_json()["threshold"] == 0
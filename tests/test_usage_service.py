@@ -0,0 +1,58 @@
+import time
+import types
+
+from extensions import db
+from models.ai_usage import AIUsageBucket
+from services.usage_service import UsageService
+
+
+def _usage(prompt_tokens, completion_tokens):
+    return types.SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+
+
+def test_usage_is_shared_through_the_database(app_context):
+    UsageService.record('classify_ticket', 'gpt-4o-mini', _usage(100, 20), latency=0.5)
+    UsageService.flush()
+    assert UsageService._pending == {}
+
+    # A second worker's calls land in the same buckets
+    UsageService.record('classify_ticket', 'gpt-4o-mini', _usage(50, 10), latency=0.25)
+    UsageService.record('classify_ticket', 'gpt-4o-mini', latency=0.1, error=True)
+    UsageService.flush()
+
+    report = UsageService.get_usage_report(hours=1)
+    operation = report['by_operation'][0]
+    assert operation['name'] == 'classify_ticket'
+    assert (operation['calls'], operation['errors']) == (3, 1)
+    assert (operation['prompt_tokens'], operation['completion_tokens']) == (150, 30)
+    assert report['by_endpoint'][0]['name'] == 'background'
+    assert report['totals']['cost_usd'] == round((150 * 0.15 + 30 * 0.60) / 1_000_000, 6)
+    assert sum(point['calls'] for point in report['series']) == 3
+
+
+def test_request_usage_is_flushed_at_teardown(client, fake_openai):
+    response = client.post('/knowledge', json={"title": "VPN", "content": "Reconnect the VPN client."})
+    assert response.status_code == 201
+    assert UsageService._pending == {}
+
+    report = client.get('/analytics/ai-usage?bucket=day').get_json()
+    assert report['totals']['calls'] >= 1
+    assert report['by_endpoint'][0]['name'] == '/knowledge/'
+
+
+def test_minute_buckets_group_into_hour_and_day_points(app_context):
+    day = int(time.time() // 86400) * 86400
+    hour = max(int(time.time() // 3600) * 3600 - 3600, day)
+    db.session.add_all([
+        AIUsageBucket(bucket_start=hour + minute * 60, operation='classify_ticket', model='gpt-4o-mini',
+                      endpoint='', calls=1, errors=0, prompt_tokens=10, completion_tokens=2, latency_seconds=0.1)
+        for minute in (0, 17, 59)
+    ])
+    db.session.commit()
+
+    for bucket, start in (('hour', hour), ('day', day)):
+        series = UsageService.get_usage_report(hours=48, bucket=bucket)['series']
+        assert len(series) == 1, series
+        assert series[0]['calls'] == 3
+        assert series[0]['bucket_start'].startswith(
+            time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(start)))
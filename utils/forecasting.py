@@ -0,0 +1,252 @@
+import numpy as np
+
+SEASON = 7  # weekly seasonality of daily ticket volume
+
+# Smoothing parameter grids. Every combination is filtered in one pass over the series
+# (parameters are the batch axis), and each forecast origin keeps the combination with the
+# lowest in-sample one-step squared error up to that origin.
+ALPHAS = np.array([0.1, 0.2, 0.3, 0.5, 0.7, 0.9])
+BETAS = np.array([0.01, 0.05, 0.1, 0.2])
+GAMMAS = np.array([0.05, 0.1, 0.2, 0.4])
+PHIS = np.array([0.8, 0.9, 0.98])
+
+
+def _grid(seasonal, damped):
+    gammas = GAMMAS if seasonal else np.zeros(1)
+    phis = PHIS if damped else np.ones(1)
+    mesh = np.meshgrid(ALPHAS, BETAS, gammas, phis, indexing='ij')
+    return [axis.ravel() for axis in mesh]
+
+
+def _smooth(y, seasonal, damped):
+    """
+    Run additive Holt(-Winters) filters for the whole parameter grid over y.
+    Level/trend/season start from the first one (or two) seasons; the filter runs once over the
+    whole series, so the state after y[t - 1] only ever depends on y[:t].
+    Returns (params, levels, trends, season, errors, burn_in): params is (alpha, beta, gamma, phi);
+    levels/trends/errors are (grid, len(y)); season[:, i + m] is the estimate after observing y[i]
+    and season[:, i] the one used to predict y[i]; errors are one-step errors, zero before burn_in.
+    """
+    alpha, beta, gamma, phi = _grid(seasonal, damped)
+    n, m = len(y), SEASON if seasonal else 1
+
+    if seasonal:
+        level = np.full(len(alpha), y[:m].mean())
+        trend = np.full(len(alpha), (y[m:2 * m].mean() - y[:m].mean()) / m)
+        burn_in = 2 * m
+    else:
+        level = np.full(len(alpha), y[0])
+        trend = np.full(len(alpha), y[1] - y[0])
+        burn_in = 2
+    season = np.zeros((len(alpha), n + m))
+    if seasonal:
+        season[:, :m] = y[:m] - y[:m].mean()
+
+    levels = np.empty((len(alpha), n))
+    trends = np.empty((len(alpha), n))
+    errors = np.zeros((len(alpha), n))
+    for i in range(n):
+        predicted = level + phi * trend + season[:, i]
+        if i >= burn_in:
+            errors[:, i] = y[i] - predicted
+        new_level = alpha * (y[i] - season[:, i]) + (1 - alpha) * (level + phi * trend)
+        trend = beta * (new_level - level) + (1 - beta) * phi * trend
+        level = new_level
+        if seasonal:
+            season[:, i + m] = gamma * (y[i] - level) + (1 - gamma) * season[:, i]
+        levels[:, i] = level
+        trends[:, i] = trend
+    return (alpha, beta, gamma, phi), levels, trends, season, errors, burn_in
+
+
+def _exp_smoothing(y, origins, horizon, seasonal, damped):
+    """Additive Holt(-Winters) forecasts from every origin, shape (len(origins), horizon)."""
+    (_, _, _, phi), levels, trends, season, errors, _ = _smooth(y, seasonal, damped)
+    m = SEASON if seasonal else 1
+
+    last = np.asarray(origins) - 1
+    best = np.argmin(np.cumsum(errors ** 2, axis=1)[:, last], axis=0)  # per origin
+    steps = np.arange(1, horizon + 1)
+    damping = np.cumsum(phi[best, None] ** steps, axis=1)  # sum_{k<=h} phi^k
+    forecast = levels[best, last][:, None] + damping * trends[best, last][:, None]
+    if seasonal:
+        # Latest season estimate of the same weekday as each target
+        target = last[:, None] + steps
+        forecast += season[best[:, None], target - m * np.ceil(steps / m).astype(int) + m]
+    return forecast
+
+
+def _resample(residuals, shocks):
+    """
+    Bootstrap draws from residuals at the random indices in shocks. Residuals are centered so paths
+    spread around the point forecast instead of drifting with the model's in-sample bias.
+    """
+    if not len(residuals):
+        return np.zeros(shocks.shape)
+    return (residuals - residuals.mean())[shocks % len(residuals)]
+
+
+def _simulate_exp_smoothing(y, horizon, shocks, seasonal, damped):
+    """
+    Sample paths of the model fitted on all of y: each step adds a resampled one-step residual
+    and feeds the simulated value back through the smoothing equations, so errors compound.
+    """
+    (alpha, beta, gamma, phi), levels, trends, season, errors, burn_in = _smooth(y, seasonal, damped)
+    m, n = SEASON if seasonal else 1, len(y)
+    best = np.argmin((errors ** 2).sum(axis=1))
+    a, b, g, p = alpha[best], beta[best], gamma[best], phi[best]
+    shocks = _resample(errors[best, burn_in:], shocks)
+
+    paths = np.empty(shocks.shape)
+    level = np.full(len(shocks), levels[best, -1])
+    trend = np.full(len(shocks), trends[best, -1])
+    seasons = np.tile(season[best, n:n + m], (len(shocks), 1))  # latest estimate per weekday
+    for h in range(horizon):
+        s = seasons[:, h % m]
+        value = level + p * trend + s + shocks[:, h]
+        new_level = a * (value - s) + (1 - a) * (level + p * trend)
+        trend = b * (new_level - level) + (1 - b) * p * trend
+        level = new_level
+        if seasonal:
+            seasons[:, h % m] = g * (value - level) + (1 - g) * s
+        paths[:, h] = value
+    return paths
+
+
+def _holt_winters(y, origins, horizon):
+    return _exp_smoothing(y, origins, horizon, seasonal=True, damped=False)
+
+
+def _holt_winters_damped(y, origins, horizon):
+    return _exp_smoothing(y, origins, horizon, seasonal=True, damped=True)
+
+
+def _holt(y, origins, horizon):
+    return _exp_smoothing(y, origins, horizon, seasonal=False, damped=False)
+
+
+def _simulate_holt_winters(y, horizon, shocks):
+    return _simulate_exp_smoothing(y, horizon, shocks, seasonal=True, damped=False)
+
+
+def _simulate_holt_winters_damped(y, horizon, shocks):
+    return _simulate_exp_smoothing(y, horizon, shocks, seasonal=True, damped=True)
+
+
+def _simulate_holt(y, horizon, shocks):
+    return _simulate_exp_smoothing(y, horizon, shocks, seasonal=False, damped=False)
+
+
+def _linear(y, origins, horizon):
+    """Least-squares line over y[:t] for every origin t, from prefix sums."""
+    t = np.asarray(origins, dtype=float)
+    x = np.arange(len(y), dtype=float)
+    sum_y = np.concatenate([[0.0], np.cumsum(y)])[origins]
+    sum_xy = np.concatenate([[0.0], np.cumsum(x * y)])[origins]
+    sum_x = t * (t - 1) / 2
+    sum_xx = (t - 1) * t * (2 * t - 1) / 6
+    denominator = t * sum_xx - sum_x ** 2
+    slope = np.divide(t * sum_xy - sum_x * sum_y, denominator,
+                      out=np.zeros_like(t), where=denominator != 0)
+    intercept = (sum_y - slope * sum_x) / t
+    return intercept[:, None] + slope[:, None] * (t[:, None] - 1 + np.arange(1, horizon + 1))
+
+
+def _seasonal_naive(y, origins, horizon):
+    """Repeat the last observed week."""
+    steps = np.arange(1, horizon + 1)
+    target = np.asarray(origins)[:, None] - 1 + steps
+    return y[target - SEASON * np.ceil(steps / SEASON).astype(int)]
+
+
+def _simulate_linear(y, horizon, shocks):
+    """Linear forecast plus resampled residuals of the fitted line."""
+    x = np.arange(len(y), dtype=float)
+    slope, intercept = np.polyfit(x, y, 1)
+    return _linear(y, np.array([len(y)]), horizon) + _resample(y - (intercept + slope * x), shocks)
+
+
+def _simulate_seasonal_naive(y, horizon, shocks):
+    """Random walk over weekdays: each simulated day is the same weekday last week plus a resampled change."""
+    shocks = _resample(y[SEASON:] - y[:-SEASON], shocks)
+    week = np.tile(y[-SEASON:], (len(shocks), 1))
+    paths = np.empty(shocks.shape)
+    for h in range(horizon):
+        week[:, h % SEASON] += shocks[:, h]
+        paths[:, h] = week[:, h % SEASON]
+    return paths
+
+
+# name -> (forecast function, minimum history length, path simulator)
+MODELS = {
+    'holt_winters': (_holt_winters, 2 * SEASON, _simulate_holt_winters),
+    'holt_winters_damped': (_holt_winters_damped, 2 * SEASON, _simulate_holt_winters_damped),
+    'holt': (_holt, 3, _simulate_holt),
+    'linear': (_linear, 2, _simulate_linear),
+    'seasonal_naive': (_seasonal_naive, SEASON, _simulate_seasonal_naive),
+}
+
+
+# Models without the weekly season, for series whose periods are weeks or months
+NONSEASONAL = ('holt', 'linear')
+
+
+def default_model(length, models=None):
+    """Model used when a series is too short to backtest (the previous fixed rule)."""
+    models = models or MODELS
+    if length >= 2 * SEASON and 'holt_winters' in models:
+        return 'holt_winters'
+    return 'holt' if length >= 3 and 'holt' in models else 'linear'
+
+
+def forecast(model, y, horizon):
+    """Point forecast of `model` fitted on all of y for the next `horizon` steps."""
+    y = np.asarray(y, dtype=float)
+    fn = MODELS[model][0]
+    return fn(y, np.array([len(y)]), horizon)[0]
+
+
+def simulate(model, y, horizon, paths=2000, seed=0):
+    """
+    Monte Carlo sample paths, shape (paths, horizon), of `model` fitted on all of y, built by
+    bootstrapping its in-sample one-step residuals. All paths advance together, one array
+    operation per forecast step. A fixed seed keeps repeated requests identical.
+    """
+    y = np.asarray(y, dtype=float)
+    # Residual indices; each simulator maps them onto its own residuals
+    shocks = np.random.default_rng(seed).integers(0, np.iinfo(np.int32).max, size=(paths, horizon))
+    return MODELS[model][2](y, horizon, shocks)
+
+
+def backtest(y, horizon, models=None, min_origins=3, max_origins=None):
+    """
+    Rolling-origin evaluation: every model forecasts `horizon` steps from each origin t (fitted on
+    y[:t] only) and is scored against y[t:t + horizon]. All origins of a model are computed in one
+    vectorized call. Models whose minimum history would leave fewer than `min_origins` origins are skipped,
+    so every model that is scored sees the same origins.
+    Returns {"origins": int, "selected": name, "models": {name: {"mae", "mape"}}}; models is empty and
+    selected is default_model() when the series is too short. Selection is by MAE, since MAPE is
+    undefined on zero-count days and unstable on small counts.
+    """
+    y = np.asarray(y, dtype=float)
+    candidates = [name for name in (models or MODELS)
+                  if len(y) - horizon - MODELS[name][1] + 1 >= min_origins]
+    if not candidates:
+        return {"origins": 0, "selected": default_model(len(y), models), "models": {}}
+
+    first = max(MODELS[name][1] for name in candidates)
+    origins = np.arange(first, len(y) - horizon + 1)
+    if max_origins:
+        origins = origins[-max_origins:]
+    actual = y[origins[:, None] + np.arange(horizon)]
+    nonzero = actual > 0
+
+    report = {}
+    for name in candidates:
+        errors = np.abs(MODELS[name][0](y, origins, horizon) - actual)
+        report[name] = {
+            "mae": round(float(errors.mean()), 4),
+            "mape": round(float((errors[nonzero] / actual[nonzero]).mean() * 100), 2) if nonzero.any() else None,
+        }
+    selected = min(report, key=lambda name: report[name]["mae"])
+    return {"origins": int(len(origins)), "selected": selected, "models": report}
@@ -0,0 +1,140 @@
+import gzip
+import hashlib
+import json
+import zlib
+from functools import wraps
+
+from flask import Response, make_response, request, stream_with_context
+
+from models.data_version import DataVersion
+from utils.metrics import span
+
+try:
+    import brotli
+except ImportError:  # optional: falls back to gzip only
+    brotli = None
+
+_ENCODING_SUFFIXES = ('-br', '-gzip')
+
+
+def _strip_encoding_suffix(tag):
+    for suffix in _ENCODING_SUFFIXES:
+        if tag.endswith(suffix):
+            return tag[:-len(suffix)]
+    return tag
+
+
+def conditional(*table_names):
+    """
+    Serve a GET view with a strong ETag derived from the data versions of `table_names`.
+    A matching If-None-Match is answered with 304 before the view (and its queries) runs.
+    Versions are read from the replica, like the views' data: a version that lags the rows only
+    costs one extra full response, never a 304 for a stale body.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            versions = DataVersion.get_versions(table_names, replica=True)
+            key = f"{request.path}?{request.query_string.decode()}|" + \
+                  ",".join(f"{name}:{versions[name]}" for name in table_names)
+            etag = hashlib.sha1(key.encode()).hexdigest()
+
+            # Echo back the client's tag on 304 so encoding-suffixed ETags stay stable.
+            matched = next((t for t in request.if_none_match.as_set(include_weak=True)
+                            if _strip_encoding_suffix(t) == etag), None)
+            if matched or request.if_none_match.star_tag:
+                response = Response(status=304)
+                response.set_etag(matched or etag)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                response.set_etag(etag)
+
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        return wrapper
+    return decorator
+
+
+def sse_response(events):
+    """
+    Stream (event, data) pairs as Server-Sent Events; `data` is JSON-encoded.
+    """
+    def generate():
+        for event, data in events:
+            yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+def init_compression(app):
+    """
+    gzip/brotli-encode large JSON responses according to Accept-Encoding.
+    Server-Sent Event streams are left alone so events are not held back in the compressor.
+    Tune with COMPRESS_MIN_SIZE (bytes), COMPRESS_GZIP_LEVEL and COMPRESS_BROTLI_QUALITY.
+    """
+    min_size = app.config.get('COMPRESS_MIN_SIZE', 1024)
+    gzip_level = app.config.get('COMPRESS_GZIP_LEVEL', 6)
+    brotli_quality = app.config.get('COMPRESS_BROTLI_QUALITY', 4)
+
+    @app.after_request
+    def _compress(response):
+        if (response.status_code < 200 or response.status_code in (204, 304)
+                or response.direct_passthrough
+                or 'Content-Encoding' in response.headers
+                or response.mimetype == 'text/event-stream'
+                or not response.mimetype.startswith(('application/json', 'text/'))):
+            return response
+
+        accepted = request.accept_encodings
+        if brotli is not None and accepted['br']:
+            encoding = 'br'
+        elif accepted['gzip']:
+            encoding = 'gzip'
+        else:
+            return response
+
+        if response.is_streamed:
+            # Length is unknown up front; encode chunk by chunk as the body is produced.
+            response.response = _compress_stream(response.response, encoding, gzip_level, brotli_quality)
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < min_size:
+                return response
+
+            with span('compress'):
+                if encoding == 'br':
+                    data = brotli.compress(data, quality=brotli_quality)
+                else:
+                    data = gzip.compress(data, compresslevel=gzip_level)
+            response.set_data(data)
+
+        response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+        # Strong validators must differ between representations.
+        etag, weak = response.get_etag()
+        if etag:
+            response.set_etag(f"{etag}-{encoding}", weak)
+        return response
+
+
+def _compress_stream(chunks, encoding, gzip_level, brotli_quality):
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=brotli_quality)
+        compress, flush = compressor.process, compressor.finish
+    else:
+        compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)  # wbits=31 -> gzip container
+        compress, flush = compressor.compress, compressor.flush
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode()
+        out = compress(chunk)
+        if out:
+            yield out
+    yield flush()
@@ -0,0 +1,257 @@
+import time
+import inspect
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import Response, g, has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Latency buckets in seconds; LLM calls routinely take several seconds.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250, 1000)
+
+
+class Histogram:
+    """
+    Minimal thread-safe Prometheus histogram with labels.
+    Metrics are kept per process; scrape every gunicorn worker or aggregate upstream.
+    """
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labelvalues):
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                # [per-bucket counts..., +Inf count, sum]
+                series = self._series[labelvalues] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[idx] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {k: list(v) for k, v in self._series.items()}
+        for labelvalues, series in sorted(snapshot.items()):
+            base = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(self.labelnames, labelvalues))
+            sep = "," if base else ""
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{base}{sep}le="{bound}"}} {cumulative}')
+            cumulative += series[len(self.buckets)]
+            lines.append(f'{self.name}_bucket{{{base}{sep}le="+Inf"}} {cumulative}')
+            suffix = f"{{{base}}}" if base else ""
+            lines.append(f"{self.name}_sum{suffix} {series[-1]}")
+            lines.append(f"{self.name}_count{suffix} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        if name not in self._metrics:
+            self._metrics[name] = Histogram(name, documentation, labelnames, buckets)
+        return self._metrics[name]
+
+    def register_collector(self, collector):
+        """Register a callable returning exposition lines, evaluated on every scrape."""
+        if collector not in self._collectors:
+            self._collectors.append(collector)
+
+    def render(self):
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            lines.extend(collector())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+REQUEST_DURATION = REGISTRY.histogram(
+    'http_request_duration_seconds', 'Total request latency.', ('endpoint', 'method', 'status'))
+SPAN_DURATION = REGISTRY.histogram(
+    'http_request_span_seconds', 'Time spent per request in each span (db, llm, vector_search, serialize).',
+    ('endpoint', 'span'))
+SQL_QUERIES = REGISTRY.histogram(
+    'http_request_sql_queries', 'SQL statements executed per request.', ('endpoint',), COUNT_BUCKETS)
+SERVICE_CALL_DURATION = REGISTRY.histogram(
+    'service_call_duration_seconds', 'Latency of AIService/AnalyticsService methods.', ('method',))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _record_span(name, elapsed):
+    if not has_request_context():
+        return
+    endpoint = g.get('_metric_streaming')
+    if endpoint is not None:
+        # Streamed body: headers (and Server-Timing) are already sent, so observe right away
+        SPAN_DURATION.observe(elapsed, endpoint, name)
+        return
+    spans = g.setdefault('_metric_spans', {})
+    entry = spans.get(name)
+    if entry is None:
+        spans[name] = [1, elapsed]
+    else:
+        entry[0] += 1
+        entry[1] += elapsed
+
+
+@contextmanager
+def span(name):
+    """
+    Attribute the wrapped block's wall time to a named span of the current request.
+    Outside a request (CLI, background jobs) this only costs a perf_counter call.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _record_span(name, time.perf_counter() - start)
+
+
+def timed(func):
+    """
+    Record the latency of a service method (sync or async) in service_call_duration_seconds.
+    Apply beneath @staticmethod.
+    """
+    label = func.__qualname__
+
+    if inspect.iscoroutinefunction(func):
+        @wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                SERVICE_CALL_DURATION.observe(time.perf_counter() - start, label)
+
+        return async_wrapper
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            SERVICE_CALL_DURATION.observe(time.perf_counter() - start, label)
+
+    return wrapper
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """JSON provider that attributes jsonify() encoding time to the 'serialize' span."""
+
+    def response(self, *args, **kwargs):
+        with span('serialize'):
+            return super().response(*args, **kwargs)
+
+
+_sql_listeners_installed = False
+
+
+def _install_sql_listeners():
+    global _sql_listeners_installed
+    if _sql_listeners_installed:
+        return
+
+    @event.listens_for(Engine, 'before_cursor_execute')
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('_metric_query_start', []).append(time.perf_counter())
+
+    @event.listens_for(Engine, 'after_cursor_execute')
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get('_metric_query_start')
+        if starts:
+            _record_span('db', time.perf_counter() - starts.pop())
+
+    _sql_listeners_installed = True
+
+
+def _pool_gauges():
+    """Connection pool utilisation for every configured bind (primary and replica)."""
+    from extensions import db
+
+    gauges = {
+        'db_pool_size': ('Configured pool size.', 'size'),
+        'db_pool_checked_out': ('Connections currently checked out.', 'checkedout'),
+        'db_pool_checked_in': ('Idle connections in the pool.', 'checkedin'),
+        'db_pool_overflow': ('Connections open beyond pool_size.', 'overflow'),
+    }
+    lines = []
+    for name, (documentation, attr) in gauges.items():
+        lines.append(f"# HELP {name} {documentation}")
+        lines.append(f"# TYPE {name} gauge")
+        for bind_key, engine in db.engines.items():
+            stat = getattr(engine.pool, attr, None)
+            if callable(stat):
+                lines.append(f'{name}{{bind="{bind_key or "primary"}"}} {stat()}')
+    return lines
+
+
+def _endpoint_label():
+    # Use the URL rule rather than the raw path to keep label cardinality bounded.
+    return request.url_rule.rule if request.url_rule else 'unmatched'
+
+
+def init_app(app):
+    """
+    Wire request timing, SQL instrumentation, the Server-Timing header and /metrics into the app.
+    Spans recorded while a streamed body is produced, after the headers went out, are observed
+    directly. Disable with METRICS_ENABLED = False.
+    """
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+
+    _install_sql_listeners()
+    REGISTRY.register_collector(_pool_gauges)
+    app.json = TimedJSONProvider(app)
+
+    @app.before_request
+    def _start_timer():
+        g._metric_start = time.perf_counter()
+
+    @app.after_request
+    def _finish_timer(response):
+        start = g.pop('_metric_start', None)
+        if start is None:
+            return response
+        total = time.perf_counter() - start
+        endpoint = _endpoint_label()
+        spans = g.pop('_metric_spans', {})
+
+        REQUEST_DURATION.observe(total, endpoint, request.method, str(response.status_code))
+        SQL_QUERIES.observe(spans.get('db', (0, 0.0))[0], endpoint)
+
+        timings = []
+        for name, (count, elapsed) in spans.items():
+            SPAN_DURATION.observe(elapsed, endpoint, name)
+            timings.append(f'{name};dur={elapsed * 1000:.1f};desc="{count} calls"')
+        timings.append(f'total;dur={total * 1000:.1f}')
+        response.headers['Server-Timing'] = ", ".join(timings)
+        if response.is_streamed:
+            g._metric_streaming = endpoint
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
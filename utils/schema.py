@@ -0,0 +1,54 @@
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateColumn
+
+from extensions import db
+
+
+def add_missing_columns(model, names):
+    """
+    ALTER TABLE ADD COLUMN for the model columns in `names` that the existing table lacks, with
+    their types, defaults, NOT NULL (which needs a server_default) and foreign key as declared.
+    Upgrade path for deployments without migrations; db.create_all() never alters tables.
+    Returns the names of the columns added. The caller commits.
+    """
+    table = model.__table__
+    conn = db.session.connection()
+    conn.execute(text(f"SELECT 1 FROM {table.name} LIMIT 0"))  # refresh SQLite's cached schema
+    existing = {c['name'] for c in inspect(conn).get_columns(table.name)}
+    added = []
+    for name in names:
+        if name in existing:
+            continue
+        column = table.c[name]
+        ddl = str(CreateColumn(column).compile(dialect=db.engine.dialect))
+        for fk in column.foreign_keys:
+            # Inline REFERENCES: SQLite cannot add a table-level constraint to an existing table
+            ddl += f" REFERENCES {fk.column.table.name} ({fk.column.name})"
+            if fk.ondelete:
+                ddl += f" ON DELETE {fk.ondelete}"
+        db.session.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {ddl}"))
+        added.append(name)
+    return added
+
+
+def create_missing_indexes(model, obsolete=()):
+    """
+    CREATE INDEX for the model's declared indexes that the existing table lacks, and drop the
+    `obsolete` index names it replaces. Returns (created, dropped) index names. Commits.
+    """
+    table = model.__table__
+    created, dropped = [], []
+    with db.engine.begin() as conn:
+        # A statement on the table first: SQLite answers PRAGMA index_list from the connection's
+        # cached schema, which can predate DDL run on other connections
+        conn.execute(text(f"SELECT 1 FROM {table.name} LIMIT 0"))
+        existing = {i['name'] for i in inspect(conn).get_indexes(table.name)}
+        for name in obsolete:
+            if name in existing:
+                conn.execute(text(f"DROP INDEX {name}"))
+                dropped.append(name)
+        for index in sorted(table.indexes, key=lambda i: i.name):
+            if index.name not in existing:
+                index.create(conn)
+                created.append(index.name)
+    return created, dropped
@@ -0,0 +1,79 @@
+import json
+from datetime import date, datetime
+from itertools import chain
+
+from flask import Response, stream_with_context
+from sqlalchemy import select
+
+from extensions import db
+
+try:
+    import orjson
+except ImportError:  # optional: falls back to the stdlib encoder
+    orjson = None
+
+CHUNK_SIZE = 1000
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(obj):
+    """Encode to UTF-8 JSON bytes with orjson when available; datetimes become ISO strings."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, default=_default, sort_keys=True, separators=(',', ':')).encode()
+
+
+def _split_csv(value):
+    if not value:
+        return []
+    return [t.strip() for t in str(value).split(',') if t.strip()]
+
+
+def iter_json_rows(columns, csv_columns=(), where=None, order_by=None, chunk_size=CHUNK_SIZE):
+    """
+    Yield a JSON array of objects for `columns` in encoded chunks, without building ORM instances.
+    Each object matches the model's to_dict() for those columns; `csv_columns` are split into lists.
+    """
+    keys = [c.key for c in columns]
+    csv_idx = [keys.index(k) for k in csv_columns]
+
+    statement = select(*columns)
+    if where is not None:
+        statement = statement.where(where)
+    statement = statement.order_by(*(order_by if order_by is not None else [columns[0]]))
+
+    result = db.session.execute(statement.execution_options(yield_per=chunk_size))
+
+    # The opening bracket goes out with the first batch, so priming the generator runs the query
+    # and encodes a full chunk (see stream_json_rows).
+    prefix = b'['
+    for partition in result.partitions():
+        batch = []
+        for row in partition:
+            values = list(row)
+            for i in csv_idx:
+                values[i] = _split_csv(values[i])
+            batch.append(dict(zip(keys, values)))
+        if not batch:
+            continue
+        # Strip the enclosing brackets of the encoded batch and splice it into the stream.
+        yield prefix + dumps(batch)[1:-1]
+        prefix = b','
+    yield b'[]' if prefix == b'[' else b']'
+
+
+def stream_json_rows(columns, **kwargs):
+    """
+    Streaming JSON response for iter_json_rows().
+    The query runs and the first chunk is encoded before the response is returned, so those errors
+    propagate to the caller. A failure in a later chunk can only cut the body short: the 200 status
+    and headers have already been sent by then.
+    """
+    chunks = iter_json_rows(columns, **kwargs)
+    first = next(chunks)
+    return Response(stream_with_context(chain([first], chunks)), mimetype='application/json')
@@ -0,0 +1,58 @@
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+
+def _merge_top_k(best_scores, best_idx, scores, offset, k):
+    """Merge a (rows x cols) score tile into the running per-row top-k (unsorted)."""
+    if scores.shape[1] > k:
+        part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        scores = np.take_along_axis(scores, part, axis=1)
+        idx = part + offset
+    else:
+        idx = np.broadcast_to(np.arange(offset, offset + scores.shape[1]), scores.shape)
+    all_scores = np.concatenate([best_scores, scores], axis=1)
+    all_idx = np.concatenate([best_idx, idx], axis=1)
+    keep = np.argpartition(-all_scores, k - 1, axis=1)[:, :k]
+    return np.take_along_axis(all_scores, keep, axis=1), np.take_along_axis(all_idx, keep, axis=1)
+
+
+def top_k_rows(path, start, stop, k, block_size):
+    """
+    Top-k cosine neighbors (excluding self) for rows [start, stop) of the unit-normalized
+    float32 matrix saved at `path`. The matrix is memory-mapped, and only one
+    (stop - start) x block_size score tile is materialized at a time.
+    Returns (start, indices, scores), each row sorted best first.
+    """
+    matrix = np.load(path, mmap_mode='r')
+    rows = np.asarray(matrix[start:stop])
+    best_scores = np.full((len(rows), k), -np.inf, dtype=np.float32)
+    best_idx = np.full((len(rows), k), -1, dtype=np.int64)
+
+    for offset in range(0, len(matrix), block_size):
+        tile = rows @ np.asarray(matrix[offset:offset + block_size]).T
+        # Exclude self-similarity where the row block overlaps the column block
+        lo, hi = max(start, offset), min(stop, offset + tile.shape[1])
+        if lo < hi:
+            tile[np.arange(lo - start, hi - start), np.arange(lo - offset, hi - offset)] = -np.inf
+        best_scores, best_idx = _merge_top_k(best_scores, best_idx, tile, offset, k)
+
+    order = np.argsort(-best_scores, axis=1)
+    return start, np.take_along_axis(best_idx, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+
+
+def all_pairs_top_k(path, n, k, block_size=2048, workers=1):
+    """
+    Yield (start, indices, scores) row blocks of the top-k neighbors for every row of the matrix at `path`.
+    Peak memory per worker is O(block_size^2) plus the row block; with workers > 1, row blocks run
+    in a process pool and share the matrix pages through the memory map.
+    """
+    blocks = [(start, min(start + block_size, n)) for start in range(0, n, block_size)]
+    if workers <= 1:
+        for start, stop in blocks:
+            yield top_k_rows(path, start, stop, k, block_size)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(top_k_rows, path, start, stop, k, block_size) for start, stop in blocks]
+        for future in futures:
+            yield future.result()
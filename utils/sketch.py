@@ -0,0 +1,95 @@
+import math
+import numpy as np
+
+
+class QuantileSketch:
+    """
+    Mergeable quantile sketch with bounded relative error (DDSketch-style logarithmic buckets).
+    A positive value x falls in bucket ceil(log_gamma(x)); any quantile is answered within
+    `relative_accuracy` of the true value. Counts are plain sums, so sketches merge by addition
+    and values can be removed again, which keeps incremental updates exact.
+    """
+
+    def __init__(self, relative_accuracy=0.01, bins=None, zero_count=0, count=0, total=0.0):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.bins = dict(bins or {})  # bucket index -> count
+        self.zero_count = zero_count  # values <= 0
+        self.count = count
+        self.total = total
+
+    def _index(self, values):
+        return np.ceil(np.log(values) / self._log_gamma).astype(np.int64)
+
+    def add(self, value, weight=1):
+        self.add_many(np.array([value], dtype=np.float64), np.array([weight], dtype=np.float64))
+
+    def add_many(self, values, weights=None):
+        """
+        Add (or, with negative weights, remove) many values at once. A bucket never goes below zero:
+        removals of values the sketch never counted are dropped where their bucket is empty.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        weights = np.ones(len(values)) if weights is None else np.asarray(weights, dtype=np.float64)
+        if not len(values):
+            return
+
+        positive = values > 0
+        zero_weight = int(weights[~positive].sum())
+        applied = max(self.zero_count + zero_weight, 0) - self.zero_count
+        self.zero_count += applied
+        self.count += applied
+        if positive.any():
+            index, inverse = np.unique(self._index(values[positive]), return_inverse=True)
+            sums = np.bincount(inverse, weights=weights[positive])
+            value_sums = np.bincount(inverse, weights=values[positive] * weights[positive])
+            for i, n, value_sum in zip(index.tolist(), sums.tolist(), value_sums.tolist()):
+                old = self.bins.get(i, 0)
+                new = max(old + int(n), 0)
+                if new:
+                    self.bins[i] = new
+                else:
+                    self.bins.pop(i, None)
+                self.count += new - old
+                # Scale the value sum by the share of the change that was applied
+                self.total += value_sum * (new - old) / n if n else value_sum
+        self.total = max(self.total, 0.0) if self.count else 0.0
+
+    def merge(self, other):
+        for i, n in other.bins.items():
+            n = self.bins.get(i, 0) + n
+            if n:
+                self.bins[i] = n
+            else:
+                self.bins.pop(i, None)
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.total += other.total
+
+    def quantile(self, q):
+        """Approximate q-quantile (0 <= q <= 1), or None when empty."""
+        if self.count <= 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for i in sorted(self.bins):
+            seen += self.bins[i]
+            if rank < seen:
+                return 2 * self.gamma ** i / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.bins) / (self.gamma + 1) if self.bins else 0.0
+
+    def mean(self):
+        return self.total / self.count if self.count > 0 else None
+
+    def to_dict(self):
+        return {"relative_accuracy": self.relative_accuracy, "bins": {str(i): n for i, n in self.bins.items()},
+                "zero_count": self.zero_count, "count": self.count, "total": self.total}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(relative_accuracy=data.get("relative_accuracy", 0.01),
+                   bins={int(i): n for i, n in data.get("bins", {}).items()},
+                   zero_count=data.get("zero_count", 0), count=data.get("count", 0), total=data.get("total", 0.0))